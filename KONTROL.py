@@ -1,21 +1,231 @@
 # ! Bu araç @keyiflerolsun tarafından | @KekikAkademi için yazılmıştır.
 
-from Kekik.cli    import konsol
-from Kekik        import satir_ekle
-from httpx        import Client
-from re           import compile, MULTILINE
-from os           import path, remove
+from Kekik.cli      import konsol
+from httpx          import AsyncClient, Limits
+from asyncio        import Semaphore, as_completed, gather, run
+from collections    import defaultdict
+from dataclasses    import dataclass
+from urllib.parse   import urlparse, urljoin
+from re             import compile, MULTILINE
+from os             import path, remove, replace, getenv
+from argparse       import ArgumentParser
+from time           import perf_counter, time
+from json           import dumps, loads, load
+from hashlib        import sha256
+from xml.etree      import ElementTree
+from importlib.util import find_spec
+
+HTTP2 = find_spec("h2") is not None
+
+@dataclass(frozen=True)
+class IstekProfili:
+    """#EXTVLCOPT satırlarından oluşan, değiştirilemez istek başlıkları"""
+    user_agent : str | None = None
+    referer    : str | None = None
+
+    @property
+    def basliklar(self) -> dict[str, str]:
+        basliklar = {}
+        if self.user_agent:
+            basliklar["User-Agent"] = self.user_agent
+
+        if self.referer:
+            basliklar["Referer"] = self.referer
+
+        return basliklar
+
+class IstemciHavuzu:
+    """Her (profil, host) çifti için ayrı AsyncClient; başlıklar istemciler arasında sızmaz, keep-alive korunur"""
+    def __init__(self, host_basina: int):
+        self.host_basina = host_basina
+        self.istemciler  = {}
+
+    def istemci(self, profil: IstekProfili, host: str) -> AsyncClient:
+        anahtar = (profil, host)
+        if anahtar not in self.istemciler:
+            limitler = Limits(max_connections=self.host_basina, max_keepalive_connections=self.host_basina)
+            self.istemciler[anahtar] = AsyncClient(
+                headers = profil.basliklar,
+                verify  = False,
+                timeout = 10,
+                http2   = HTTP2,
+                limits  = limitler
+            )
+
+        return self.istemciler[anahtar]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        for istemci in self.istemciler.values():
+            await istemci.aclose()
+
+        self.istemciler.clear()
+
+class SaglikDeposu:
+    """Kanal sonuçlarını (hata, gecikme, ETag/Last-Modified, ardışık hata) yayın + profil + kontrol kipi anahtarıyla JSON-lines dosyada saklar
+
+    Süresi (ttl) dolmamış sağlam kanallar tekrar kontrol edilmez, hatalı kanallar ardışık hata sayısıyla katlanan bekleme süresi boyunca atlanır
+    """
+    def __init__(self, dosya: str, ttl: int = 6 * 3600, bekleme: int = 3600, azami_bekleme: int = 7 * 86400):
+        self.dosya         = dosya
+        self.ttl           = ttl
+        self.bekleme       = bekleme
+        self.azami_bekleme = azami_bekleme
+        self.kayitlar      = {}
+
+        if path.isfile(dosya):
+            with open(dosya, "r", encoding="utf-8") as kaynak:
+                for satir in kaynak:
+                    if satir.strip():
+                        kayit = loads(satir)
+                        self.kayitlar[kayit["anahtar"]] = kayit
+
+    @staticmethod
+    def anahtar(kanal: dict, derin: bool | str = False) -> str:
+        # ? Yüzeysel kontrolün sonucu derin kontrolün yerine geçmesin; yüzeysel anahtarlar eski kayıtlarla aynı kalır
+        anahtar = [kanal["yayin"], kanal["profil"].user_agent, kanal["profil"].referer]
+        return dumps(anahtar + [derin] if derin else anahtar, ensure_ascii=False)
+
+    def onbellekte_mi(self, kayit: dict | None) -> bool:
+        if not kayit:
+            return False
+
+        yas = time() - kayit["zaman"]
+        if not kayit["hata"]:
+            return yas < self.ttl
+
+        return yas < min(self.bekleme * 2 ** (kayit["ardisik_hata"] - 1), self.azami_bekleme)
+
+    def guncelle(self, anahtar: str, hata: str | None, gecikme: float, etag: str | None = None, last_modified: str | None = None):
+        onceki = self.kayitlar.get(anahtar, {})
+        self.kayitlar[anahtar] = {
+            "anahtar"       : anahtar,
+            "hata"          : hata,
+            "gecikme"       : round(gecikme, 3),
+            "etag"          : etag or onceki.get("etag"),
+            "last_modified" : last_modified or onceki.get("last_modified"),
+            "ardisik_hata"  : onceki.get("ardisik_hata", 0) + 1 if hata else 0,
+            "zaman"         : time(),
+        }
+
+    def kaydet(self):
+        gecici = f"{self.dosya}.tmp"
+        with open(gecici, "w", encoding="utf-8") as hedef:
+            for kayit in self.kayitlar.values():
+                hedef.write(dumps(kayit, ensure_ascii=False) + "\n")
+
+        replace(gecici, self.dosya)
+
+class Rapor:
+    """Kontrol sonuçlarını bellekte toplar, sonunda Markdown / JSON / JUnit-XML olarak tek seferde yazar
+
+    JSON rapor bir önceki çalışmanın raporuyla karşılaştırılır (yeni / düzelen / devam eden hatalar),
+    hataların sıradan ve boşluklardan bağımsız özeti (sha256) Markdown'a gizli yorum olarak eklenir
+    """
+    BASLIK = """
+***
+
+> # [![Yayın Kontrolü](https://github.com/keyiflerolsun/IPTV_YenirMi/actions/workflows/Kontrol.yml/badge.svg)](https://github.com/keyiflerolsun/IPTV_YenirMi/actions/workflows/Kontrol.yml)
+> ### [Kanallar/KekikAkademi.m3u](https://github.com/keyiflerolsun/IPTV_YenirMi/blob/main/Kanallar/KekikAkademi.m3u)
+
+***
+
+| AD | HATA | YAYIN |
+|----|------|-------|
+    """.strip()
+
+    def __init__(self, markdown: str = "HATALAR.md", json: str = "RAPOR.json", junit: str = "RAPOR.xml"):
+        self.markdown = markdown
+        self.json     = json
+        self.junit    = junit
+        self.sonuclar = []
+        self.sure     = 0.0
+
+    def ekle(self, kanal: dict, hata: str | None):
+        self.sonuclar.append({"ad": kanal["ad"], "yayin": kanal["yayin"], "hata": hata})
+
+    @property
+    def hatalar(self) -> list[dict]:
+        return [sonuc for sonuc in self.sonuclar if sonuc["hata"]]
+
+    @staticmethod
+    def ozet(hatalar: list[dict]) -> str:
+        satirlar = sorted(f"{hata['ad']}\t{hata['hata']}\t{hata['yayin']}" for hata in hatalar)
+        return sha256("\n".join(satirlar).encode("utf-8")).hexdigest()
+
+    def fark(self) -> dict[str, list[dict]]:
+        onceki = []
+        if path.isfile(self.json):
+            with open(self.json, "r", encoding="utf-8") as kaynak:
+                onceki = [sonuc for sonuc in load(kaynak).get("sonuclar", []) if sonuc["hata"]]
+
+        anahtar = lambda sonuc: (sonuc["ad"], sonuc["yayin"])
+        eski    = {anahtar(sonuc): sonuc for sonuc in onceki}
+        simdiki = {anahtar(sonuc): sonuc for sonuc in self.hatalar}
+
+        return {
+            "yeni"    : [sonuc for sonuc_anahtari, sonuc in simdiki.items() if sonuc_anahtari not in eski],
+            "duzelen" : [sonuc for sonuc_anahtari, sonuc in eski.items() if sonuc_anahtari not in simdiki],
+            "devam"   : [sonuc for sonuc_anahtari, sonuc in simdiki.items() if sonuc_anahtari in eski],
+        }
+
+    def markdown_yaz(self, ozet: str):
+        if path.isfile(self.markdown):
+            remove(self.markdown)
+
+        if not self.hatalar:
+            return
+
+        satirlar = [self.BASLIK]
+        satirlar.extend(f"|  **{hata['ad']}**  |  `{hata['hata']}`  |  *{hata['yayin']}*  |" for hata in self.hatalar)
+        satirlar.append(f"\n<!-- rapor: {ozet} -->")
+
+        with open(self.markdown, "w", encoding="utf-8") as hedef:
+            hedef.write("\n".join(satirlar))
+
+    def junit_yaz(self):
+        hatalar = self.hatalar
+        kok     = ElementTree.Element("testsuite", name="Yayın Kontrolü", tests=str(len(self.sonuclar)), failures=str(len(hatalar)), time=f"{self.sure:.3f}")
+        for sonuc in self.sonuclar:
+            vaka = ElementTree.SubElement(kok, "testcase", classname="KekikAkademi", name=sonuc["ad"])
+            if sonuc["hata"]:
+                ElementTree.SubElement(vaka, "failure", message=sonuc["hata"]).text = sonuc["yayin"]
+
+        ElementTree.ElementTree(kok).write(self.junit, encoding="utf-8", xml_declaration=True)
+
+    def yaz(self) -> dict[str, list[dict]]:
+        ozet = self.ozet(self.hatalar)
+        fark = self.fark()
+
+        self.markdown_yaz(ozet)
+        self.junit_yaz()
+        with open(self.json, "w", encoding="utf-8") as hedef:
+            hedef.write(dumps({"ozet": ozet, "sure": round(self.sure, 3), "sonuclar": self.sonuclar, "fark": fark}, ensure_ascii=False, indent=2))
+
+        return fark
 
 class IPTVParser:
-    def __init__(self, dosya_yolu: str):
-        self.HATALAR = "HATALAR.md"
-        if path.isfile(self.HATALAR):
-            remove(self.HATALAR)
+    LISTE_SINIRI   = 1 << 20
+    SEGMENT_SINIRI = 1 << 16
+    YOKLAMA_SINIRI = 1 << 10
+    BANDWIDTH_RE   = compile(r'BANDWIDTH=(\d+)')
 
-        self.dosya_yolu   = dosya_yolu
-        self.kanallar     = []
-        self.hata_bulundu = False
-        self.oturum       = Client(verify=False, timeout=10)
+    def __init__(self, dosya_yolu: str, eszamanli: int = 32, host_basina: int = 4, derin: bool | str = False):
+        self.rapor = Rapor()
+        if path.isfile(self.rapor.markdown):
+            remove(self.rapor.markdown)
+
+        self.dosya_yolu     = dosya_yolu
+        self.kanallar       = []
+        self.hata_bulundu   = False
+        self.eszamanli      = eszamanli
+        self.host_basina    = host_basina
+        self.derin          = derin  # ? True: en yüksek bant genişlikli varyant, "hepsi": tüm varyantlar
+        self.saglik         = SaglikDeposu(getenv("SAGLIK_DOSYASI", "SAGLIK.json"))
+        self.genel_limit    = Semaphore(eszamanli)
+        self.host_limitleri = defaultdict(lambda: Semaphore(host_basina))
 
     def dosya_parse(self):
         with open(self.dosya_yolu, "r", encoding="utf-8") as dosya:
@@ -46,60 +256,182 @@ class IPTVParser:
 
             elif satir.startswith("http"):
                 if match := url_re.search(satir):
-                    mevcut_kanal["yayin"] = match[0]
+                    mevcut_kanal["yayin"]  = match[0]
+                    mevcut_kanal["profil"] = IstekProfili(mevcut_kanal.get("user-agent"), mevcut_kanal.get("referer"))
                     self.kanallar.append(mevcut_kanal)
                     mevcut_kanal = {}
 
         if mevcut_kanal:
             self.kanallar.append(mevcut_kanal)
 
-    def kanallar_kontrol(self):
-        satir_ekle(self.HATALAR, """
-***
+    async def adim(self, havuz: IstemciHavuzu, profil: IstekProfili, adres: str, sinir: int, basliklar: dict | None = None) -> tuple[int, bytes, str, float]:
+        oturum    = havuz.istemci(profil, urlparse(adres).netloc)
+        baslangic = perf_counter()
+        govde     = b""
+        async with oturum.stream("GET", adres, headers=basliklar, follow_redirects=True) as istek:
+            if istek.status_code in [200, 206]:
+                async for parca in istek.aiter_bytes():
+                    govde += parca
+                    if len(govde) >= sinir:
+                        break
 
-> # [![Yayın Kontrolü](https://github.com/keyiflerolsun/IPTV_YenirMi/actions/workflows/Kontrol.yml/badge.svg)](https://github.com/keyiflerolsun/IPTV_YenirMi/actions/workflows/Kontrol.yml)
-> ### [Kanallar/KekikAkademi.m3u](https://github.com/keyiflerolsun/IPTV_YenirMi/blob/main/Kanallar/KekikAkademi.m3u)
+            return istek.status_code, govde[:sinir], str(istek.url), perf_counter() - baslangic
 
-***
+    @staticmethod
+    def liste_mi(icerik: str) -> bool:
+        return icerik.lstrip("\ufeff \r\n\t").startswith("#EXTM3U")
 
-| AD | HATA | YAYIN |
-|----|------|-------|
-        """.strip())
+    def varyantlar(self, icerik: str, adres: str) -> list[str]:
+        "Master listedeki varyantlar, en yüksek bant genişliği önce"
+        varyantlar = []
+        bant       = None
+        for satir in icerik.splitlines():
+            satir = satir.strip()
+            if satir.startswith("#EXT-X-STREAM-INF"):
+                bant = int(match[1]) if (match := self.BANDWIDTH_RE.search(satir)) else 0
+            elif bant is not None and satir and not satir.startswith("#"):
+                varyantlar.append((bant, urljoin(adres, satir)))
+                bant = None
 
-        for kanal in self.kanallar:
-            print("\n")
-            konsol.log(f"[~] Kontrol Ediliyor : {kanal['ad']}")
+        return [varyant for _, varyant in sorted(varyantlar, key=lambda varyant: varyant[0], reverse=True)]
+
+    async def varyant_kontrol(self, havuz: IstemciHavuzu, profil: IstekProfili, adres: str, icerik: str | None = None) -> tuple[str | None, list, int | None]:
+        "Medya listesi » en yeni segmentin ilk baytları; (hata, adımlar, bitrate)"
+        adimlar = []
+        try:
+            if icerik is None:
+                durum, govde, adres, sure = await self.adim(havuz, profil, adres, self.LISTE_SINIRI)
+                adimlar.append(("medya", sure))
+                if durum != 200:
+                    return f"medya {durum}", adimlar, None
+
+                icerik = govde.decode("utf-8", "replace")
+                if not self.liste_mi(icerik):
+                    return "medya m3u8 değil", adimlar, None
+
+            segmentler = [urljoin(adres, satir.strip()) for satir in icerik.splitlines() if satir.strip() and not satir.startswith("#")]
+            if not segmentler:
+                return "segment yok", adimlar, None
 
-            if kanal["user-agent"]:
-                self.oturum.headers.update({"User-Agent": kanal["user-agent"]})
+            aralik = {"Range": f"bytes=0-{self.SEGMENT_SINIRI - 1}"}
+            durum, govde, _, sure = await self.adim(havuz, profil, segmentler[-1], self.SEGMENT_SINIRI, aralik)
+            adimlar.append(("segment", sure))
+        except Exception as hata:
+            return f"{'segment' if adimlar else 'medya'} {type(hata).__name__}", adimlar, None
 
-            if kanal["referer"]:
-                self.oturum.headers.update({"Referer": kanal["referer"]})
+        if durum not in [200, 206] or not govde:
+            return f"segment {durum}", adimlar, None
 
+        return None, adimlar, int(len(govde) * 8 / sure) if sure else None
+
+    async def derin_kontrol(self, havuz: IstemciHavuzu, kanal: dict) -> str | None:
+        "Master » varyant » medya listesi » segment zincirini takip eder"
+        profil = kanal["profil"]
+        durum, govde, adres, sure = await self.adim(havuz, profil, kanal["yayin"], self.LISTE_SINIRI)
+        if durum != 200:
+            return str(durum)
+
+        icerik = govde.decode("utf-8", "replace")
+        if not self.liste_mi(icerik):
+            # ? m3u8 olmayan yayınlar (ts, mp4) için cevap vermesi yeterli
+            return "m3u8 değil" if urlparse(adres).path.endswith(".m3u8") else None
+
+        if varyantlar := self.varyantlar(icerik, adres):
+            takip     = varyantlar if self.derin == "hepsi" else varyantlar[:1]
+            sonuclar  = await gather(*(self.varyant_kontrol(havuz, profil, varyant) for varyant in takip))
+        else:
+            # ? Adres zaten medya listesi
+            sonuclar  = [await self.varyant_kontrol(havuz, profil, adres, icerik)]
+
+        for hata, adimlar, bitrate in sonuclar:
+            rapor = " » ".join(f"{ad} {gecikme:.2f}s" for ad, gecikme in [("master", sure), *adimlar])
+            konsol.log(f"[~] {kanal['ad']} » {rapor}" + (f" » {bitrate / 1e6:.1f} Mbps" if bitrate else ""))
+
+        return next((hata for hata, _, _ in sonuclar if hata), None)
+
+    async def kanal_kontrol(self, havuz: IstemciHavuzu, sira: int, kanal: dict) -> tuple[int, str | None]:
+        anahtar = self.saglik.anahtar(kanal, self.derin)
+        kayit   = self.saglik.kayitlar.get(anahtar)
+        if self.saglik.onbellekte_mi(kayit):
+            konsol.log(f"[~] Önbellekten      : {kanal['ad']}")
+            return sira, kayit["hata"]
+
+        host   = urlparse(kanal["yayin"]).netloc
+        oturum = havuz.istemci(kanal["profil"], host)
+        async with self.genel_limit, self.host_limitleri[host]:
+            konsol.log(f"[~] Kontrol Ediliyor : {kanal['ad']}")
+            baslangic   = perf_counter()
+            dogrulayici = (None, None)
             try:
-                istek = self.oturum.get(kanal["yayin"])
-            except Exception as hata:
-                konsol.log(f"[!] {type(hata).__name__} : {hata}")
-                satir_ekle(self.HATALAR, f"|  **{kanal['ad']}**  |  `{type(hata).__name__}`  |  *{kanal['yayin']}*  |")
-                self.hata_bulundu = True
-                continue
-
-            if istek.status_code in [200, 301, 302, 307]:
-                konsol.log(f"[+] Kontrol Edildi   : {kanal['ad']}")
-            else:
-                konsol.log(f"[!] {istek.status_code} » {kanal['yayin']} » {kanal['ad']}")
-                satir_ekle(self.HATALAR, f"|  **{kanal['ad']}**  |  `{istek.status_code}`  |  *{kanal['yayin']}*  |")
-                self.hata_bulundu = True
+                if self.derin:
+                    hata = await self.derin_kontrol(havuz, kanal)
+                else:
+                    # ? Yalnızca ilk baytlar istenir; önceki sonucun ETag / Last-Modified bilgisiyle koşullu istek, 304 yayının yerinde olduğunu gösterir
+                    basliklar = {"Range": f"bytes=0-{self.YOKLAMA_SINIRI - 1}"}
+                    if kayit and kayit["etag"]:
+                        basliklar["If-None-Match"] = kayit["etag"]
+
+                    if kayit and kayit["last_modified"]:
+                        basliklar["If-Modified-Since"] = kayit["last_modified"]
+
+                    async with oturum.stream("GET", kanal["yayin"], headers=basliklar) as istek:
+                        durum_kodu  = istek.status_code
+                        dogrulayici = (istek.headers.get("ETag"), istek.headers.get("Last-Modified"))
+
+                        # ! Okunmadan kapanan yanıtın bağlantısı havuza dönmez; küçük gövde sonuna kadar okunur,
+                        # ! Range'i yok sayıp büyük gövde gönderen sunucuda sınır aşılınca bağlantı bırakılır
+                        okunan = 0
+                        async for parca in istek.aiter_raw():
+                            okunan += len(parca)
+                            if okunan > self.SEGMENT_SINIRI:
+                                break
+
+                    hata = None if durum_kodu in [200, 206, 301, 302, 304, 307] else str(durum_kodu)
+            except Exception as istisna:
+                konsol.log(f"[!] {type(istisna).__name__} : {istisna}")
+                hata = type(istisna).__name__
+
+        self.saglik.guncelle(anahtar, hata, perf_counter() - baslangic, *dogrulayici)
+
+        if not hata:
+            konsol.log(f"[+] Kontrol Edildi   : {kanal['ad']}")
+            return sira, None
+
+        konsol.log(f"[!] {hata} » {kanal['yayin']} » {kanal['ad']}")
+        return sira, hata
+
+    async def kanallar_kontrol(self):
+        baslangic = perf_counter()
+        hatalar   = [None] * len(self.kanallar)
+        async with IstemciHavuzu(self.host_basina) as havuz:
+            gorevler = [self.kanal_kontrol(havuz, sira, kanal) for sira, kanal in enumerate(self.kanallar)]
+            for gorev in as_completed(gorevler):
+                sira, hata = await gorev
+                hatalar[sira] = hata
+
+        self.saglik.kaydet()
+
+        # ! Sonuçlar, bitiş sırasına değil m3u sırasına göre yazılır
+        for kanal, hata in zip(self.kanallar, hatalar):
+            self.rapor.ekle(kanal, hata)
+
+        self.rapor.sure   = perf_counter() - baslangic
+        fark              = self.rapor.yaz()
+        self.hata_bulundu = bool(self.rapor.hatalar)
+        konsol.log(f"[~] Yeni Hata : {len(fark['yeni'])} | Düzelen : {len(fark['duzelen'])} | Devam Eden : {len(fark['devam'])}")
 
         if not self.hata_bulundu:
-            remove(self.HATALAR)
             print("\n")
             konsol.log("[+] Hata Bulunamadı.")
 
     def run(self):
         self.dosya_parse()
-        self.kanallar_kontrol()
+        run(self.kanallar_kontrol())
 
 if __name__ == "__main__":
-    parser = IPTVParser("Kanallar/KekikAkademi.m3u")
-    parser.run()
\ No newline at end of file
+    argumanlar = ArgumentParser(description="M3U listesindeki yayınları kontrol eder")
+    argumanlar.add_argument("--derin", nargs="?", const=True, default=False, choices=["hepsi"], help="master » varyant » segment zincirini takip et; --derin=hepsi ile tüm varyantlar")
+    derin      = argumanlar.parse_args().derin
+
+    parser = IPTVParser("Kanallar/KekikAkademi.m3u", derin=derin)
+    parser.run()
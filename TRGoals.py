@@ -1,38 +1,92 @@
 # ! Bu araç @keyiflerolsun tarafından | @KekikAkademi için yazılmıştır.
 
-from Kekik.cli import konsol
-from httpx     import Client
-from parsel    import Selector
+from Kekik.cli    import konsol
+from httpx        import AsyncClient
+from parsel       import Selector
+from asyncio      import create_task, gather, run, CancelledError
+from time         import perf_counter, time
+from os           import getenv, path, makedirs, replace
+from json         import load, dump
+from urllib.parse import urlparse
 import re
 
+class Onbellek:
+    "Süreli (TTL) anahtar-değer önbelleği, iş akışı çalışmaları arasında JSON dosyada saklanır"
+    def __init__(self, dosya: str):
+        self.dosya    = dosya
+        self.kayitlar = {}
+
+        if path.isfile(dosya):
+            with open(dosya, "r", encoding="utf-8") as kaynak:
+                self.kayitlar = load(kaynak)
+
+    def al(self, anahtar: str, ttl: int):
+        kayit = self.kayitlar.get(anahtar)
+        if kayit and time() - kayit["zaman"] < ttl:
+            return kayit["deger"]
+
+        return None
+
+    def koy(self, anahtar: str, deger):
+        self.kayitlar[anahtar] = {"deger": deger, "zaman": time()}
+
+    def sil(self, anahtar: str):
+        self.kayitlar.pop(anahtar, None)
+
+    def kaydet(self):
+        if dizin := path.dirname(self.dosya):
+            makedirs(dizin, exist_ok=True)
+
+        gecici = f"{self.dosya}.tmp"
+        with open(gecici, "w", encoding="utf-8") as hedef:
+            dump(self.kayitlar, hedef, ensure_ascii=False, indent=2)
+
+        replace(gecici, self.dosya)
+
 class TRGoals:
-    def __init__(self, m3u_dosyasi):
-        self.m3u_dosyasi = m3u_dosyasi
-        self.httpx       = Client(timeout=10)
+    YONLENDIRME_TTL = 24 * 3600
+    DOMAIN_TTL      = 6 * 3600
+    KIMLIK_TTL      = 3600
+
+    def __init__(self, m3u_dosyasi, cozucu: str | None = None, tahmin_sayisi: int = 3, onbellek_dosyasi: str | None = None):
+        self.m3u_dosyasi   = m3u_dosyasi
+        self.httpx         = AsyncClient(timeout=10)
+        self.cozucu        = cozucu or getenv("COZUCU_API", "http://10.0.2.0:1221")
+        self.tahmin_sayisi = tahmin_sayisi
+        self.m3u_icerik    = None
+        self.onbellek      = Onbellek(onbellek_dosyasi or getenv("TRGOALS_ONBELLEK", path.expanduser("~/.cache/IPTV_YenirMi/TRGoals.json")))
+
+    def m3u_oku(self) -> str:
+        if self.m3u_icerik is None:
+            with open(self.m3u_dosyasi, "r", encoding="utf-8", newline="") as dosya:
+                self.m3u_icerik = dosya.read()
+
+        return self.m3u_icerik
 
     def referer_domainini_al(self):
         referer_deseni = r'#EXTVLCOPT:http-referrer=(https?://[^/]*trgoals[^/]*\.[^\s/]+)'
-        with open(self.m3u_dosyasi, "r") as dosya:
-            icerik = dosya.read()
-
-        if eslesme := re.search(referer_deseni, icerik):
+        if eslesme := re.search(referer_deseni, self.m3u_oku()):
             return eslesme[1]
         else:
             raise ValueError("M3U dosyasında 'trgoals' içeren referer domain bulunamadı!")
 
-    def trgoals_domaini_al(self):
-        istek        = self.httpx.post("http://10.0.2.0:1221/api/v1/cf", json={"url": "https://bit.ly/m/taraftarium24w"})
+    async def trgoals_domaini_al(self):
+        istek        = await self.httpx.post(f"{self.cozucu}/api/v1/cf", json={"url": "https://bit.ly/m/taraftarium24w"})
         # redirect_url = re.search(r"href=\"([^\"]*redirect[^\"]*)\"", istek.text)[1]
         secici       = Selector(istek.text)
         redirect_url = secici.xpath("(//section[@class='links']/a)[1]/@href").get()
 
         while "bit.ly" in redirect_url:
-            redirect_url = self.redirect_gec(redirect_url)
+            redirect_url = await self.redirect_gec(redirect_url)
 
         return redirect_url
 
-    def redirect_gec(self, redirect_url:str):
-        istek        = self.httpx.post("http://10.0.2.0:1221/api/v1/url", json={"url": redirect_url})
+    async def redirect_gec(self, redirect_url:str, onbellek: bool = True):
+        anahtar = f"redirect:{redirect_url}"
+        if onbellek and (domain := self.onbellek.al(anahtar, self.YONLENDIRME_TTL)):
+            return domain
+
+        istek        = await self.httpx.post(f"{self.cozucu}/api/v1/url", json={"url": redirect_url})
         redirect_url = istek.json().get("url")
 
         domain = redirect_url[:-1] if redirect_url.endswith("/") else redirect_url
@@ -40,57 +94,149 @@ class TRGoals:
         if "error" in domain:
             raise ValueError("Redirect domain hatalı..")
 
+        self.onbellek.koy(anahtar, domain)
         return domain
 
-    def yeni_domaini_al(self, eldeki_domain: str) -> str:
-        def check_domain(domain: str) -> str:
+    @staticmethod
+    def tahmini_domainler(eldeki_domain: str, adet: int) -> list[str]:
+        "trgoalsN.xyz için N+1..N+adet adayları; numarasız ya da farklı yapıdaki domainde tahmin yapılmaz"
+        try:
+            rakam = int(eldeki_domain.split("trgoals")[1].split(".")[0])
+        except (IndexError, ValueError):
+            return []
+
+        return [f"https://trgoals{rakam + adim}.xyz" for adim in range(1, adet + 1)]
+
+    async def domain_tahmin_et(self, domain: str) -> str:
+        istek = await self.httpx.get(domain, follow_redirects=True)
+        if istek.status_code >= 400:
+            raise ValueError(f"{domain} » {istek.status_code}")
+
+        return domain
+
+    async def kaynak_calistir(self, kaynak: str, islem) -> str:
+        baslangic = perf_counter()
+        try:
+            domain = await islem
             if domain == "https://trgoalsgiris.xyz":
                 raise ValueError("Yeni domain alınamadı")
-            return domain
+        except CancelledError:
+            konsol.log(f"[yellow][~] {kaynak:<40} » {perf_counter() - baslangic:.2f}s » iptal edildi")
+            raise
+        except Exception as hata:
+            konsol.log(f"[red][!] {kaynak:<40} » {perf_counter() - baslangic:.2f}s » {type(hata).__name__}")
+            raise
 
+        konsol.log(f"[cyan][~] {kaynak:<40} » {perf_counter() - baslangic:.2f}s » {domain}")
+        return domain
+
+    async def yeni_domaini_al(self, eldeki_domain: str, yonlenen: str | None = None) -> str:
+        # ? Eldeki domainin yönlendirmesi, domain değişikliğinin asıl işareti; bu çalışmada alındıysa diğer kaynaklara gerek yok
+        if yonlenen and yonlenen != "https://trgoalsgiris.xyz":
+            konsol.log("[green][+] Kazanan Kaynak : redirect_gec(eldeki_domain)")
+            return yonlenen
+
+        # ! Yönlendirme alınamadıysa (yonlenen None) tekrar sorulmaz, yarışa yalnızca diğer kaynaklar girer
+        tahminler = self.tahmini_domainler(eldeki_domain, self.tahmin_sayisi)
+        kaynaklar = [
+            ("trgoals_domaini_al()"                   , self.trgoals_domaini_al()),
+            ("redirect_gec('https://t.co/MTLoNVkGQN')", self.redirect_gec("https://t.co/MTLoNVkGQN")),
+        ]
+        kaynaklar += [(f"tahmin({tahmin.split('//')[1]})", self.domain_tahmin_et(tahmin)) for tahmin in tahminler]
+
+        # ! Tüm kaynaklar aynı anda çalışır, sonuç öncelik sırasıyla seçilir; kazanan bulununca kalanlar iptal edilir
+        gorevler = [(kaynak, create_task(self.kaynak_calistir(kaynak, islem))) for kaynak, islem in kaynaklar]
         try:
-            # İlk kontrol: Redirect geçiş
-            yeni_domain = check_domain(self.redirect_gec(eldeki_domain))
-        except Exception:
-            konsol.log("[red][!] `redirect_gec(eldeki_domain)` fonksiyonunda hata oluştu.")
-            try:
-                # İkinci kontrol: trgoals domainini al
-                yeni_domain = check_domain(self.trgoals_domaini_al())
-            except Exception:
-                konsol.log("[red][!] `trgoals_domaini_al` fonksiyonunda hata oluştu.")
+            for kaynak, gorev in gorevler:
                 try:
-                    # Üçüncü kontrol: Alternatif bir URL üzerinden redirect geç
-                    yeni_domain = check_domain(self.redirect_gec("https://t.co/MTLoNVkGQN"))
+                    yeni_domain = await gorev
                 except Exception:
-                    konsol.log("[red][!] `redirect_gec('https://t.co/MTLoNVkGQN')` fonksiyonunda hata oluştu.")
-                    # Son çare: Yeni bir domain üret
-                    rakam = int(eldeki_domain.split("trgoals")[1].split(".")[0]) + 1
-                    yeni_domain = f"https://trgoals{rakam}.xyz"
+                    continue
+
+                konsol.log(f"[green][+] Kazanan Kaynak : {kaynak}")
+                return yeni_domain
+        finally:
+            for _, gorev in gorevler:
+                gorev.cancel()
+
+            await gather(*(gorev for _, gorev in gorevler), return_exceptions=True)
+
+        if not tahminler:
+            raise ValueError(f"Hiçbir kaynak doğrulanamadı, {eldeki_domain} için domain tahmin edilemiyor!")
 
-        return yeni_domain
+        # Son çare: Yeni bir domain üret
+        konsol.log("[red][!] Hiçbir kaynak doğrulanamadı, domain tahmin ediliyor.")
+        return tahminler[0]
 
-    def m3u_guncelle(self):
+    async def kanal_sayfasi(self, domain: str, kimlik: dict):
+        # ? Kimlik yalnızca bu isteğe eklenir; ortak istemci, başka domainlere giden isteklere taşımamalı
+        basliklar = dict(kimlik["headers"])
+        if kimlik["cookies"]:
+            basliklar["Cookie"] = "; ".join(f"{anahtar}={deger}" for anahtar, deger in kimlik["cookies"].items())
+
+        return await self.httpx.get(f"{domain}/channel.html?id=yayin1", headers=basliklar, follow_redirects=True)
+
+    async def eldeki_domain_yonlendirmesi(self, eldeki_domain: str) -> str | None:
+        try:
+            return await self.redirect_gec(eldeki_domain, onbellek=False)
+        except Exception as hata:
+            konsol.log(f"[yellow][~] Eldeki domainin yönlendirmesi alınamadı : {type(hata).__name__}")
+            return None
+
+    async def onbellekteki_domain(self, eldeki_domain: str, yonlenen: str | None) -> tuple:
+        "Eldeki domain hâlâ önbellekteki domaine yönleniyor, kimlik de yayin1 sayfasını veriyorsa keşif zinciri atlanır"
+        domain = self.onbellek.al(f"domain:{eldeki_domain}", self.DOMAIN_TTL)
+        if domain and (not yonlenen or urlparse(yonlenen).netloc.lower() != urlparse(domain).netloc.lower()):
+            # ! Yönlendirme başka bir hosta gidiyorsa domain değişmiştir; önbellek bu işareti gizlememeli
+            konsol.log(f"[yellow][~] Önbellekteki domain güncel değil : {domain} » {yonlenen}")
+            self.onbellek.sil(f"domain:{eldeki_domain}")
+            return None, None
+
+        kimlik = self.onbellek.al(f"kimlik:{domain}", self.KIMLIK_TTL) if domain else None
+        if not kimlik:
+            return None, None
+
+        try:
+            response = await self.kanal_sayfasi(domain, kimlik)
+        except Exception as hata:
+            konsol.log(f"[yellow][~] Önbellekteki domain doğrulanamadı : {type(hata).__name__}")
+            response = None
+
+        if response is None or "var baseurl" not in response.text:
+            self.onbellek.sil(f"domain:{eldeki_domain}")
+            return None, None
+
+        konsol.log(f"[green][+] Önbellekteki Domain Geçerli : {domain}")
+        return domain, response
+
+    async def m3u_guncelle(self) -> list[dict]:
+        try:
+            return await self._m3u_guncelle()
+        finally:
+            self.onbellek.kaydet()
+            await self.httpx.aclose()
+
+    async def _m3u_guncelle(self) -> list[dict]:
         eldeki_domain = self.referer_domainini_al()
         konsol.log(f"[yellow][~] Bilinen Domain : {eldeki_domain}")
 
-        yeni_domain = self.yeni_domaini_al(eldeki_domain)
-        konsol.log(f"[green][+] Yeni Domain    : {yeni_domain}")
-
-        kontrol_url = f"{yeni_domain}/channel.html?id=yayin1"
+        yonlenen              = await self.eldeki_domain_yonlendirmesi(eldeki_domain)
+        yeni_domain, response = await self.onbellekteki_domain(eldeki_domain, yonlenen)
+        if not yeni_domain:
+            yeni_domain = await self.yeni_domaini_al(eldeki_domain, yonlenen)
 
-        with open(self.m3u_dosyasi, "r") as dosya:
-            m3u_icerik = dosya.read()
+        konsol.log(f"[green][+] Yeni Domain    : {yeni_domain}")
 
-        if not (eski_yayin_url := re.search(r'https?:\/\/[^\/]+\.(workers\.dev|shop|cfd)\/?', m3u_icerik)):
+        if not (eski_yayin_url := re.search(r'https?:\/\/[^\/]+\.(workers\.dev|shop|cfd)\/?', self.m3u_oku())):
             raise ValueError("M3U dosyasında eski yayın URL'si bulunamadı!")
 
         eski_yayin_url = eski_yayin_url[0]
         konsol.log(f"[yellow][~] Eski Yayın URL : {eski_yayin_url}")
 
-        kimlik   = self.httpx.post("http://10.0.2.0:1221/api/v1/kimlik", json={"url": yeni_domain}).json()
-        self.httpx.cookies.update(kimlik["cookies"])
-        self.httpx.headers.update(kimlik["headers"])
-        response = self.httpx.get(kontrol_url, follow_redirects=True)
+        if response is None:
+            kimlik   = (await self.httpx.post(f"{self.cozucu}/api/v1/kimlik", json={"url": yeni_domain})).json()
+            response = await self.kanal_sayfasi(yeni_domain, kimlik)
+            self.onbellek.koy(f"kimlik:{yeni_domain}", kimlik)
 
         if not (yayin_ara := re.search(r'var baseurl = "(https?:\/\/[^"]+)"', response.text)):
             secici = Selector(response.text)
@@ -101,16 +247,79 @@ class TRGoals:
             else:
                 konsol.print(response.text)
                 raise ValueError("Base URL bulunamadı!")
+        else:
+            # ? Sonraki çalışmada eldeki domain, yeni domain olacağı için ikisi de kaydedilir
+            self.onbellek.koy(f"domain:{eldeki_domain}", yeni_domain)
+            self.onbellek.koy(f"domain:{yeni_domain}", yeni_domain)
 
         yayin_url = yayin_ara[1]
         konsol.log(f"[green][+] Yeni Yayın URL : {yayin_url}")
 
-        yeni_m3u_icerik = m3u_icerik.replace(eski_yayin_url, yayin_url)
-        yeni_m3u_icerik = yeni_m3u_icerik.replace(eldeki_domain, yeni_domain)
+        return self.m3u_yeniden_yaz({eski_yayin_url: yayin_url, eldeki_domain: yeni_domain})
+
+    @staticmethod
+    def host_degistir(adres: str, degisimler: dict[str, str]) -> str:
+        for eski, yeni in degisimler.items():
+            if eski == yeni or not adres.startswith(eski):
+                continue
+
+            # ? https://trgoals12.xyz, https://trgoals123.xyz adresini değiştirmemeli
+            kalan = adres[len(eski):]
+            if eski.endswith("/") or not kalan or kalan[0] in "/:?#":
+                return yeni + kalan
+
+        return adres
+
+    def m3u_yeniden_yaz(self, degisimler: dict[str, str]) -> list[dict]:
+        "Host değişimlerini tek geçişte, yalnızca #EXTVLCOPT ve yayın satırlarına uygular; değişen kayıtları döndürür"
+        satirlar   = self.m3u_oku().splitlines(keepends=True)
+        degisenler = []
+        kanal      = None
+
+        for sira, satir in enumerate(satirlar):
+            govde      = satir.rstrip("\r\n")
+            satir_sonu = satir[len(govde):]
+            # ? Yorum satırına alınmış kayıtlar da ("# #EXTINF…") aynı şekilde güncellenir
+            onek       = "# " if govde.startswith("# ") else ""
+            govde      = govde[len(onek):]
+
+            if govde.startswith("#EXTINF"):
+                kanal = govde.rsplit(",", 1)[-1].strip()
+                continue
+            elif govde.startswith("#EXTVLCOPT:"):
+                anahtar, esittir, deger = govde.partition("=")
+                yeni_govde = anahtar + esittir + self.host_degistir(deger, degisimler)
+            elif govde.startswith("http"):
+                yeni_govde = self.host_degistir(govde, degisimler)
+            else:
+                continue
+
+            if yeni_govde != govde:
+                satirlar[sira] = onek + yeni_govde + satir_sonu
+                degisenler.append({"kanal": kanal, "satir": sira + 1, "eski": govde, "yeni": yeni_govde})
+
+        if not degisenler:
+            konsol.log("[yellow][~] M3U dosyasında değişiklik yok.")
+            return degisenler
+
+        for degisen in degisenler:
+            konsol.log(f"[cyan][~] {degisen['satir']:>4} » {degisen['kanal']} » {degisen['yeni']}")
 
-        with open(self.m3u_dosyasi, "w") as dosya:
-            dosya.write(yeni_m3u_icerik)
+        # ! Yarım kalmış bir yazma, listeyi bozmasın diye geçici dosya + rename
+        gecici = f"{self.m3u_dosyasi}.tmp"
+        with open(gecici, "w", encoding="utf-8", newline="") as dosya:
+            dosya.write("".join(satirlar))
+
+        replace(gecici, self.m3u_dosyasi)
+        self.m3u_icerik = "".join(satirlar)
+        konsol.log(f"[green][+] {len(degisenler)} satır güncellendi.")
+
+        return degisenler
 
 if __name__ == "__main__":
     guncelleyici = TRGoals("Kanallar/KekikAkademi.m3u")
-    guncelleyici.m3u_guncelle()
+    degisenler   = run(guncelleyici.m3u_guncelle())
+
+    if cikti := getenv("GITHUB_OUTPUT"):
+        with open(cikti, "a") as dosya:
+            dosya.write(f"degisiklik={'true' if degisenler else 'false'}\n")
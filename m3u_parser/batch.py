@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def _parse_source(path: str, useragent: str, timeout: int, enforce_schema: bool) -> tuple:
+    """Parses one playlist in a worker process, returns (streams information list, elapsed seconds, error)."""
+    try:
+        from m3u_parser import M3uParser
+    except ModuleNotFoundError:
+        from .m3u_parser import M3uParser
+
+    start = time.perf_counter()
+    try:
+        parser = M3uParser(useragent=useragent, timeout=timeout)
+        parser._enforce_schema = enforce_schema
+        # download, HTTP and file errors are raised, so the report tells them apart from an empty playlist
+        streams_info = [
+            parser._build_info(line_info, stream_link, http)
+            for line_info, stream_link, _, http in parser._iter_entries(parser._iter_source(path, raise_errors=True))
+        ]
+        error = None if streams_info else "No streams found"
+    except Exception as exc:
+        streams_info, error = [], "%s: %s" % (type(exc).__name__, exc)
+    return streams_info, time.perf_counter() - start, error
+
+
+def parse_many(
+    paths: list,
+    workers: int = None,
+    useragent: str = None,
+    timeout: int = 5,
+    enforce_schema: bool = True,
+) -> tuple:
+    """Parses many playlists in a process pool and merges them into one streams information list.
+
+    Every playlist is downloaded and parsed in its own worker, so the downloads of some playlists overlap with the
+    parsing of others. Streams are merged in the order of the given paths and tagged with their source.
+
+    :param paths: Urls/local filepaths of the playlists
+    :type paths: list
+    :param workers: Number of worker processes. Default: number of CPUs
+    :type workers: int
+    :param useragent: User-Agent used for downloading the playlists
+    :type useragent: str
+    :param timeout: Timeout for downloading the playlists
+    :type timeout: int
+    :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null
+    :type enforce_schema: bool
+    :return: Merged stream records list and per source report of streams count, elapsed time and error
+    :rtype: tuple
+    """
+    paths = list(dict.fromkeys(paths))
+    results = {}
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_parse_source, path, useragent, timeout, enforce_schema): path for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as exc:
+                results[path] = [], 0.0, "%s: %s" % (type(exc).__name__, exc)
+            streams_info, elapsed, error = results[path]
+            if error:
+                logging.error("%s: %s", path, error)
+            else:
+                logging.info("%s: %d streams in %.2fs", path, len(streams_info), elapsed)
+
+    merged, report = [], {}
+    for path in paths:
+        streams_info, elapsed, error = results[path]
+        for stream_info in streams_info:
+            stream_info["source"] = path
+        merged.extend(streams_info)
+        report[path] = {"streams": len(streams_info), "elapsed": round(elapsed, 3), "error": error}
+    return merged, report
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the hot paths of the parser.
+
+Run with ``python -m m3u_parser.benchmark <name> [--entries N]``.
+"""
+
+import argparse
+import random
+import re
+import subprocess
+import sys
+import time
+
+try:
+    from enrich import enrich_country, enrich_language, get_pycountry
+    from helper import get_by_regex, parse_extinf
+    from m3u_parser import M3uParser
+    from record import StreamRecord
+except ModuleNotFoundError:
+    from .enrich import enrich_country, enrich_language, get_pycountry
+    from .helper import get_by_regex, parse_extinf
+    from .m3u_parser import M3uParser
+    from .record import StreamRecord
+
+
+def synthetic_extinf_lines(entries: int, seed: int = 0) -> list:
+    """Builds #EXTINF lines looking like the ones of aggregated provider playlists."""
+    rnd = random.Random(seed)
+    countries = ["TR", "DE", "US", "GB", "FR", "TR;DE"]
+    languages = ["Turkish", "German", "English", "French"]
+    categories = ["Ulusal", "Haber", "Spor", "Belgesel", "Çocuk", "Müzik"]
+    lines = []
+    for i in range(entries):
+        lines.append(
+            '#EXTINF:-1 tvg-id="chan.{0}" tvg-name="Channel {0}" tvg-chno="{0}" tvg-language="{1}" '
+            'tvg-country="{2}" tvg-logo="https://cdn.example.com/logos/{0}.png" catchup="default" '
+            'group-title="{3}",Channel {0}'.format(
+                i, rnd.choice(languages), rnd.choice(countries), rnd.choice(categories)
+            )
+        )
+    return lines
+
+
+def _regex_path(lines: list) -> None:
+    flags = re.IGNORECASE
+    regexes = [
+        re.compile(r"(?!.*=\",?.*\")[,](.*?)$", flags=flags),
+        re.compile(r"tvg-logo=\"(.*?)\"", flags=flags),
+        re.compile(r"group-title=\"(.*?)\"", flags=flags),
+        re.compile(r"tvg-id=\"(.*?)\"", flags=flags),
+        re.compile(r"tvg-name=\"(.*?)\"", flags=flags),
+        re.compile(r"tvg-url=\"(.*?)\"", flags=flags),
+        re.compile(r"tvg-country=\"(.*?)\"", flags=flags),
+        re.compile(r"tvg-language=\"(.*?)\"", flags=flags),
+    ]
+    for line in lines:
+        for regex in regexes:
+            get_by_regex(regex, line)
+
+
+def _lexer_path(lines: list) -> None:
+    for line in lines:
+        parse_extinf(line)
+
+
+def _timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_lexer(entries: int) -> None:
+    lines = synthetic_extinf_lines(entries)
+    regex_time = _timed(_regex_path, lines)
+    lexer_time = _timed(_lexer_path, lines)
+    print("#EXTINF lines     : %d" % entries)
+    print("per-attribute regex: %.3fs (%.2f us/line)" % (regex_time, regex_time / entries * 1e6))
+    print("attribute lexer    : %.3fs (%.2f us/line)" % (lexer_time, lexer_time / entries * 1e6))
+    print("speedup            : %.1fx" % (regex_time / lexer_time))
+
+
+def _import_time(statement: str) -> float:
+    code = "import time; start = time.perf_counter(); %s; print(time.perf_counter() - start)" % statement
+    return float(subprocess.check_output([sys.executable, "-c", code]))
+
+
+def _pycountry_path(attributes: list) -> None:
+    pycountry = get_pycountry()
+    for country, language in attributes:
+        country_obj = pycountry.countries.get(alpha_2=country)
+        language_obj = pycountry.languages.get(name=language)
+        {"code": country, "name": country_obj.name if country_obj else None}
+        {"code": language_obj.alpha_3 if language_obj else None, "name": language}
+
+
+def _enrich_path(attributes: list) -> None:
+    for country, language in attributes:
+        enrich_country(country)
+        enrich_language(language)
+
+
+def bench_enrich(entries: int) -> None:
+    attributes = [parse_extinf(line)[0] for line in synthetic_extinf_lines(entries)]
+    attributes = [(attrs["tvg-country"], attrs["tvg-language"]) for attrs in attributes]
+    eager = _import_time("import pycountry")
+    # most of it is aiohttp and requests, the deferred pycountry import only moves its own cost to the first lookup
+    package = _import_time("from m3u_parser import M3uParser")
+    first = _import_time("from m3u_parser.enrich import enrich_country; enrich_country('TR')")
+    pycountry_time = _timed(_pycountry_path, attributes)
+    enrich_time = _timed(_enrich_path, attributes)
+    print("cold start, import pycountry        : %.1fms" % (eager * 1e3))
+    print("cold start, import m3u_parser       : %.1fms" % (package * 1e3))
+    print("cold start, first enrichment        : %.1fms" % (first * 1e3))
+    print("streams                              : %d" % entries)
+    print("pycountry lookups : %.3fs (%.2f us/entry)" % (pycountry_time, pycountry_time / entries * 1e6))
+    print("memoized enrich   : %.3fs (%.2f us/entry)" % (enrich_time, enrich_time / entries * 1e6))
+
+
+def synthetic_records(entries: int, seed: int = 0) -> list:
+    """Builds stream records without going through the parser."""
+    rnd = random.Random(seed)
+    records = []
+    for i, line in enumerate(synthetic_extinf_lines(entries, seed)):
+        attributes, title = parse_extinf(line)
+        extension = rnd.choice(["m3u8", "m3u8", "ts", "mp4"])
+        records.append(
+            StreamRecord(
+                url="https://cdn%d.example.com/live/%d.%s" % (i % 7, i, extension),
+                name=title,
+                category=attributes["group-title"],
+                tvg_id=attributes["tvg-id"],
+                country_code=attributes["tvg-country"],
+                language_name=attributes["tvg-language"],
+                schema=True,
+            )
+        )
+    return records
+
+
+def _legacy_filter_by(streams_info: list, key: str, filters: list, retrieve: bool = True, nested_key: bool = False):
+    key_0, key_1 = key.split("-") if nested_key else ("", "")
+    any_or_all = any if retrieve else all
+    not_operator = lambda x: x if retrieve else not x
+    return list(
+        filter(
+            lambda stream_info: any_or_all(
+                not_operator(
+                    re.search(
+                        re.compile(fltr, flags=re.IGNORECASE),
+                        stream_info.get(key_0, {}).get(key_1, "") if nested_key else stream_info.get(key, ""),
+                    )
+                )
+                for fltr in filters
+            ),
+            streams_info,
+        )
+    )
+
+
+def bench_filters(entries: int) -> None:
+    records = synthetic_records(entries)
+    dicts = [record.to_dict() for record in records]
+
+    def legacy():
+        streams_info = _legacy_filter_by(dicts, "category", ["Spor", "Haber", "Belgesel"])
+        streams_info = _legacy_filter_by(streams_info, "country-code", ["TR", "DE"], nested_key=True)
+        streams_info = _legacy_filter_by(streams_info, "url", ["mp4"], retrieve=False)
+        streams_info = _legacy_filter_by(streams_info, "name", ["Channel 1", "Channel 2"])
+        return len(streams_info)
+
+    parser = M3uParser()
+    parser._streams_info_backup = records
+
+    def engine():
+        parser.reset_operations()
+        parser.retrieve_by_category(["Spor", "Haber", "Belgesel"])
+        parser.filter_by("country-code", ["TR", "DE"], nested_key=True, exact=True)
+        parser.remove_by_extension("mp4")
+        parser.filter_by("name", ["Channel 1", "Channel 2"])
+        return len(parser._streams_info)
+
+    legacy_time = _timed(legacy)
+    cold_time = _timed(engine)
+    warm_time = _timed(engine)
+    print("streams                                : %d" % entries)
+    print("chained filters, per-stream re.compile : %.3fs" % legacy_time)
+    print("chained filters, query engine (cold)   : %.3fs" % cold_time)
+    print("chained filters, query engine (warm)   : %.3fs" % warm_time)
+    print("speedup cold/warm                      : %.1fx/%.1fx" % (legacy_time / cold_time, legacy_time / warm_time))
+
+
+BENCHMARKS = {
+    "lexer": (bench_lexer, 100_000),
+    "enrich": (bench_enrich, 100_000),
+    "filters": (bench_filters, 500_000),
+}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("name", choices=sorted(BENCHMARKS))
+    arg_parser.add_argument("--entries", type=int, default=None)
+    args = arg_parser.parse_args()
+    bench, default_entries = BENCHMARKS[args.name]
+    bench(args.entries or default_entries)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+from typing import Union
+
+import aiohttp
+
+try:
+    from health import HealthStore, check_mode
+    from hls import is_playlist, parse_master, parse_media
+except ModuleNotFoundError:
+    from .health import HealthStore, check_mode
+    from .hls import is_playlist, parse_master, parse_media
+
+
+class CheckStats:
+    """Statistics of a liveness check run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.good = 0
+        self.bad = 0
+        self.errors = 0
+        self.skipped = 0
+        self.revalidated = 0
+        self.latencies = []
+
+    @property
+    def total(self) -> int:
+        return self.good + self.bad
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Checked streams per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent: float) -> Union[float, None]:
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))], 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "good": self.good,
+            "bad": self.bad,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "revalidated": self.revalidated,
+            "elapsed": round(self.elapsed, 3),
+            "throughput": round(self.throughput, 2),
+            "latency": {
+                "avg": round(sum(self.latencies) / len(self.latencies), 3) if self.latencies else None,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+            },
+        }
+
+    def __repr__(self):
+        return "CheckStats(%s)" % self.to_dict()
+
+
+class LivenessChecker:
+    """Checks if stream links are working over one shared connection pool.
+
+    All checks share one session and connector, limited in total and per host connections, with cached DNS. The number
+    of checks in flight is capped by a semaphore. A stream is first probed with HEAD and, if that is not answered with
+    200 or the url is a playlist, with a ranged GET that only reads the first bytes of the body. A playlist is only
+    GOOD if those start with #EXTM3U.
+
+    In deep mode a HLS stream is only GOOD if its whole chain works: the master playlist is parsed, the highest
+    bandwidth variant (or every variant with deep="all") is followed to its media playlist and the first bytes of the
+    newest segment are range-requested. The latency of every step and the delivered segment bitrate are kept in
+    reports, keyed by the stream url. The latency of every checked stream is kept in latencies, keyed by its url.
+
+    With a HealthStore, streams with a recent result are not probed again (see HealthStore) and the others are probed
+    with a conditional HEAD using the ETag/Last-Modified of their last result, a 304 answer counts as GOOD.
+
+    :Example
+
+    >>> async with LivenessChecker(timeout=5) as checker:
+    ...     status = await checker.check("https://example.com/live.m3u8")
+    >>> checker.stats.to_dict()
+    >>> async with LivenessChecker(deep=True) as checker:
+    ...     status = await checker.check("https://example.com/master.m3u8")
+    >>> checker.reports["https://example.com/master.m3u8"]["variants"][0]["bitrate"]
+    2480000
+    """
+
+    manifest_extensions = (".m3u8", ".m3u")
+    head_bytes = 1024
+    playlist_bytes = 1 << 20
+    segment_bytes = 1 << 16
+
+    def __init__(
+        self,
+        headers: dict = None,
+        timeout: int = 5,
+        concurrency: int = 100,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        ttl_dns_cache: int = 300,
+        deep: Union[bool, str] = False,
+        health: HealthStore = None,
+    ):
+        self._headers = headers or {}
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._concurrency = concurrency
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._ttl_dns_cache = ttl_dns_cache
+        self._deep = deep
+        self._mode = check_mode(deep)
+        self._health = health
+        self._semaphore = None
+        self._session = None
+        self.stats = CheckStats()
+        self.reports = {}
+        self.latencies = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self._limit,
+            limit_per_host=self._limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self._ttl_dns_cache,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, headers=self._headers, timeout=self._timeout)
+        self.stats = CheckStats()
+        self.reports = {}
+        self.latencies = {}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._health is not None:
+            self._health.flush()
+        self.stats.finished = time.perf_counter()
+
+    @staticmethod
+    def _validators(response: aiohttp.ClientResponse) -> tuple:
+        return response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    async def _probe(self, url: str, headers: Union[dict, None], entry: dict = None) -> tuple:
+        """Returns (alive, (etag, last modified)), the HEAD is conditional if the last result has validators."""
+        conditional = dict(headers or {})
+        if entry and entry["etag"]:
+            conditional["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        async with self._session.head(url, headers=conditional or None, allow_redirects=True) as response:
+            if response.status == 304:
+                self.stats.revalidated += 1
+                return True, self._validators(response)
+            # a playlist answering HEAD may still serve an error page, its first bytes are checked below
+            if response.status == 200 and not response.url.path.lower().endswith(self.manifest_extensions):
+                return True, self._validators(response)
+        ranged = dict(headers or {}, Range="bytes=0-%d" % (self.head_bytes - 1))
+        async with self._session.get(url, headers=ranged) as response:
+            if response.status not in (200, 206):
+                return False, (None, None)
+            if response.url.path.lower().endswith(self.manifest_extensions):
+                first_bytes = await response.content.read(self.head_bytes)
+                alive = first_bytes.lstrip(b"\xef\xbb\xbf \r\n\t").startswith(b"#EXTM3U")
+                return alive, self._validators(response) if alive else (None, None)
+            return True, self._validators(response)
+
+    @staticmethod
+    async def _read(response: aiohttp.ClientResponse, limit: int) -> bytes:
+        chunks, size = [], 0
+        while size < limit:
+            chunk = await response.content.read(limit - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return b"".join(chunks)
+
+    async def _get_step(self, step: str, url: str, headers: Union[dict, None], limit: int, steps: list) -> tuple:
+        """GETs the first limit bytes of url and appends the step to steps, returns (status, body, url, elapsed)."""
+        start = time.perf_counter()
+        async with self._session.get(url, headers=headers) as response:
+            body = await self._read(response, limit) if response.status in (200, 206) else b""
+            elapsed = time.perf_counter() - start
+            steps.append({"step": step, "url": url, "status": response.status, "latency": round(elapsed, 3)})
+            return response.status, body, str(response.url), elapsed
+
+    async def _probe_variant(self, variant: dict, headers: Union[dict, None], content: str = None) -> dict:
+        result = dict(variant, status="BAD", steps=[], bitrate=None)
+        step = "media"
+        try:
+            base_url = variant["url"]
+            if content is None:
+                status, body, base_url, _ = await self._get_step(
+                    step, variant["url"], headers, self.playlist_bytes, result["steps"]
+                )
+                if status != 200:
+                    result["error"] = "media: HTTP %d" % status
+                    return result
+                content = body.decode("utf-8", "replace")
+                if not is_playlist(content):
+                    result["error"] = "media: not a playlist"
+                    return result
+            segments = parse_media(content, base_url)
+            if not segments:
+                result["error"] = "media: no segments"
+                return result
+            step = "segment"
+            ranged = dict(headers or {}, Range="bytes=0-%d" % (self.segment_bytes - 1))
+            status, body, _, elapsed = await self._get_step(
+                step, segments[-1], ranged, self.segment_bytes, result["steps"]
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            result["error"] = "%s: %s" % (step, type(exc).__name__)
+            return result
+        if status not in (200, 206) or not body:
+            result["error"] = "segment: HTTP %d" % status
+            return result
+        result["bitrate"] = int(len(body) * 8 / elapsed) if elapsed else None
+        result["status"] = "GOOD"
+        return result
+
+    async def _deep_probe(self, url: str, headers: Union[dict, None]) -> dict:
+        report = {"url": url, "status": "BAD", "steps": [], "variants": []}
+        status, body, final_url, _ = await self._get_step("master", url, headers, self.playlist_bytes, report["steps"])
+        if status != 200:
+            report["error"] = "master: HTTP %d" % status
+            return report
+        content = body.decode("utf-8", "replace")
+        if not is_playlist(content):
+            # not HLS, eg. a direct .ts/.mp4 stream, answering is enough
+            if final_url.split("?")[0].lower().endswith(self.manifest_extensions):
+                report["error"] = "master: not a playlist"
+            else:
+                report["status"] = "GOOD"
+            return report
+        variants = parse_master(content, final_url)
+        if variants:
+            followed = variants if self._deep == "all" else variants[:1]
+            results = await asyncio.gather(*(self._probe_variant(variant, headers) for variant in followed))
+        else:
+            # the url already is a media playlist
+            media = {"url": final_url, "bandwidth": None, "resolution": None}
+            results = [await self._probe_variant(media, headers, content=content)]
+        report["variants"] = list(results)
+        if all(result["status"] == "GOOD" for result in results):
+            report["status"] = "GOOD"
+        else:
+            report["error"] = next(result["error"] for result in results if result["status"] != "GOOD")
+        return report
+
+    async def deep_check(self, url: str, headers: dict = None) -> dict:
+        """Checks the whole master playlist -> media playlist -> segment chain of a HLS stream.
+
+        :param url: Stream link
+        :type url: str
+        :param headers: Extra headers for this stream, eg. User-Agent/Referer from #EXTVLCOPT
+        :type headers: dict
+        :return: Report with status, per step url/status/latency and per variant steps and delivered bitrate
+        :rtype: dict
+        """
+        try:
+            return await self._deep_probe(url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            self.stats.errors += 1
+            return {"url": url, "status": "BAD", "steps": [], "variants": [], "error": "master: %s" % type(exc).__name__}
+
+    async def check(self, url: str, headers: dict = None) -> str:
+        """Checks if the stream link is working.
+
+        :param url: Stream link
+        :type url: str
+        :param headers: Extra headers for this stream, eg. User-Agent/Referer from #EXTVLCOPT
+        :type headers: dict
+        :return: GOOD or BAD
+        :rtype: str
+        """
+        entry = self._health.get(url, headers, self._mode) if self._health is not None else None
+        cached = self._health.cached_status(entry) if entry else None
+        if cached is not None:
+            self.stats.skipped += 1
+            alive = cached == "GOOD"
+            self.latencies[url] = entry["latency"]
+        else:
+            async with self._semaphore:
+                start = time.perf_counter()
+                validators = (None, None)
+                if self._deep:
+                    self.reports[url] = await self.deep_check(url, headers)
+                    alive = self.reports[url]["status"] == "GOOD"
+                else:
+                    try:
+                        alive, validators = await self._probe(url, headers, entry)
+                    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                        alive = False
+                        self.stats.errors += 1
+                latency = time.perf_counter() - start
+                self.stats.latencies.append(latency)
+                self.latencies[url] = latency
+            if self._health is not None:
+                self._health.update(url, headers, "GOOD" if alive else "BAD", latency, *validators, mode=self._mode)
+        if alive:
+            self.stats.good += 1
+        else:
+            self.stats.bad += 1
+        return "GOOD" if alive else "BAD"
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable
+
+# query parameters carrying per session tokens/expiry, they differ between two copies of the same stream link
+volatile_params = frozenset(
+    (
+        "auth",
+        "e",
+        "exp",
+        "expires",
+        "h",
+        "hash",
+        "hdnts",
+        "key",
+        "md5",
+        "nonce",
+        "session",
+        "sid",
+        "sig",
+        "signature",
+        "st",
+        "t",
+        "timestamp",
+        "tkn",
+        "token",
+        "ts",
+        "uid",
+        "wmsauthsign",
+    )
+)
+default_ports = {"http": 80, "https": 443, "ftp": 21}
+# playback fields moved together when a fallback replaces the primary link of a channel
+playback_slots = ("url", "user_agent", "referrer", "status", "source")
+# descriptive fields a channel takes from its fallbacks when it has none of its own
+metadata_slots = (
+    "name",
+    "logo",
+    "category",
+    "tvg_id",
+    "tvg_name",
+    "tvg_url",
+    "country_code",
+    "country_name",
+    "language_code",
+    "language_name",
+)
+status_ranks = {"GOOD": 0, None: 1, "BAD": 2}
+_bracket_regex = re.compile(r"[(\[].*?[)\]]")
+_word_regex = re.compile(r"[^\W_]+")
+# quality markers and backup notes that are not part of a channel name, resolutions like 1080p are matched apart
+quality_words = frozenset(("hd", "uhd", "fhd", "sd", "4k", "8k", "hevc", "h264", "h265", "backup", "yedek"))
+_slashes_regex = re.compile(r"/{2,}")
+
+
+def canonical_url(url: str) -> str:
+    """Returns the key of a stream link that is the same for its copies.
+
+    The scheme, user:pass, default port, fragment and token/expiry query parameters are dropped, the host is
+    lowercased, repeated slashes are collapsed and the remaining query parameters are sorted. The link is split with
+    plain string operations, as urlsplit/parse_qsl dominate the time on millions of links.
+
+    :param url: Stream link
+    :type url: str
+    :rtype: str
+    """
+    scheme, separator, rest = url.strip().partition("://")
+    if not separator:
+        return url.strip()
+    rest = rest.partition("#")[0]
+    rest, _, query = rest.partition("?")
+    netloc, slash, path = rest.partition("/")
+    host = netloc.rpartition("@")[2].lower()
+    name, colon, port = host.rpartition(":")
+    if not (colon and port.isdigit()):
+        name, port = host, ""
+    host = name.rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if port and int(port) != default_ports.get(scheme.lower()):
+        host = "%s:%s" % (host, port)
+    path = "/" + path
+    if "//" in path:
+        path = _slashes_regex.sub("/", path)
+    if query:
+        query = "&".join(
+            sorted(param for param in query.split("&") if param and param.partition("=")[0].lower() not in volatile_params)
+        )
+    return "%s%s?%s" % (host, path, query) if query else host + path
+
+
+@lru_cache(maxsize=1 << 18)
+def canonical_name(name: str) -> str:
+    """Returns the key of a channel name that is the same for its spellings.
+
+    Accents, case, bracketed notes, quality markers (HD, FHD, 1080p, backup...) and punctuation are dropped, eg.
+    "TRT 1 HD", "trt1 (Yedek)" and "TRT-1" all give "trt1".
+
+    :param name: Channel name
+    :type name: str
+    :rtype: str
+    """
+    name = name.casefold()
+    if "(" in name or "[" in name:
+        name = _bracket_regex.sub(" ", name)
+    if not name.isascii():
+        name = "".join(char for char in unicodedata.normalize("NFKD", name) if not unicodedata.combining(char))
+    return "".join(
+        word
+        for word in _word_regex.findall(name)
+        if word not in quality_words and not (word[-1] in "pi" and word[:-1].isdigit() and 3 <= len(word) - 1 <= 4)
+    )
+
+
+def _url_key(record) -> str:
+    return canonical_url(record.url)
+
+
+def _tvg_id_key(record) -> str:
+    return (record.tvg_id or "").strip().casefold()
+
+
+def _name_key(record) -> str:
+    name = record.tvg_name or record.name
+    return canonical_name(name) if name else ""
+
+
+key_functions = {"url": _url_key, "tvg_id": _tvg_id_key, "name": _name_key}
+
+
+def group_duplicates(records: list, keys: tuple = ("url", "tvg_id", "name")) -> list:
+    """Groups the records of the same channel.
+
+    Two records are duplicates if any of their canonical keys are equal, the groups are the connected components
+    found with a union-find over the hashed keys, so it runs in near linear time.
+
+    :param records: Stream records
+    :type records: list
+    :param keys: Canonical keys to compare, url/tvg_id/name
+    :type keys: tuple
+    :return: Groups of record positions, in the order of their first record
+    :rtype: list
+    """
+    parents = list(range(len(records)))
+
+    def find(position):
+        root = position
+        while parents[root] != root:
+            root = parents[root]
+        while parents[position] != root:
+            parents[position], position = root, parents[position]
+        return root
+
+    for key in keys:
+        if key not in key_functions:
+            raise ValueError("Unknown deduplication key: %s" % key)
+        get_key = key_functions[key]
+        first_seen = {}
+        for position, record in enumerate(records):
+            value = get_key(record)
+            if not value:
+                continue
+            first = first_seen.setdefault(value, position)
+            if first != position:
+                root, other = find(position), find(first)
+                if root != other:
+                    # the root is always the first record of the group
+                    parents[max(root, other)] = min(root, other)
+    groups = {}
+    for position in range(len(records)):
+        groups.setdefault(find(position), []).append(position)
+    return list(groups.values())
+
+
+def rank_records(records: list, latency: Callable = None) -> list:
+    """Orders the records of a channel from the best to the worst link.
+
+    GOOD links come first, then unchecked ones and BAD ones last, each ordered by their measured latency if known
+    and then by their position.
+
+    :param records: Stream records of one channel
+    :type records: list
+    :param latency: Returns the measured latency of a record in seconds, or None
+    :type latency: Callable
+    :rtype: list
+    """
+
+    def rank(item):
+        position, record = item
+        seconds = latency(record) if latency is not None else None
+        return status_ranks.get(record.status, 1), float("inf") if seconds is None else seconds, position
+
+    return [record for _, record in sorted(enumerate(records), key=rank)]
+
+
+def deduplicate(records: list, keys: tuple = ("url", "tvg_id", "name"), latency: Callable = None) -> list:
+    """Merges the duplicates of every channel into one record with ranked fallback links.
+
+    The best ranked record of a group (see rank_records) is kept, the others become its fallbacks and fill the
+    descriptive fields it is missing.
+
+    :param records: Stream records
+    :type records: list
+    :param keys: Canonical keys to compare, url/tvg_id/name
+    :type keys: tuple
+    :param latency: Returns the measured latency of a record in seconds, or None
+    :type latency: Callable
+    :return: One record per channel, in the order of their first record
+    :rtype: list
+    """
+    merged = []
+    for group in group_duplicates(records, keys):
+        candidates = []
+        for position in group:
+            # records deduplicated before bring their fallbacks back into the ranking
+            candidates.append(records[position])
+            candidates.extend(records[position].fallbacks or ())
+        if len(candidates) == 1:
+            merged.append(candidates[0])
+            continue
+        ranked = rank_records(candidates, latency)
+        primary = ranked[0]
+        fallbacks = []
+        # links already kept by the primary or a better fallback are dropped
+        seen = {canonical_url(primary.url)}
+        for fallback in ranked[1:]:
+            fallback.fallbacks = None
+            for slot in metadata_slots:
+                if getattr(primary, slot) is None:
+                    setattr(primary, slot, getattr(fallback, slot))
+            url = canonical_url(fallback.url)
+            if url not in seen:
+                seen.add(url)
+                fallbacks.append(fallback)
+        primary.fallbacks = tuple(fallbacks) or None
+        merged.append(primary)
+    return merged
+
+
+def promote(record, fallback) -> None:
+    """Swaps the playback fields of a record with one of its fallbacks, eg. when its own link is BAD."""
+    for slot in playback_slots:
+        value = getattr(record, slot)
+        setattr(record, slot, getattr(fallback, slot))
+        setattr(fallback, slot, value)
+
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import re
+from functools import lru_cache
+from typing import Union
+
+_pycountry = None
+_splitter_regex = re.compile(r"\s*[;|]\s*")
+_code_splitter_regex = re.compile(r"\s*[;,|]\s*")
+_parenthesis_regex = re.compile(r"\s*[(\[].*?[)\]]\s*")
+
+
+def get_pycountry():
+    """Imports pycountry on first use, so its databases are not loaded unless a stream needs enrichment."""
+    global _pycountry
+    if _pycountry is None:
+        import pycountry
+
+        _pycountry = pycountry
+    return _pycountry
+
+
+def split_values(value: str) -> list:
+    """Splits a multi-valued attribute like tvg-language="Turkish;English" into its values.
+
+    Only ";" and "|" separate values, as names like "Korea, Republic of" contain commas.
+    """
+    if ";" not in value and "|" not in value:
+        value = value.strip()
+        return [value] if value else []
+    return [item for item in _splitter_regex.split(value.strip()) if item]
+
+
+def split_codes(value: str) -> list:
+    """Splits a multi-valued code attribute like tvg-country="TR,DE" into its values, codes have no commas."""
+    if ";" not in value and "," not in value and "|" not in value:
+        value = value.strip()
+        return [value] if value else []
+    return [item for item in _code_splitter_regex.split(value.strip()) if item]
+
+
+def _get(database, **kwargs):
+    try:
+        return database.get(**kwargs)
+    except (KeyError, LookupError):
+        return None
+
+
+@lru_cache(maxsize=1024)
+def lookup_country(code: str) -> Union[str, None]:
+    """Returns the name of the country for an ISO 3166 alpha-2/alpha-3 code or a country name.
+
+    :param code: Country code or name, eg. TR, USA, Germany
+    :type code: str
+    :rtype: str, None
+    """
+    countries = get_pycountry().countries
+    code = code.strip()
+    country = None
+    if len(code) == 2:
+        country = _get(countries, alpha_2=code)
+    elif len(code) == 3:
+        country = _get(countries, alpha_3=code)
+    if country is None:
+        country = _get(countries, name=code) or _get(countries, common_name=code)
+    return country.name if country else None
+
+
+@lru_cache(maxsize=1024)
+def lookup_language(name: str) -> Union[str, None]:
+    """Returns the ISO 639-3 code of a language name, tolerating case, codes and qualifiers.
+
+    Names like "turkish", "Turkish (Türkiye)", "tr" and "tur" are all resolved to "tur".
+
+    :param name: Language name or code
+    :type name: str
+    :rtype: str, None
+    """
+    languages = get_pycountry().languages
+    name = name.strip()
+    candidates = [name, _parenthesis_regex.sub(" ", name).strip()]
+    for candidate in dict.fromkeys(candidates):
+        if not candidate:
+            continue
+        language = _get(languages, name=candidate)
+        if language is None and len(candidate) == 2:
+            language = _get(languages, alpha_2=candidate)
+        if language is None and len(candidate) == 3:
+            language = _get(languages, alpha_3=candidate)
+        if language is not None:
+            return language.alpha_3
+    return None
+
+
+def _join(values: list) -> Union[str, None]:
+    values = [value for value in values if value]
+    return ";".join(values) if values else None
+
+
+def _lookup_all(value: str, lookup) -> Union[str, None]:
+    """Looks up every value of a multi-valued attribute, a value not found as a whole is split on commas, eg. TR,DE."""
+    found = []
+    for item in split_values(value):
+        result = lookup(item)
+        if result is None and "," in item:
+            found.extend(lookup(part) for part in split_codes(item))
+        else:
+            found.append(result)
+    return _join(found)
+
+
+@lru_cache(maxsize=1024)
+def _country_names(code: str) -> Union[str, None]:
+    return _lookup_all(code, lookup_country)
+
+
+@lru_cache(maxsize=1024)
+def _language_codes(name: str) -> Union[str, None]:
+    return _lookup_all(name, lookup_language)
+
+
+def enrich_country(code: Union[str, None]) -> dict:
+    """Builds the country information of a stream from its tvg-country attribute.
+
+    :param code: Value of tvg-country, can be multi-valued eg. TR;DE
+    :type code: str, None
+    :return: Country code and name, names of multi-valued codes are joined with ";"
+    :rtype: dict
+    """
+    return {"code": code, "name": _country_names(code) if code else None}
+
+
+def enrich_language(name: Union[str, None]) -> dict:
+    """Builds the language information of a stream from its tvg-language attribute.
+
+    :param name: Value of tvg-language, can be multi-valued eg. Turkish;English
+    :type name: str, None
+    :return: Language code and name, codes of multi-valued names are joined with ";"
+    :rtype: dict
+    """
+    return {"code": _language_codes(name) if name else None, "name": name}
+
+
+def cache_info() -> dict:
+    """Hits/misses of the country and language lookup caches."""
+    return {"country": _country_names.cache_info()._asdict(), "language": _language_codes.cache_info()._asdict()}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import csv
+import gzip
+import json
+from typing import Iterable, TextIO
+
+compression_suffixes = {"gzip": ".gz", "zstd": ".zst"}
+
+_zstd_open = None
+
+
+def get_zstd_open():
+    """Returns an open function for zstd files, the stdlib one (Python 3.14+) or the one of zstandard package."""
+    global _zstd_open
+    if _zstd_open is None:
+        try:
+            from compression import zstd
+
+            _zstd_open = zstd.open
+        except ImportError:
+            import zstandard
+
+            _zstd_open = zstandard.open
+    return _zstd_open
+
+
+def open_output(filename: str, compression: str = None, newline: str = None) -> TextIO:
+    """Opens a text file for writing, gzip/zstd compressed if asked.
+
+    :param filename: Path of the file
+    :type filename: str
+    :param compression: None, gzip or zstd
+    :type compression: str
+    :rtype: TextIO
+    """
+    if compression == "gzip":
+        return gzip.open(filename, mode="wt", encoding="utf-8", newline=newline)
+    if compression == "zstd":
+        return get_zstd_open()(filename, mode="wt", encoding="utf-8", newline=newline)
+    return open(filename, mode="w", encoding="utf-8", newline=newline)
+
+
+def write_json(fp: TextIO, records: Iterable, indent: int = 4) -> None:
+    """Writes the records one by one as a JSON list, same as json.dump(list, fp, indent=indent)."""
+    padding = " " * indent
+    separator = "[\n"
+    for record in records:
+        data = json.dumps(record.to_dict(), indent=indent)
+        fp.write(separator)
+        fp.write("\n".join(padding + line for line in data.split("\n")))
+        separator = ",\n"
+    fp.write("[]" if separator == "[\n" else "\n]")
+
+
+def write_jsonl(fp: TextIO, records: Iterable) -> None:
+    """Writes one compact JSON object per line."""
+    for record in records:
+        fp.write(json.dumps(record.to_dict(), separators=(",", ":")))
+        fp.write("\n")
+
+
+def flatten(item: dict, prefix: str = "") -> dict:
+    """Flattens a stream information dict to csv columns, eg. {"tvg": {"id": 1}} to {"tvg_id": "1"}."""
+    row = {}
+    for key, value in item.items():
+        column = prefix + str(key)
+        if isinstance(value, dict):
+            row.update(flatten(value, column + "_"))
+        else:
+            row[column] = str(value) if value else ""
+    return row
+
+
+def write_csv(fp: TextIO, records: list) -> None:
+    """Writes the records as csv rows.
+
+    The header is the union of the columns of all the records, found in a first pass that only looks at the keys,
+    so streams with extra attributes or without an enforced schema are written too. Missing columns are left empty.
+    """
+    header = {}
+    for record in records:
+        header.update(dict.fromkeys(flatten(record.to_dict())))
+    writer = csv.DictWriter(fp, fieldnames=list(header), restval="")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(flatten(record.to_dict()))
+
+
+def m3u_lines(stream_info: dict, http_options: dict) -> list:
+    """Returns the #EXTINF, #EXTVLCOPT and url lines of a stream information dict."""
+    parts = ["#EXTINF:-1"]
+    for key, value in (stream_info.get("tvg") or {}).items():
+        if value is not None:
+            parts.append(' tvg-%s="%s"' % (key, value))
+    if stream_info.get("logo") is not None:
+        parts.append(' tvg-logo="%s"' % stream_info["logo"])
+    if (stream_info.get("country") or {}).get("code") is not None:
+        parts.append(' tvg-country="%s"' % stream_info["country"]["code"])
+    if (stream_info.get("language") or {}).get("name") is not None:
+        parts.append(' tvg-language="%s"' % stream_info["language"]["name"])
+    if stream_info.get("category") is not None:
+        parts.append(' group-title="%s"' % stream_info["category"])
+    for key, value in (stream_info.get("attributes") or {}).items():
+        parts.append(' %s="%s"' % (key, value))
+    if stream_info.get("name") is not None:
+        parts.append("," + stream_info["name"])
+    lines = ["".join(parts)]
+    for option, key in http_options.items():
+        if (stream_info.get("http") or {}).get(key) is not None:
+            lines.append("#EXTVLCOPT:%s=%s" % (option, stream_info["http"][key]))
+    lines.append(stream_info["url"])
+    return lines
+
+
+def write_m3u(fp: TextIO, records: Iterable, http_options: dict) -> None:
+    """Writes the records as an extended m3u playlist."""
+    fp.write("#EXTM3U")
+    for record in records:
+        fp.write("\n")
+        fp.write("\n".join(m3u_lines(record.to_dict(), http_options)))
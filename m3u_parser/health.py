@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import time
+from typing import Union
+
+
+def check_mode(deep: Union[bool, str]) -> str:
+    """Returns the health store mode of a LivenessChecker deep option: "" for shallow checks, "deep" or "all"."""
+    return "" if not deep else "all" if deep == "all" else "deep"
+
+
+class HealthStore:
+    """Persisted results of liveness checks, keyed by stream url, request headers and check mode.
+
+    For every stream the last status, latency, ETag/Last-Modified validators and the number of consecutive failures
+    are kept in a SQLite file. A stream checked GOOD within ttl seconds is not probed again, a failing stream is only
+    probed again after a backoff doubling with every consecutive failure, up to max_backoff seconds. Results are kept
+    in memory while checking and written to the file on flush(). Results of a shallow check and of a deep check
+    (mode "deep" or "all", see LivenessChecker) are kept apart, so one never stands in for the other.
+
+    :Example
+
+    >>> store = HealthStore("health.sqlite3", ttl=3600)
+    >>> parser = M3uParser(health_store=store)
+    >>> parser.parse_m3u(url)
+    >>> parser.get_check_stats()["skipped"]
+    112
+    """
+
+    _fields = ("status", "latency", "etag", "last_modified", "failures", "checked_at")
+
+    def __init__(self, path: str, ttl: int = 3600, backoff: int = 300, max_backoff: int = 86400):
+        self.path = path
+        self.ttl = ttl
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._connection = None
+        self._entries = None
+        self._dirty = set()
+
+    @staticmethod
+    def key(url: str, headers: Union[dict, None], mode: str = "") -> str:
+        # shallow check keys have no mode, as in the stores written before deep checks were kept apart
+        key = [url, sorted((headers or {}).items())]
+        return json.dumps(key + [mode] if mode else key)
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            # the store is used from the event loop, which may run in a worker thread
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS health (key TEXT PRIMARY KEY, status TEXT, latency REAL, etag TEXT, "
+                "last_modified TEXT, failures INTEGER, checked_at REAL)"
+            )
+            rows = self._connection.execute("SELECT key, %s FROM health" % ", ".join(self._fields))
+            self._entries = {row[0]: dict(zip(self._fields, row[1:])) for row in rows}
+        return self._entries
+
+    def get(self, url: str, headers: dict = None, mode: str = "") -> Union[dict, None]:
+        """Returns the last check result of a stream, None if it was never checked in that mode."""
+        return self._load().get(self.key(url, headers, mode))
+
+    def cached_status(self, entry: Union[dict, None], now: float = None) -> Union[str, None]:
+        """Returns the status to reuse without probing, None if the stream is due for a check.
+
+        :param entry: Last check result of the stream, as returned by get()
+        :type entry: dict
+        :rtype: str
+        """
+        if not entry:
+            return None
+        age = (now or time.time()) - entry["checked_at"]
+        if entry["status"] == "GOOD":
+            return "GOOD" if age < self.ttl else None
+        delay = min(self.backoff * 2 ** max(entry["failures"] - 1, 0), self.max_backoff)
+        return "BAD" if age < delay else None
+
+    def update(
+        self,
+        url: str,
+        headers: dict,
+        status: str,
+        latency: float,
+        etag: str = None,
+        last_modified: str = None,
+        mode: str = "",
+    ):
+        """Records the result of a check, validators of the previous result are kept if none are given."""
+        entries = self._load()
+        key = self.key(url, headers, mode)
+        previous = entries.get(key) or {}
+        entries[key] = {
+            "status": status,
+            "latency": round(latency, 3),
+            "etag": etag or previous.get("etag"),
+            "last_modified": last_modified or previous.get("last_modified"),
+            "failures": 0 if status == "GOOD" else previous.get("failures", 0) + 1,
+            "checked_at": time.time(),
+        }
+        self._dirty.add(key)
+
+    def flush(self):
+        """Writes the results recorded since the last flush to the file."""
+        if not self._dirty:
+            return
+        rows = [(key, *(self._entries[key][field] for field in self._fields)) for key in self._dirty]
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO health VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self._dirty.clear()
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+            self._entries = None
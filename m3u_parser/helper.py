@@ -1,8 +1,10 @@
 import asyncio
-import csv
+import codecs
 import ipaddress
 import re
-from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Union
 from urllib.parse import urlsplit, urlunsplit
 
 # URLValidator
@@ -37,7 +39,10 @@ regex = re.compile(
 )
 schemes = ['http', 'https', 'ftp', 'ftps']
 unsafe_chars = frozenset('\t\r\n')
+whitespace_regex = re.compile(r'\s')
+netloc_end_regex = re.compile(r'[/?#]')
 streams_regex = re.compile(r'acestream://[a-zA-Z0-9]+')
+extinf_attribute_regex = re.compile(r'\s([\w-]+)="([^"]*)"')
 
 
 # get matching regex from content
@@ -50,76 +55,177 @@ def get_by_regex(regex, content: str) -> Union[str, None]:
     :type content: str
     :rtype: str, None
     """
-    match = re.search(regex, content)
+    match = regex.search(content)
     return match.group(1).strip() if match else None
 
 
-def is_dict(item: dict, ans: Union[None, list] = None) -> list:
-    if ans is None:
-        ans = []
-    tree = []
-    for k, v in item.items():
-        if isinstance(v, dict):
-            ans.append(str(k))
-            tree.extend(is_dict(v, ans))
-            ans = []
-        else:
-            if ans:
-                ans.append(str(k))
-                key = "_".join(ans)
-                tree.extend([(key, str(v) if v else "")])
-                ans.remove(str(k))
-            else:
-                tree.extend([(str(k), str(v) if v else "")])
-    return tree
+def parse_extinf(line: str) -> tuple:
+    """Lexes an #EXTINF line into its key="value" attributes and the trailing title in a single pass
+
+    Attribute keys are lowercased and the first occurrence of a key wins. The title is the text after the first comma
+    following the last attribute, or None if there is no such comma.
+
+    :param line: The #EXTINF line
+    :type line: str
+    :return: Attributes dict and the title
+    :rtype: tuple
+    """
+    attributes = {}
+    end = 0
+    for match in extinf_attribute_regex.finditer(line):
+        key, value = match.groups()
+        attributes.setdefault(key.lower(), value.strip())
+        end = match.end()
+    comma = line.find(",", end)
+    return attributes, line[comma + 1 :].strip() if comma != -1 else None
+
+
+def iter_chunks(fp, chunk_size: int = 65536) -> Iterator[Union[str, bytes]]:
+    """Reads a file object chunk by chunk until it is exhausted
+
+    :param fp: A file object opened in text or binary mode
+    :param chunk_size: Number of characters/bytes to read at once
+    :type chunk_size: int
+    :rtype: Iterator[str, bytes]
+    """
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class LineSplitter:
+    """Splits text/bytes chunks into non-empty lines, keeping the unfinished last line until the next chunk
 
+    Bytes are decoded incrementally as utf-8 so multi-byte characters split across chunks are kept intact.
+    """
 
-def get_tree(item: Union[list, dict]) -> list:
-    tree = []
-    if isinstance(item, dict):
-        tree.extend(is_dict(item, ans=[]))
-    elif isinstance(item, list):
-        for i in item:
-            tree.append(get_tree(i))
-    return tree
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._tail = ""
 
+    def feed(self, chunk: Union[str, bytes]) -> list:
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        if not chunk:
+            return []
+        lines = (self._tail + chunk).split("\n")
+        self._tail = lines.pop()
+        return [line for line in (line.strip("\r") for line in lines) if line]
 
-def render_csv(header: list, data: list, out_path: str = "output.csv") -> None:
-    input = []
-    with open(out_path, "w") as f:
-        dict_writer = csv.DictWriter(f, fieldnames=header)
-        dict_writer.writeheader()
-        for i in data:
-            input.append(dict(i))
-        dict_writer.writerows(input)
+    def close(self) -> list:
+        tail = (self._tail + self._decoder.decode(b"", final=True)).strip("\r")
+        self._tail = ""
+        return [tail] if tail else []
 
 
-def ndict_to_csv(obj: list, output_path: str) -> None:
-    """Convert nested dictionary to csv.
+def iter_lines(chunks: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """Splits a stream of text/bytes chunks into non-empty lines without holding the whole content in memory
 
-    :param obj: Stream information list
-    :type obj: list
-    :param output_path: Path to save the csv file.
-    :return: None
+    :param chunks: Iterable of str or bytes chunks
+    :type chunks: Iterable[str, bytes]
+    :rtype: Iterator[str]
     """
-    tree = get_tree(obj)
-    header = [i[0] for i in tree[0]]
-    render_csv(header, tree, output_path)
+    splitter = LineSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
 
 
-def run_until_completed(coros):
-    futures = [asyncio.ensure_future(c) for c in coros]
+async def aiter_lines(chunks: AsyncIterable) -> AsyncIterator:
+    """Async version of iter_lines
+
+    :param chunks: Async iterable of str or bytes chunks
+    :type chunks: AsyncIterable[str, bytes]
+    :rtype: AsyncIterator[str]
+    """
+    splitter = LineSplitter()
+    async for chunk in chunks:
+        for line in splitter.feed(chunk):
+            yield line
+    for line in splitter.close():
+        yield line
 
-    async def first_to_finish():
-        while True:
-            await asyncio.sleep(0)
-            for f in futures:
-                if f.done():
-                    futures.remove(f)
-                    return f.result()
 
-    while len(futures) > 0:
-        yield first_to_finish()
+async def aiter_blocking(iterable: Iterable) -> AsyncIterator:
+    """Iterates a blocking iterable (eg. file chunks) without blocking the event loop
+
+    Each item is fetched in a worker thread.
+
+    :param iterable: A blocking iterable
+    :type iterable: Iterable
+    :rtype: AsyncIterator
+    """
+    iterator = iter(iterable)
+    sentinel = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+
+async def run_bounded(coros: Union[Iterable, AsyncIterable], limit: int = 100, on_progress: Callable = None) -> AsyncIterator:
+    """Runs coroutines with at most `limit` of them in flight and yields their results as they complete
+
+    Coroutines are pulled lazily from the (async) iterable, so a generator is only advanced when there is room in the
+    window. Waiting is done with asyncio.wait, nothing is polled. If a coroutine raises, or the caller stops early,
+    the coroutines still running are cancelled and awaited before the generator exits.
+
+    :param coros: Iterable or async iterable of coroutines
+    :type coros: Iterable, AsyncIterable
+    :param limit: Maximum number of coroutines running at once
+    :type limit: int
+    :param on_progress: Called with (completed, in_flight) every time a coroutine completes
+    :type on_progress: Callable
+    :rtype: AsyncIterator
+    """
+    is_async = hasattr(coros, "__aiter__")
+    coros = coros.__aiter__() if is_async else iter(coros)
+    pending, done = set(), set()
+    completed = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    coro = await coros.__anext__() if is_async else next(coros)
+                except (StopIteration, StopAsyncIteration):
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(coro))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            while done:
+                future = done.pop()
+                completed += 1
+                if on_progress is not None:
+                    on_progress(completed, len(pending))
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if pending or done:
+            await asyncio.gather(*pending, *done, return_exceptions=True)
+
+
+def run_sync(coro):
+    """Runs a coroutine to completion from synchronous code and returns its result
+
+    It uses asyncio.run when no event loop is running in the current thread. Inside a running loop (eg. an async web
+    handler) the coroutine is run on a new loop in a worker thread, as the running loop can not be re-entered.
+
+    :param coro: The coroutine to run
+    :rtype: Any
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
 
 # Django URLValidator
@@ -152,6 +258,32 @@ def is_valid_ipv6_address(ip_str):
 def is_valid_url(value):
     """
     Validate that the input can be represented as a URL.
+
+    Gives the same answers as validate_url. The scheme is checked first, then for urls without whitespace and
+    user:pass authentication, which only depend on their netloc, the answer of validate_url is memoized per netloc.
+    Others go through validate_url.
+    """
+    if not isinstance(value, str):
+        return False
+    if unsafe_chars.intersection(value):
+        return False
+    scheme, separator, rest = value.partition('://')
+    if scheme.lower() not in schemes:
+        return False
+    if '@' in rest or whitespace_regex.search(rest):
+        return validate_url(value)
+    return is_valid_netloc(netloc_end_regex.split(rest, 1)[0])
+
+
+@lru_cache(maxsize=4096)
+def is_valid_netloc(netloc):
+    """Validates a netloc as validate_url does, playlists share a handful of hosts so the answers are cached."""
+    return validate_url('http://' + netloc)
+
+
+def validate_url(value):
+    """
+    Validate that the input can be represented as a URL.
     """
     try:
         if not isinstance(value, str):
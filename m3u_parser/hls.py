@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import re
+from urllib.parse import urljoin
+
+stream_inf_attribute_regex = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def is_playlist(content: str) -> bool:
+    return content.lstrip("\ufeff \r\n\t").startswith("#EXTM3U")
+
+
+def parse_master(content: str, base_url: str) -> list:
+    """Returns the variant streams of a HLS master playlist, highest bandwidth first.
+
+    A playlist without #EXT-X-STREAM-INF tags is a media playlist and has no variants.
+
+    :param content: Content of the playlist
+    :type content: str
+    :param base_url: Url of the playlist, relative variant urls are resolved against it
+    :type base_url: str
+    :return: List of {"url", "bandwidth", "resolution"} dicts
+    :rtype: list
+    """
+    variants = []
+    attributes = None
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            attributes = {
+                key: value.strip('"') for key, value in stream_inf_attribute_regex.findall(line.partition(":")[2])
+            }
+        elif attributes is not None and line and not line.startswith("#"):
+            bandwidth = attributes.get("BANDWIDTH", "")
+            variants.append(
+                {
+                    "url": urljoin(base_url, line),
+                    "bandwidth": int(bandwidth) if bandwidth.isdigit() else None,
+                    "resolution": attributes.get("RESOLUTION"),
+                }
+            )
+            attributes = None
+    return sorted(variants, key=lambda variant: variant["bandwidth"] or 0, reverse=True)
+
+
+def parse_media(content: str, base_url: str) -> list:
+    """Returns the segment urls of a HLS media playlist, oldest first.
+
+    :param content: Content of the playlist
+    :type content: str
+    :param base_url: Url of the playlist, relative segment urls are resolved against it
+    :type base_url: str
+    :rtype: list
+    """
+    lines = (line.strip() for line in content.splitlines())
+    return [urljoin(base_url, line) for line in lines if line and not line.startswith("#")]
@@ -7,17 +7,54 @@ import random
 import re
 import ssl
 import sys
-import time
-from typing import Union
+from operator import itemgetter
+from typing import Callable, Union
 
 import aiohttp
-import pycountry
 import requests
 
 try:
-    from helper import get_by_regex, is_valid_url, ndict_to_csv, run_until_completed, streams_regex
+    from batch import parse_many
+    from checker import LivenessChecker
+    from dedup import deduplicate, promote
+    from enrich import enrich_country, enrich_language
+    from export import compression_suffixes, open_output, write_csv, write_json, write_jsonl, write_m3u
+    from health import HealthStore, check_mode
+    from query import StreamIndex, field_getter, index_fields, matcher
+    from record import StreamRecord
+    from view import StreamView
+    from helper import (
+        aiter_blocking,
+        aiter_lines,
+        is_valid_url,
+        iter_chunks,
+        iter_lines,
+        parse_extinf,
+        run_bounded,
+        run_sync,
+        streams_regex,
+    )
 except ModuleNotFoundError:
-    from .helper import get_by_regex, is_valid_url, ndict_to_csv, run_until_completed, streams_regex
+    from .batch import parse_many
+    from .checker import LivenessChecker
+    from .dedup import deduplicate, promote
+    from .enrich import enrich_country, enrich_language
+    from .export import compression_suffixes, open_output, write_csv, write_json, write_jsonl, write_m3u
+    from .health import HealthStore, check_mode
+    from .query import StreamIndex, field_getter, index_fields, matcher
+    from .record import StreamRecord
+    from .view import StreamView
+    from .helper import (
+        aiter_blocking,
+        aiter_lines,
+        is_valid_url,
+        iter_chunks,
+        iter_lines,
+        parse_extinf,
+        run_bounded,
+        run_sync,
+        streams_regex,
+    )
 
 ssl.match_hostname = lambda cert, hostname: hostname == cert["subjectAltName"][0][1]
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -43,12 +80,21 @@ class M3uParser:
     INFO: Saving to file...
     """
 
-    def __init__(self, useragent: str = None, timeout: int = 5):
+    def __init__(
+        self,
+        useragent: str = None,
+        timeout: int = 5,
+        concurrency: int = 100,
+        limit_per_host: int = 10,
+        deep_check: Union[bool, str] = False,
+        health_store: Union[str, HealthStore] = None,
+    ):
         self._streams_info = []
         self._streams_info_backup = []
-        self._lines = []
+        self._index = None
+        self._view = None
+        self._chunk_size = 65536
         self._timeout = timeout
-        self._loop = None
         self._enforce_schema = True
         self._headers = {
             "User-Agent": useragent
@@ -56,159 +102,422 @@ class M3uParser:
             else "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/84.0.4147.89 Safari/537.36"
         }
         self._check_live = False
-        self._content = ""
+        self._concurrency = concurrency
+        self._limit_per_host = limit_per_host
+        self._deep_check = deep_check
+        self._health_store = HealthStore(health_store) if isinstance(health_store, str) else health_store
+        self._check_stats = None
+        self._check_reports = {}
+        self._latencies = {}
+        self._http_options = {"http-user-agent": "user_agent", "http-referrer": "referrer"}
         self._file_regex = re.compile(r"^[a-zA-Z]:\\((?:.*?\\)*).*\.[\d\w]{3,5}$|^(/[^/]*)+/?.[\d\w]{3,5}$")
-        self._tvg_name_regex = re.compile(r"tvg-name=\"(.*?)\"", flags=re.IGNORECASE)
-        self._tvg_id_regex = re.compile(r"tvg-id=\"(.*?)\"", flags=re.IGNORECASE)
-        self._logo_regex = re.compile(r"tvg-logo=\"(.*?)\"", flags=re.IGNORECASE)
-        self._category_regex = re.compile(r"group-title=\"(.*?)\"", flags=re.IGNORECASE)
-        self._title_regex = re.compile(r"(?!.*=\",?.*\")[,](.*?)$", flags=re.IGNORECASE)
-        self._country_regex = re.compile(r"tvg-country=\"(.*?)\"", flags=re.IGNORECASE)
-        self._language_regex = re.compile(r"tvg-language=\"(.*?)\"", flags=re.IGNORECASE)
-        self._tvg_url_regex = re.compile(r"tvg-url=\"(.*?)\"", flags=re.IGNORECASE)
-
-    def parse_m3u(self, path: str, check_live: bool = True, enforce_schema: bool = True):
+
+    def parse_m3u(self, path, check_live: bool = True, enforce_schema: bool = True, on_progress: Callable = None):
         """Parses the content of local file/URL.
 
         It downloads the file from the given url or use the local file path to get the content and parses line by line
         to a structured format of streams information.
 
-        :param path: Path can be a url or local filepath
+        :param path: Path can be a url, local filepath, file object or HTTP response
         :type path: str
         :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null. If it is not enforced, non-existing fields are ignored
         :type enforce_schema: bool
         :param check_live: To check if the stream links are working or not
         :type check_live: bool
+        :param on_progress: Called with (parsed, in_flight) stream counts every time a stream is parsed/checked
+        :type on_progress: Callable
         :rtype: None
 
         """
+        run_sync(self.aparse_m3u(path, check_live=check_live, enforce_schema=enforce_schema, on_progress=on_progress))
+
+    async def aparse_m3u(
+        self, path, check_live: bool = True, enforce_schema: bool = True, on_progress: Callable = None
+    ):
+        """Parses the content of local file/URL without blocking the event loop.
+
+        Async version of parse_m3u, the url is downloaded with aiohttp and local files are read in a worker thread.
+        Use one parser per playlist to parse many playlists concurrently on the same loop.
+
+        :param path: Path can be a url, local filepath, file object or HTTP response (requests or aiohttp)
+        :type path: str
+        :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null. If it is not enforced, non-existing fields are ignored
+        :type enforce_schema: bool
+        :param check_live: To check if the stream links are working or not
+        :type check_live: bool
+        :param on_progress: Called with (parsed, in_flight) stream counts every time a stream is parsed/checked
+        :type on_progress: Callable
+        :rtype: None
+        """
+        self._check_live = check_live
+        self._enforce_schema = enforce_schema
+        self._streams_info = []
+        await self._parse_entries(self._aiter_entries(self._aiter_source(path)), on_progress)
+        self._streams_info_backup = self._streams_info.copy()
+        self._index = None
+        self._view = None
+        if len(self._streams_info) == 0:
+            logging.error("No content to parse!!!")
+        else:
+            logging.info("Parsing completed !!!")
+
+    def parse_m3u_many(
+        self,
+        paths: list,
+        check_live: bool = True,
+        enforce_schema: bool = True,
+        workers: int = None,
+        deduplicate: bool = False,
+    ) -> dict:
+        """Parses the content of many local files/URLs into one streams information list.
+
+        The playlists are downloaded and parsed in a process pool, merged in the given order and every stream
+        information is tagged with its "source" path/url.
+
+        :param paths: Urls/local filepaths of the playlists
+        :type paths: list
+        :param check_live: To check if the stream links are working or not
+        :type check_live: bool
+        :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null. If it is not enforced, non-existing fields are ignored
+        :type enforce_schema: bool
+        :param workers: Number of worker processes. Default: number of CPUs
+        :type workers: int
+        :param deduplicate: To merge the copies of every channel before checking, see deduplicate
+        :type deduplicate: bool
+        :return: Streams count, elapsed seconds and error (if any) per source
+        :rtype: dict
+        """
+        self._enforce_schema = enforce_schema
+        self._streams_info, report = parse_many(
+            paths,
+            workers=workers,
+            useragent=self._headers["User-Agent"],
+            timeout=self._timeout,
+            enforce_schema=enforce_schema,
+        )
+        if deduplicate:
+            self.deduplicate()
+        if check_live:
+            self.check_streams()
         self._check_live = check_live
+        self._streams_info_backup = self._streams_info.copy()
+        self._index = None
+        self._view = None
+        logging.info("Parsed %d streams from %d sources", len(self._streams_info), len(report))
+        return report
+
+    def iter_m3u(self, path, enforce_schema: bool = True):
+        """Parses the content of local file/URL as a stream.
+
+        It reads the file object, local file or url response body in chunks and yields each stream information as soon
+        as its #EXTINF/#EXTVLCOPT/URL group is complete, so the memory usage does not grow with the playlist size.
+        Streams are not checked for liveness and nothing is stored in the parser.
+
+        :param path: Path can be a url, local filepath, file object or HTTP response
+        :type path: str
+        :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null. If it is not enforced, non-existing fields are ignored
+        :type enforce_schema: bool
+        :return: Streams information generator
+        :rtype: Iterator[dict]
+        """
         self._enforce_schema = enforce_schema
-        if is_valid_url(path):
+        for line_info, stream_link, _, http in self._iter_entries(self._iter_source(path)):
+            yield self._build_info(line_info, stream_link, http).to_dict()
+
+    async def aiter_m3u(self, path, enforce_schema: bool = True):
+        """Async version of iter_m3u.
+
+        :param path: Path can be a url, local filepath, file object or HTTP response (requests or aiohttp)
+        :type path: str
+        :param enforce_schema: If the schema is forced, non-existing fields in a stream are filled with None/null. If it is not enforced, non-existing fields are ignored
+        :type enforce_schema: bool
+        :return: Streams information async generator
+        :rtype: AsyncIterator[dict]
+        """
+        self._enforce_schema = enforce_schema
+        async for line_info, stream_link, _, http in self._aiter_entries(self._aiter_source(path)):
+            yield self._build_info(line_info, stream_link, http).to_dict()
+
+    def _iter_source(self, path, raise_errors: bool = False):
+        """Yields the lines of a playlist, download/HTTP/missing file errors are logged or raised with raise_errors."""
+        if hasattr(path, "read"):
+            yield from iter_lines(iter_chunks(path, self._chunk_size))
+        elif hasattr(path, "iter_content"):
+            yield from iter_lines(path.iter_content(chunk_size=self._chunk_size))
+        elif is_valid_url(path):
             logging.info("Started parsing m3u link...")
             try:
-                self._content = requests.get(path).text
-            except:
+                with requests.get(path, headers=self._headers, timeout=self._timeout, stream=True) as response:
+                    response.raise_for_status()
+                    yield from iter_lines(response.iter_content(chunk_size=self._chunk_size))
+            except requests.RequestException:
+                if raise_errors:
+                    raise
                 logging.error("Cannot read anything from the url!!!")
-                return
         else:
             logging.info("Started parsing m3u file...")
             try:
-                with open(path, encoding="utf-8", errors="ignore") as fp:
-                    self._content = fp.read()
+                fp = open(path, mode="rb")
             except FileNotFoundError:
+                if raise_errors:
+                    raise
                 logging.error("File doesn't exist!!!")
                 return
-
-        # splitting contents into lines to parse them
-        self._lines = [line.strip("\n\r") for line in self._content.split("\n") if line.strip("\n\r") != ""]
-        if len(self._lines) > 0:
-            self._parse_lines()
+            with fp:
+                yield from iter_lines(iter_chunks(fp, self._chunk_size))
+
+    async def _aiter_source(self, path, raise_errors: bool = False):
+        """Async version of _iter_source."""
+        if hasattr(path, "content") and hasattr(path.content, "iter_chunked"):
+            path = path.content
+        if hasattr(path, "iter_chunked"):
+            async for line in aiter_lines(path.iter_chunked(self._chunk_size)):
+                yield line
+        elif hasattr(path, "read"):
+            async for line in aiter_lines(aiter_blocking(iter_chunks(path, self._chunk_size))):
+                yield line
+        elif hasattr(path, "iter_content"):
+            async for line in aiter_lines(aiter_blocking(path.iter_content(chunk_size=self._chunk_size))):
+                yield line
+        elif is_valid_url(path):
+            logging.info("Started parsing m3u link...")
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self._timeout, sock_read=self._timeout)
+            try:
+                async with aiohttp.ClientSession(headers=self._headers, timeout=timeout) as session:
+                    async with session.get(path) as response:
+                        response.raise_for_status()
+                        async for line in aiter_lines(response.content.iter_chunked(self._chunk_size)):
+                            yield line
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if raise_errors:
+                    raise
+                logging.error("Cannot read anything from the url!!!")
         else:
-            logging.error("No content to parse!!!")
+            logging.info("Started parsing m3u file...")
+            try:
+                fp = open(path, mode="rb")
+            except FileNotFoundError:
+                if raise_errors:
+                    raise
+                logging.error("File doesn't exist!!!")
+                return
+            with fp:
+                async for line in aiter_lines(aiter_blocking(iter_chunks(fp, self._chunk_size))):
+                    yield line
+
+    def _get_stream_link(self, line: str):
+        """Returns the link status if the line is a stream link, otherwise None."""
+        is_acestream = streams_regex.search(line)
+        if is_acestream or is_valid_url(line):
+            return "GOOD" if is_acestream else "BAD"
+        elif re.search(self._file_regex, line):
+            return "GOOD"
+        return None
+
+    def _group_line(self, entry: list, line: str):
+        """Feeds a line into the [#EXTINF line, http options] entry being grouped.
+
+        Any number of directive lines may come between #EXTINF and its stream link, #EXTVLCOPT http options are kept
+        for the entry and a new #EXTINF drops the previous entry if it never got a stream link. Returns the
+        (#EXTINF line, stream link, status, http options) entry once its stream link is found.
+        """
+        line_info, http = entry
+        if line.startswith("#EXTINF"):
+            entry[:] = [line, {}]
+        elif line_info is None:
+            pass
+        elif line.startswith("#EXTVLCOPT:"):
+            key, _, value = line[len("#EXTVLCOPT:") :].partition("=")
+            key = key.strip().lower()
+            if key in self._http_options:
+                http[self._http_options[key]] = value.strip()
+        elif not line.startswith("#"):
+            status = self._get_stream_link(line)
+            if status:
+                entry[:] = [None, {}]
+                return line_info, line, status, http
+        return None
+
+    def _iter_entries(self, lines):
+        entry = [None, {}]
+        for line in lines:
+            grouped = self._group_line(entry, line)
+            if grouped:
+                yield grouped
+
+    async def _aiter_entries(self, lines):
+        entry = [None, {}]
+        async for line in lines:
+            grouped = self._group_line(entry, line)
+            if grouped:
+                yield grouped
+
+    async def _parse_entries(self, entries, on_progress=None):
+        if not self._check_live:
+            await self._collect_entries(None, entries, on_progress)
+            return
+        async with self._get_checker() as checker:
+            await self._collect_entries(checker, entries, on_progress)
+        self._check_stats = checker.stats
+        self._check_reports = checker.reports
+        self._latencies = checker.latencies
+        logging.info(
+            "Checked %d streams in %.2fs (%.1f streams/s)", checker.stats.total, checker.stats.elapsed, checker.stats.throughput
+        )
+
+    async def _collect_entries(self, checker, entries, on_progress=None):
+        async def parse_entry(position, entry):
+            return position, await self._parse_entry(checker, *entry)
+
+        async def numbered_coros():
+            position = 0
+            async for entry in entries:
+                yield parse_entry(position, entry)
+                position += 1
+
+        # streams complete out of order, they are put back in playlist order so the output is the same on every run
+        parsed = [item async for item in run_bounded(numbered_coros(), limit=self._concurrency, on_progress=on_progress)]
+        parsed.sort(key=itemgetter(0))
+        self._streams_info.extend(info for _, info in parsed)
+
+    def _get_checker(self) -> LivenessChecker:
+        return LivenessChecker(
+            headers=self._headers,
+            timeout=self._timeout,
+            concurrency=self._concurrency,
+            limit=self._concurrency,
+            limit_per_host=self._limit_per_host,
+            deep=self._deep_check,
+            health=self._health_store,
+        )
+
+    def _build_info(self, line_info: str, stream_link: str, http: dict) -> StreamRecord:
+        attributes, title = parse_extinf(line_info)
+        country = enrich_country(attributes.pop("tvg-country", None))
+        language = enrich_language(attributes.pop("tvg-language", None))
+        return StreamRecord(
+            url=stream_link,
+            name=title,
+            logo=attributes.pop("tvg-logo", None),
+            category=attributes.pop("group-title", None),
+            tvg_id=attributes.pop("tvg-id", None),
+            tvg_name=attributes.pop("tvg-name", None),
+            tvg_url=attributes.pop("tvg-url", None),
+            country_code=country["code"],
+            country_name=country["name"],
+            language_code=language["code"],
+            language_name=language["name"],
+            # Attributes not known by the parser, eg. tvg-chno, catchup, tvg-rec
+            attributes=attributes,
+            user_agent=http.get("user_agent"),
+            referrer=http.get("referrer"),
+            schema=self._enforce_schema,
+        )
 
     @staticmethod
-    async def _run_until_completed(tasks):
-        for res in run_until_completed(tasks):
-            _ = await res
+    def _get_stream_headers(http: dict) -> dict:
+        headers = {}
+        if http.get("user_agent"):
+            headers["User-Agent"] = http["user_agent"]
+        if http.get("referrer"):
+            headers["Referer"] = http["referrer"]
+        return headers
+
+    async def _parse_entry(self, checker, line_info: str, stream_link: str, status: str, http: dict):
+        info = self._build_info(line_info, stream_link, http)
+        if checker is not None and status == "BAD":
+            status = await checker.check(stream_link, headers=self._get_stream_headers(http))
+        if self._check_live:
+            info["status"] = status
+        return info
+
+    def check_streams(self, on_progress: Callable = None):
+        """Check if the stream links in the streams information list are working.
+
+        It (re)sets the status of every stream information, eg. after parsing with check_live=False.
+
+        :param on_progress: Called with (checked, in_flight) stream counts every time a stream is checked
+        :type on_progress: Callable
+        :rtype: None
+        """
+        run_sync(self.acheck_streams(on_progress=on_progress))
 
-    def _parse_lines(self):
-        num_lines = len(self._lines)
-        self._streams_info.clear()
-        try:
-            self._loop = asyncio.get_event_loop()
-        except RuntimeError:
-            self._loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self._loop)
-        coros = (self._parse_line(line_num) for line_num in range(num_lines) if "#EXTINF" in self._lines[line_num])
-        self._loop.run_until_complete(self._run_until_completed(coros))
-        self._streams_info_backup = self._streams_info.copy()
-        self._loop.run_until_complete(asyncio.sleep(0))
-        while self._loop.is_running():
-            time.sleep(0.3)
-            if not self._loop.is_running():
-                self._loop.close()
-                break
-        logging.info("Parsing completed !!!")
-
-    async def _parse_line(self, line_num: int):
-        line_info = self._lines[line_num]
-        stream_link = ""
-        streams_link = []
-        status = "BAD"
-        try:
-            for i in [1, 2]:
-                is_acestream = streams_regex.search(self._lines[line_num + i])
-                if self._lines[line_num + i] and (is_acestream or is_valid_url(self._lines[line_num + i])):
-                    streams_link.append(self._lines[line_num + i])
-                    if is_acestream:
-                        status = "GOOD"
-                    break
-                elif self._lines[line_num + i] and re.search(self._file_regex, self._lines[line_num + i]):
-                    status = "GOOD"
-                    streams_link.append(self._lines[line_num + i])
+    async def acheck_streams(self, on_progress: Callable = None):
+        """Async version of check_streams.
+
+        :param on_progress: Called with (checked, in_flight) stream counts every time a stream is checked
+        :type on_progress: Callable
+        :rtype: None
+        """
+
+        async def check_link(checker, stream_info):
+            status = self._get_stream_link(stream_info["url"])
+            if status == "BAD":
+                headers = self._get_stream_headers(stream_info.get("http") or {})
+                status = await checker.check(stream_info["url"], headers=headers)
+            stream_info["status"] = status
+
+        promoted = []
+
+        async def check(checker, stream_info):
+            await check_link(checker, stream_info)
+            # a deduplicated channel switches to its first working fallback
+            for fallback in stream_info.fallbacks or ():
+                if stream_info.status == "GOOD":
                     break
-            stream_link = streams_link[0]
-        except IndexError:
-            pass
-        if line_info and stream_link:
-            info = {}
-            # Title
-            title = get_by_regex(self._title_regex, line_info)
-            if title != None or self._enforce_schema:
-                info["name"] = title
-            # Logo
-            logo = get_by_regex(self._logo_regex, line_info)
-            if logo != None or self._enforce_schema:
-                info["logo"] = logo
-            info["url"] = stream_link
-            # Category
-            category = get_by_regex(self._category_regex, line_info)
-            if category != None or self._enforce_schema:
-                info["category"] = category
-            # TVG information
-            tvg_id = get_by_regex(self._tvg_id_regex, line_info)
-            tvg_name = get_by_regex(self._tvg_name_regex, line_info)
-            tvg_url = get_by_regex(self._tvg_url_regex, line_info)
-            if tvg_id != None or tvg_name != None or tvg_url != None or self._enforce_schema:
-                info["tvg"] = {}
-                for key, val in zip(["id", "name", "url"], [tvg_id, tvg_name, tvg_url]):
-                    if val != None or self._enforce_schema:
-                        info["tvg"][key] = val
-            # Country
-            country = get_by_regex(self._country_regex, line_info)
-            if country != None or self._enforce_schema:
-                country_obj = pycountry.countries.get(alpha_2=country if country else "")
-                info["country"] = {
-                    "code": country,
-                    "name": country_obj.name if country_obj else None,
-                }
-            # Language
-            language = get_by_regex(self._language_regex, line_info)
-            if language != None or self._enforce_schema:
-                language_obj = pycountry.languages.get(name=language if language else "")
-                info["language"] = {
-                    "code": language_obj.alpha_3 if language_obj else None,
-                    "name": language,
-                }
-
-            timeout = aiohttp.ClientTimeout(total=self._timeout)
-            if self._check_live and status == "BAD":
-                try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.request(
-                            "get",
-                            stream_link,
-                            headers=self._headers,
-                            timeout=timeout,
-                        ) as response:
-                            if response.status == 200:
-                                status = "GOOD"
-                except:
-                    pass
-            if self._check_live:
-                info["status"] = status
-            self._streams_info.append(info)
+                await check_link(checker, fallback)
+                if fallback.status == "GOOD":
+                    promote(stream_info, fallback)
+                    promoted.append(stream_info)
+
+        self._check_live = True
+        async with self._get_checker() as checker:
+            coros = (check(checker, stream_info) for stream_info in self._streams_info)
+            async for _ in run_bounded(coros, limit=self._concurrency, on_progress=on_progress):
+                pass
+        if promoted:
+            # the index and the view were built from the urls the promoted channels had before
+            self._index = None
+            self._view = None
+        self._check_stats = checker.stats
+        self._check_reports = checker.reports
+        self._latencies = checker.latencies
+
+    def _get_latency(self, record) -> Union[float, None]:
+        """Returns the latency measured by the last check or kept in the health store for a stream, None if unknown."""
+        if record.url in self._latencies:
+            return self._latencies[record.url]
+        if self._health_store is not None:
+            headers = self._get_stream_headers(record.get("http") or {})
+            entry = self._health_store.get(record.url, headers, check_mode(self._deep_check))
+            return entry["latency"] if entry else None
+        return None
+
+    def deduplicate(self, keys: tuple = ("url", "tvg_id", "name")):
+        """Merge the copies of every channel into one stream information with ranked fallback links.
+
+        Streams are duplicates if their canonical url (without scheme, tokens and expiry parameters), tvg-id or
+        canonical name (without case, accents, punctuation and quality markers like HD) are equal. Every channel keeps
+        its best link and gets the others as "fallbacks", GOOD links first and then ordered by the latency measured by
+        the last check or the health store. The deduplicated list replaces the parsed streams, check_streams only
+        probes the fallbacks of a channel whose link is not working and switches it to the first working one.
+
+        :Example
+
+        >>> parser.parse_m3u_many(urls, check_live=False)
+        >>> parser.deduplicate()
+        >>> parser.check_streams()
+
+        :param keys: Canonical keys to compare, url/tvg_id/name
+        :type keys: tuple
+        :rtype: None
+        """
+        count = len(self._streams_info)
+        self._streams_info = deduplicate(self._streams_info, keys=keys, latency=self._get_latency)
+        self._streams_info_backup = self._streams_info.copy()
+        self._index = None
+        self._view = None
+        logging.info("Merged %d streams into %d channels", count, len(self._streams_info))
 
     def filter_by(
         self,
@@ -217,6 +526,7 @@ class M3uParser:
         key_splitter: str = "-",
         retrieve: bool = True,
         nested_key: bool = False,
+        exact: bool = False,
     ):
         """Filter streams infomation.
 
@@ -233,9 +543,12 @@ class M3uParser:
         :type retrieve: bool
         :param nested_key: True/False for if the key is nested or not.
         :type nested_key: bool
+        :param exact: True to match the whole value case-insensitively instead of searching regex filter/s in it.
+            Exact filters on category, country-code, language-name and language-code are answered from hash indexes.
+        :type exact: bool
         :rtype: None
         """
-        key_0, key_1 = [""] * 2
+        key_0, key_1 = key, ""
         if nested_key:
             try:
                 key_0, key_1 = key.split(key_splitter)
@@ -247,54 +560,85 @@ class M3uParser:
             return
         if not isinstance(filters, list):
             filters = [filters]
-        any_or_all = any if retrieve else all
-        not_operator = lambda x: x if retrieve else not x
+        if exact and (key_0, key_1) in index_fields:
+            self._filter_by_index(index_fields[(key_0, key_1)], filters, retrieve)
+            return
+        get_value = field_getter(key_0, key_1)
+        if exact:
+            wanted = {str(fltr).casefold() for fltr in filters}
+            matches = lambda value: str(value).casefold() in wanted
+        else:
+            matches = matcher(filters)
         try:
-            self._streams_info = list(
-                filter(
-                    lambda stream_info: any_or_all(
-                        not_operator(
-                            re.search(
-                                re.compile(fltr, flags=re.IGNORECASE),
-                                stream_info.get(key_0, {}).get(key_1, "") if nested_key else stream_info.get(key, ""),
-                            )
-                        )
-                        for fltr in filters
-                    ),
-                    self._streams_info,
-                )
-            )
+            self._streams_info = [
+                stream_info for stream_info in self._streams_info if matches(get_value(stream_info)) == retrieve
+            ]
         except AttributeError:
             logging.error("Key given is not nested !!!")
 
+    def _get_index(self) -> StreamIndex:
+        if self._index is None:
+            self._index = StreamIndex(self._streams_info_backup)
+        return self._index
+
+    def _filter_by_index(self, name: str, values: list, retrieve: bool):
+        found = {id(stream_info) for stream_info in self._get_index().lookup_records(name, values)}
+        self._streams_info = [stream_info for stream_info in self._streams_info if (id(stream_info) in found) == retrieve]
+
     def reset_operations(self):
         """Reset the stream information list to initial state before various operations.
 
+        The parsed streams are shared, not copied, so resetting is free.
+
         :rtype: None
         """
-        self._streams_info = self._streams_info_backup.copy()
+        self._streams_info = self._streams_info_backup
+
+    def view(self) -> StreamView:
+        """Get a non-destructive view of all the parsed streams.
+
+        Views share the parsed streams and its indexes, filtering or sorting a view returns a new lazily evaluated
+        view and never changes the parser or other views, so one parser can serve many views at the same time.
+
+        :Example
+
+        >>> sports = parser.view().retrieve_by_category("Spor").remove_by_extension("mp4")
+        >>> sports.get_list()
+
+        :return: View of all the parsed streams
+        :rtype: StreamView
+        """
+        if self._view is None:
+            self._view = StreamView(self._streams_info_backup, self._get_index())
+        return self._view
 
     def remove_by_extension(self, extension: Union[str, list]):
         """Remove stream information with certain extension/s.
 
         It removes stream information from streams information list based on extension/s provided.
+        The extension is the suffix of the last segment of the url path, the query string and fragment are
+        ignored, eg. https://host/live.m3u8?token=1 has the extension m3u8.
 
         :param extension: Name of the extension like mp4, m3u8 etc. It can be a string or list of extension/s.
         :type extension: str or list
         :rtype: None
         """
-        self.filter_by("url", extension, retrieve=False, nested_key=False)
+        extensions = extension if isinstance(extension, list) else [extension]
+        self._filter_by_index("extension", [ext.lstrip(".") for ext in extensions], retrieve=False)
 
     def retrieve_by_extension(self, extension: Union[str, list]):
         """Select only streams information with a certain extension/s.
 
         It retrieves the stream information based on extension/s provided.
+        The extension is the suffix of the last segment of the url path, the query string and fragment are
+        ignored, eg. https://host/live.m3u8?token=1 has the extension m3u8.
 
         :param extension: Name of the extension like mp4, m3u8 etc. It can be a string or list of extension/s.
         :type extension: str or list
         :rtype: None
         """
-        self.filter_by("url", extension, retrieve=True, nested_key=False)
+        extensions = extension if isinstance(extension, list) else [extension]
+        self._filter_by_index("extension", [ext.lstrip(".") for ext in extensions], retrieve=True)
 
     def remove_by_category(self, filter_word: Union[str, list]):
         """Removes streams information with category containing a certain filter word/s.
@@ -363,7 +707,23 @@ class M3uParser:
         :return: json of the streams_info list
         :rtype: json
         """
-        return json.dumps(self._streams_info, indent=indent)
+        return json.dumps(self.get_list(), indent=indent)
+
+    def get_check_stats(self):
+        """Get the statistics of the last liveness check.
+
+        :return: Checked streams, good/bad/error/skipped/revalidated counts, elapsed time, throughput and latency percentiles
+        :rtype: dict
+        """
+        return self._check_stats.to_dict() if self._check_stats else {}
+
+    def get_check_reports(self):
+        """Get the deep check reports of the last liveness check, see deep_check of M3uParser.
+
+        :return: Per stream url status, per step latency and per variant delivered bitrate
+        :rtype: dict
+        """
+        return self._check_reports
 
     def get_list(self):
         """Get the parsed streams information list.
@@ -373,7 +733,7 @@ class M3uParser:
         :return: Streams information list
         :rtype: list
         """
-        return self._streams_info
+        return [stream_info.to_dict() for stream_info in self._streams_info]
 
     def get_random_stream(self, random_shuffle: bool = True):
         """Return a random stream information
@@ -389,50 +749,45 @@ class M3uParser:
             logging.error("No streams information so could not get any random stream.")
             return
         if random_shuffle:
+            if self._streams_info is self._streams_info_backup:
+                self._streams_info = self._streams_info.copy()
             random.shuffle(self._streams_info)
-        return random.choice(self._streams_info)
+        return random.choice(self._streams_info).to_dict()
 
-    def _get_m3u_content(self) -> str:
-        """Save the streams information list to m3u file.
-
-        It saves the streams information list to m3u file.
+    async def ato_file(self, filename: str, format: str = "json", compression: str = None):
+        """Async version of to_file, the file is written in a worker thread.
 
+        :param filename: Name of the file to save streams_info as.
+        :type filename: str
+        :param format: csv/json/jsonl/m3u to save the streams_info.
+        :type format: str
+        :param compression: gzip/zstd to compress the file.
+        :type compression: str
         :rtype: None
         """
-        if len(self._streams_info) == 0:
-            return ""
-        content = ["#EXTM3U"]
-        for stream_info in self._streams_info:
-            line = "#EXTINF:-1"
-            if stream_info.get("tvg") != None:
-                for key, value in stream_info["tvg"].items():
-                    if value != None:
-                        line += ' tvg-{}="{}"'.format(key, value)
-            if stream_info.get("logo") != None:
-                line += ' tvg-logo="{}"'.format(stream_info["logo"])
-            if stream_info.get("country") != None and stream_info["country"].get("code") != None:
-                line += ' tvg-country="{}"'.format(stream_info["country"]["code"])
-            if stream_info.get("language") != None and stream_info["language"].get("name") != None:
-                line += ' tvg-language="{}"'.format(stream_info["language"]["name"])
-            if stream_info.get("category") != None:
-                line += ' group-title="{}"'.format(stream_info["category"])
-            if stream_info.get("name") != None:
-                line += ',' + stream_info['name']
-            content.append(line)
-            content.append(stream_info["url"])
-        return "\n".join(content)
-
-    def to_file(self, filename: str, format: str = "json"):
-        """Save to file (CSV, JSON, or M3U)
-
-        It saves streams information as a CSV, JSON, or M3U file with a given filename and format parameters.
+        await asyncio.to_thread(self.to_file, filename, format, compression)
+
+    def to_file(self, filename: str, format: str = "json", compression: str = None):
+        """Save to file (CSV, JSON, JSON lines, or M3U)
+
+        It saves streams information as a CSV, JSON, JSON lines or M3U file with a given filename and format parameters.
+        Streams are written one by one, the output is never built in memory. A filename ending with .gz/.zst is
+        compressed with gzip/zstd, zstd needs Python 3.14+ or the zstandard package.
 
         :param filename: Name of the file to save streams_info as.
         :type filename: str
-        :param format: csv/json/m3u to save the streams_info.
+        :param format: csv/json/jsonl/m3u to save the streams_info.
         :type format: str
+        :param compression: gzip/zstd to compress the file.
+        :type compression: str
         :rtype: None
         """
+        for name, suffix in compression_suffixes.items():
+            if filename.lower().endswith(suffix):
+                filename, compression = filename[: -len(suffix)], name
+        if compression is not None and compression not in compression_suffixes:
+            logging.error("Unrecognised compression!!!")
+            return
         format = filename.split(".")[-1] if len(filename.split(".")) > 1 else format
 
         def with_extension(name, ext):
@@ -443,30 +798,29 @@ class M3uParser:
                 return name + ".%s" % ext
 
         filename = with_extension(filename, format)
+        if compression is not None:
+            filename += compression_suffixes[compression]
         if len(self._streams_info) == 0:
             logging.info("Either parsing is not done or no stream info was found after parsing !!!")
             return
-        logging.info("Saving to file: %s" % filename)
-        if format == "json":
-            data = json.dumps(self._streams_info, indent=4)
-            with open(filename, mode="w", encoding="utf-8") as fp:
-                fp.write(data)
-            logging.info("Saved to file: %s" % filename)
-
-        elif format == "csv":
-            if self._enforce_schema:
-                ndict_to_csv(self._streams_info, filename)
-                logging.info("Saved to file: %s" % filename)
-            else:
-                logging.info("Saving to csv file not supported if the schema was not forced (enforce_schema) !!!")
-
-        elif format == "m3u":
-            content = self._get_m3u_content()
-            with open(filename, mode="w", encoding="utf-8") as fp:
-                fp.write(content)
-            logging.info("Saved to file: %s" % filename)
-        else:
+        writers = {
+            "json": lambda fp: write_json(fp, self._streams_info),
+            "jsonl": lambda fp: write_jsonl(fp, self._streams_info),
+            "csv": lambda fp: write_csv(fp, self._streams_info),
+            "m3u": lambda fp: write_m3u(fp, self._streams_info, self._http_options),
+        }
+        if format not in writers:
             logging.error("Unrecognised format!!!")
+            return
+        logging.info("Saving to file: %s" % filename)
+        try:
+            # csv module writes its own \r\n line endings, same as the files written so far
+            with open_output(filename, compression) as fp:
+                writers[format](fp)
+        except ImportError:
+            logging.error("zstd compression needs Python 3.14+ or the zstandard package !!!")
+            return
+        logging.info("Saved to file: %s" % filename)
 
 
 if __name__ == "__main__":
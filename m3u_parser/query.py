@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import re
+from functools import lru_cache
+from operator import attrgetter
+from typing import Callable, Union
+
+try:
+    from enrich import split_codes, split_values
+except ModuleNotFoundError:
+    from .enrich import split_codes, split_values
+
+# (key, nested key) of the stream information dict -> StreamRecord slot
+record_fields = {
+    ("name", ""): "name",
+    ("logo", ""): "logo",
+    ("url", ""): "url",
+    ("category", ""): "category",
+    ("status", ""): "status",
+    ("source", ""): "source",
+    ("tvg", "id"): "tvg_id",
+    ("tvg", "name"): "tvg_name",
+    ("tvg", "url"): "tvg_url",
+    ("country", "code"): "country_code",
+    ("country", "name"): "country_name",
+    ("language", "code"): "language_code",
+    ("language", "name"): "language_name",
+    ("http", "user_agent"): "user_agent",
+    ("http", "referrer"): "referrer",
+}
+# (key, nested key) -> name of the hash index that can answer exact matches on it
+index_fields = {
+    ("category", ""): "category",
+    ("country", "code"): "country",
+    ("language", "name"): "language",
+    ("language", "code"): "language_code",
+}
+
+
+# backreferences and conditionals refer to groups by number or name, eg. (a)\1, (?P=name) or (?(1)a|b)
+_group_reference_regex = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+@lru_cache(maxsize=256)
+def compile_filters(filters: tuple) -> Union[re.Pattern, list]:
+    """Compiles filter/s once into a single case-insensitive alternation.
+
+    Searching the alternation matches if any of the filters matches. Filters that can not be combined are returned
+    as a list of compiled patterns instead: ones with global inline flags or clashing group names, and ones with
+    group references, as the groups of the later filters are renumbered in the alternation.
+
+    :param filters: Tuple of regex filter/s
+    :type filters: tuple
+    :rtype: re.Pattern, list
+    """
+    if len(filters) == 1:
+        return re.compile(filters[0], flags=re.IGNORECASE)
+    patterns = [re.compile(fltr, flags=re.IGNORECASE) for fltr in filters]
+    if any(pattern.groups and _group_reference_regex.search(pattern.pattern) for pattern in patterns):
+        return patterns
+    try:
+        return re.compile("|".join("(?:%s)" % fltr for fltr in filters), flags=re.IGNORECASE)
+    except re.error:
+        return patterns
+
+
+def matcher(filters: list) -> Callable:
+    """Returns a function telling if any of the filter/s matches a value, None values are matched as ''."""
+    compiled = compile_filters(tuple(filters))
+    if isinstance(compiled, list):
+        return lambda value: any(pattern.search(value or "") for pattern in compiled)
+    search = compiled.search
+    return lambda value: search(value or "") is not None
+
+
+def field_getter(key: str, nested_key: str = "") -> Callable:
+    """Returns a function reading the value of a (nested) key from a StreamRecord or a stream information dict."""
+    slot = record_fields.get((key, nested_key))
+    if slot is not None:
+        get_slot = attrgetter(slot)
+
+        def get_value(stream_info):
+            if isinstance(stream_info, dict):
+                return stream_info.get(key, {}).get(nested_key, "") if nested_key else stream_info.get(key, "")
+            return get_slot(stream_info)
+
+        return get_value
+    if nested_key:
+        return lambda stream_info: stream_info.get(key, {}).get(nested_key, "")
+    return lambda stream_info: stream_info.get(key, "")
+
+
+def get_extension(url: str) -> str:
+    """Returns the lowercased extension of the path of a url, eg. m3u8 for https://host/live.m3u8?token=1."""
+    scheme_end = url.find("://")
+    path_start = url.find("/", scheme_end + 3) if scheme_end != -1 else 0
+    if path_start == -1:
+        return ""
+    path = url[path_start:].partition("?")[0].partition("#")[0]
+    name = path.rpartition("/")[2]
+    return name.rpartition(".")[2].lower() if "." in name else ""
+
+
+def _index_values(name: str, record) -> list:
+    if name == "category":
+        values = [record.category]
+    elif name == "country":
+        values = split_codes(record.country_code) if record.country_code else []
+    elif name == "language":
+        values = split_values(record.language_name) if record.language_name else []
+    elif name == "language_code":
+        values = split_codes(record.language_code) if record.language_code else []
+    elif name == "extension":
+        values = [get_extension(record.url)]
+    else:
+        raise KeyError(name)
+    return [value.casefold() for value in values if value]
+
+
+class StreamIndex:
+    """Hash indexes of stream records on category, country code, language and url extension.
+
+    An index maps each casefolded value to the positions of the records having it and is built on first use, so
+    exact-match filters are dictionary lookups instead of scans.
+
+    :Example
+
+    >>> index = StreamIndex(records)
+    >>> index.lookup("country", ["TR", "DE"])
+    [0, 3, 4]
+    """
+
+    names = ("category", "country", "language", "language_code", "extension")
+
+    def __init__(self, records: list):
+        self._records = records
+        self._indexes = {}
+
+    def _get_index(self, name: str) -> dict:
+        if name not in self._indexes:
+            index = {}
+            for position, record in enumerate(self._records):
+                for value in _index_values(name, record):
+                    positions = index.setdefault(value, [])
+                    if not positions or positions[-1] != position:
+                        positions.append(position)
+            self._indexes[name] = index
+        return self._indexes[name]
+
+    def lookup(self, name: str, values: list) -> list:
+        """Returns the sorted positions of the records having any of the values on the index.
+
+        :param name: category, country, language, language_code or extension
+        :type name: str
+        :param values: Values to look up, compared case-insensitively
+        :type values: list
+        :rtype: list
+        """
+        index = self._get_index(name)
+        lists = [index.get(str(value).casefold(), []) for value in values]
+        if len(lists) == 1:
+            return list(lists[0])
+        return sorted(set().union(*lists))
+
+    def lookup_records(self, name: str, values: list) -> list:
+        return [self._records[position] for position in self.lookup(name, values)]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+import sys
+from typing import Union
+
+
+def _intern(value: Union[str, None]) -> Union[str, None]:
+    return sys.intern(value) if value else value
+
+
+class StreamRecord:
+    """Compact stream information.
+
+    The fields of a stream are kept in slots instead of nested dicts and the repeating category, country, language
+    and http option strings are interned, so a million streams share a handful of string objects. Read access works
+    like the dict returned by to_dict(), eg. record["tvg"]["id"] or record.get("category").
+
+    :Example
+
+    >>> record = StreamRecord(url="https://example.com/live.m3u8", name="TRT 1", country_code="TR")
+    >>> record["country"]
+    {'code': 'TR', 'name': None}
+    >>> record.to_dict()
+    {'name': 'TRT 1', 'url': 'https://example.com/live.m3u8', 'country': {'code': 'TR', 'name': None}}
+    """
+
+    __slots__ = (
+        "name",
+        "logo",
+        "url",
+        "category",
+        "tvg_id",
+        "tvg_name",
+        "tvg_url",
+        "country_code",
+        "country_name",
+        "language_code",
+        "language_name",
+        "attributes",
+        "user_agent",
+        "referrer",
+        "status",
+        "source",
+        "fallbacks",
+        "schema",
+    )
+
+    _keys = (
+        "name",
+        "logo",
+        "url",
+        "category",
+        "tvg",
+        "country",
+        "language",
+        "attributes",
+        "http",
+        "status",
+        "source",
+        "fallbacks",
+    )
+    _groups = {
+        "tvg": (("id", "tvg_id"), ("name", "tvg_name"), ("url", "tvg_url")),
+        "http": (("user_agent", "user_agent"), ("referrer", "referrer")),
+    }
+    _pairs = {
+        "country": ("country_code", (("code", "country_code"), ("name", "country_name"))),
+        "language": ("language_name", (("code", "language_code"), ("name", "language_name"))),
+    }
+    _scalars = ("name", "logo", "url", "category", "status", "source")
+    _interned = frozenset(
+        ("category", "tvg_url", "country_code", "country_name", "language_code", "language_name", "user_agent", "referrer", "source")
+    )
+
+    def __init__(
+        self,
+        url: str,
+        name: str = None,
+        logo: str = None,
+        category: str = None,
+        tvg_id: str = None,
+        tvg_name: str = None,
+        tvg_url: str = None,
+        country_code: str = None,
+        country_name: str = None,
+        language_code: str = None,
+        language_name: str = None,
+        attributes: dict = None,
+        user_agent: str = None,
+        referrer: str = None,
+        status: str = None,
+        source: str = None,
+        fallbacks: tuple = None,
+        schema: bool = False,
+    ):
+        self.url = url
+        self.name = name
+        self.logo = logo
+        self.category = _intern(category)
+        self.tvg_id = tvg_id
+        self.tvg_name = tvg_name
+        self.tvg_url = _intern(tvg_url)
+        self.country_code = _intern(country_code)
+        self.country_name = _intern(country_name)
+        self.language_code = _intern(language_code)
+        self.language_name = _intern(language_name)
+        self.attributes = attributes or None
+        self.user_agent = _intern(user_agent)
+        self.referrer = _intern(referrer)
+        self.status = status
+        self.source = _intern(source)
+        # records of the same channel with other links, best first, see dedup.deduplicate
+        self.fallbacks = fallbacks
+        self.schema = schema
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        # strings are interned again when records come back from worker processes
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, _intern(value) if slot in self._interned else value)
+
+    @classmethod
+    def from_dict(cls, stream_info: dict, schema: bool = False) -> "StreamRecord":
+        """Builds a record from a stream information dict as returned by to_dict()."""
+        fields = {key: stream_info.get(key) for key in cls._scalars}
+        for key, pairs in cls._groups.items():
+            for sub_key, slot in pairs:
+                fields[slot] = (stream_info.get(key) or {}).get(sub_key)
+        for key, (_, pairs) in cls._pairs.items():
+            for sub_key, slot in pairs:
+                fields[slot] = (stream_info.get(key) or {}).get(sub_key)
+        fields["attributes"] = stream_info.get("attributes")
+        fallbacks = tuple(cls.from_dict(fallback, schema) for fallback in stream_info.get("fallbacks") or ())
+        return cls(fallbacks=fallbacks or None, schema=schema, **fields)
+
+    def _lookup(self, key: str):
+        """Returns (present, value) of a key of the dict view."""
+        if key in self._groups:
+            values = [(sub_key, getattr(self, slot)) for sub_key, slot in self._groups[key]]
+            if not self.schema and all(value is None for _, value in values):
+                return False, None
+            return True, {sub_key: value for sub_key, value in values if value is not None or self.schema}
+        if key in self._pairs:
+            presence, pairs = self._pairs[key]
+            if not self.schema and getattr(self, presence) is None:
+                return False, None
+            return True, {sub_key: getattr(self, slot) for sub_key, slot in pairs}
+        if key == "attributes":
+            return self.attributes is not None, self.attributes
+        if key == "fallbacks":
+            if not self.fallbacks:
+                return False, None
+            return True, [fallback._fallback_dict() for fallback in self.fallbacks]
+        if key in self._scalars:
+            value = getattr(self, key)
+            optional = key in ("status", "source")
+            return value is not None or (self.schema and not optional) or key == "url", value
+        return False, None
+
+    def __getitem__(self, key: str):
+        present, value = self._lookup(key)
+        if not present:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key not in self._scalars:
+            raise KeyError(key)
+        setattr(self, key, _intern(value) if key in self._interned else value)
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key)[0]
+
+    def get(self, key: str, default=None):
+        present, value = self._lookup(key)
+        return value if present else default
+
+    def _fallback_dict(self) -> dict:
+        """Returns the link of a fallback record with its http options, status and source."""
+        info = {}
+        for key in ("url", "http", "status", "source"):
+            present, value = self._lookup(key)
+            if present:
+                info[key] = value
+        return info
+
+    def to_dict(self) -> dict:
+        """Returns the stream information dict, in the same shape the parser always produced.
+
+        :rtype: dict
+        """
+        info = {}
+        for key in self._keys:
+            present, value = self._lookup(key)
+            if present:
+                info[key] = dict(value) if key == "attributes" else value
+        return info
+
+    def __repr__(self):
+        return "StreamRecord(%r)" % self.to_dict()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Union
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from aiohttp import web
+
+try:
+    from hls import is_playlist
+except ModuleNotFoundError:
+    from .hls import is_playlist
+
+uri_attribute_regex = re.compile(r'URI="([^"]+)"')
+target_duration_regex = re.compile(r"#EXT-X-TARGETDURATION:\s*(\d+)")
+token_regex = re.compile(r"^[0-9a-f]{24}(?:\.[0-9a-z]{1,5})?$")
+playlist_type = "application/vnd.apple.mpegurl"
+# #EXTVLCOPT http options of a stream information -> upstream request headers
+http_headers = {"user_agent": "User-Agent", "referrer": "Referer"}
+
+
+class UpstreamError(Exception):
+    """The upstream answered a relayed request with a status other than 200."""
+
+
+class SegmentCache:
+    """Bounded LRU of segment bodies in memory, spilling the least recently used ones to an optional disk LRU.
+
+    Both tiers are bounded by the total size of their bodies, the least recently used bodies of the disk tier are
+    deleted. Disk reads and writes are done in worker threads.
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20, directory: str = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes if directory else 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if self.max_disk_bytes:
+            os.makedirs(directory, exist_ok=True)
+            # bodies left by a previous run are not indexed, they are deleted instead of leaking disk space
+            for name in os.listdir(directory):
+                if token_regex.match(name):
+                    os.remove(os.path.join(directory, name))
+
+    def _path(self, token: str) -> str:
+        return os.path.join(self.directory, token)
+
+    async def get(self, token: str) -> Union[tuple, None]:
+        """Returns (content type, body) of a cached segment, None if it is not cached."""
+        if token in self._memory:
+            self._memory.move_to_end(token)
+            self.stats["hits"] += 1
+            return self._memory[token]
+        if token in self._disk:
+            content_type, _ = self._disk.pop(token)
+            try:
+                data = await asyncio.to_thread(self._read, token)
+            except OSError:
+                self.stats["misses"] += 1
+                return None
+            self._disk_bytes -= len(data)
+            self.stats["disk_hits"] += 1
+            await self.put(token, content_type, data)
+            return content_type, data
+        self.stats["misses"] += 1
+        return None
+
+    def _read(self, token: str) -> bytes:
+        with open(self._path(token), "rb") as fp:
+            data = fp.read()
+        os.remove(self._path(token))
+        return data
+
+    def _write(self, token: str, data: bytes):
+        with open(self._path(token), "wb") as fp:
+            fp.write(data)
+
+    async def put(self, token: str, content_type: str, data: bytes):
+        if token in self._memory:
+            self._memory_bytes -= len(self._memory.pop(token)[1])
+        self._memory[token] = (content_type, data)
+        self._memory_bytes += len(data)
+        spilled = []
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            evicted, (evicted_type, evicted_data) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted_data)
+            if len(evicted_data) <= self.max_disk_bytes:
+                spilled.append((evicted, evicted_type, evicted_data))
+        for evicted, evicted_type, evicted_data in spilled:
+            await self._spill(evicted, evicted_type, evicted_data)
+
+    async def _spill(self, token: str, content_type: str, data: bytes):
+        try:
+            await asyncio.to_thread(self._write, token, data)
+        except OSError as exc:
+            logging.error("Cannot write the segment to the disk cache: %s !!!", exc)
+            return
+        self._disk[token] = (content_type, len(data))
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.max_disk_bytes:
+            evicted, (_, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                await asyncio.to_thread(os.remove, self._path(evicted))
+            except OSError:
+                pass
+
+
+class _Playlist:
+    __slots__ = ("data", "interval", "accessed", "task")
+
+    def __init__(self, data: bytes, interval: float):
+        self.data = data
+        self.interval = interval
+        self.accessed = time.monotonic()
+        self.task = None
+
+
+class HlsRelay:
+    """Relays HLS streams through one local endpoint, so many viewers of a channel cost one upstream download.
+
+    The HLS links of a playlist are registered with their #EXTVLCOPT headers and replaced by /relay/<token> links.
+    The playlists fetched through the relay are rewritten so their variant, segment, key and map links point at the
+    relay too, and every upstream request of a channel is sent with its User-Agent/Referer.
+
+    - Concurrent requests of the same playlist/segment share one upstream fetch.
+    - Segments are kept in a SegmentCache, a bounded memory LRU with an optional disk tier.
+    - A playlist is refreshed by one timer (half its target duration, or refresh_interval) shared by all its
+      viewers, which are answered from the last copy. A playlist nobody asked for idle_timeout seconds is dropped.
+
+    :Example
+
+    >>> relay = HlsRelay("http://192.168.1.2:1453", cache_bytes=512 << 20, cache_dir="/var/cache/hls")
+    >>> server = PlaylistServer(["Kanallar/KekikAkademi.m3u"], relay=relay)
+    >>> server.run(port=1453)
+    """
+
+    manifest_extensions = (".m3u8", ".m3u")
+
+    def __init__(
+        self,
+        public_url: str,
+        cache_bytes: int = 256 << 20,
+        cache_dir: str = None,
+        cache_disk_bytes: int = 1 << 30,
+        refresh_interval: float = None,
+        idle_timeout: float = 60,
+        max_resources: int = 65536,
+        timeout: int = 10,
+        useragent: str = None,
+    ):
+        self.public_url = public_url.rstrip("/")
+        self.cache = SegmentCache(cache_bytes, cache_dir, cache_disk_bytes)
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+        self.max_resources = max_resources
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._headers = {"User-Agent": useragent} if useragent else {}
+        # channel links are kept as long as they are served, links found in playlists are bounded
+        self._channels = {}
+        self._resources = OrderedDict()
+        self._playlists = {}
+        self._inflight = {}
+        self._session = None
+        self.stats = {"upstream": 0, "coalesced": 0, "refreshes": 0}
+
+    @staticmethod
+    def _token(url: str, headers: dict) -> str:
+        digest = sha256(repr((url, sorted(headers.items()))).encode()).hexdigest()[:24]
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+        return digest + extension if re.fullmatch(r"\.[0-9a-z]{1,5}", extension) else digest
+
+    def is_hls(self, url: str) -> bool:
+        return urlsplit(url).path.lower().endswith(self.manifest_extensions)
+
+    def relay_streams(self, streams: list) -> list:
+        """Registers the HLS links of the streams information list and returns it with their relay links.
+
+        The registered channels are replaced, so links that are not served anymore stop being relayed. The http
+        options of a relayed stream are sent upstream by the relay and cleared from the returned stream information.
+
+        :param streams: Streams information list, as returned by M3uParser.get_list()
+        :type streams: list
+        :rtype: list
+        """
+        channels = {}
+        relayed = []
+        for stream_info in streams:
+            if self.is_hls(stream_info["url"]):
+                http = stream_info.get("http") or {}
+                headers = {header: http[key] for key, header in http_headers.items() if http.get(key)}
+                token = self._token(stream_info["url"], headers)
+                channels[token] = (stream_info["url"], headers)
+                stream_info = dict(stream_info, url="%s/relay/%s" % (self.public_url, token))
+                if "http" in stream_info:
+                    stream_info["http"] = {key: None for key in stream_info["http"]}
+            relayed.append(stream_info)
+        self._channels = channels
+        return relayed
+
+    def _resource_path(self, url: str, headers: dict) -> str:
+        token = self._token(url, headers)
+        if token not in self._channels:
+            self._resources[token] = (url, headers)
+            self._resources.move_to_end(token)
+            while len(self._resources) > self.max_resources:
+                self._resources.popitem(last=False)
+        return "/relay/%s" % token
+
+    def rewrite(self, content: str, base_url: str, headers: dict) -> str:
+        """Points the links of a playlist at the relay, relative links are resolved against base_url first."""
+        lines = []
+        for line in content.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                line = uri_attribute_regex.sub(
+                    lambda match: 'URI="%s"' % self._resource_path(urljoin(base_url, match.group(1)), headers), line
+                )
+            elif stripped:
+                line = self._resource_path(urljoin(base_url, stripped), headers)
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    def _interval(self, content: str) -> float:
+        if self.refresh_interval is not None:
+            return self.refresh_interval
+        match = target_duration_regex.search(content)
+        # master playlists rarely change, media playlists get new segments every target duration
+        return max(1.0, int(match.group(1)) / 2) if match else 30.0
+
+    async def _download(self, url: str, headers: dict) -> tuple:
+        self.stats["upstream"] += 1
+        async with self._session.get(url, headers=headers) as response:
+            if response.status != 200:
+                raise UpstreamError("Upstream answered %d" % response.status)
+            content_type = response.headers.get("Content-Type", "application/octet-stream")
+            return str(response.url), content_type, await response.read()
+
+    async def _fetch(self, token: str, url: str, headers: dict):
+        """Downloads a playlist/segment and caches it, concurrent calls for the same token share one download.
+
+        The download runs in its own task shielded from the callers, so a client going away does not fail the
+        download of the others.
+        """
+        task = self._inflight.get(token)
+        if task is None:
+            task = self._inflight[token] = asyncio.create_task(self._store(token, url, headers))
+            # the error is raised to the callers, it must not be logged as unretrieved if they all went away
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _store(self, token: str, url: str, headers: dict) -> tuple:
+        try:
+            final_url, content_type, data = await self._download(url, headers)
+            if is_playlist(data[:64].decode("utf-8", "ignore")):
+                content = data.decode("utf-8", "ignore")
+                data = self.rewrite(content, final_url, headers).encode()
+                entry = self._playlists.get(token)
+                if entry is None:
+                    entry = self._playlists[token] = _Playlist(data, self._interval(content))
+                    entry.task = asyncio.create_task(self._refresh_playlist(token, url, headers))
+                entry.data = data
+                return playlist_type, data
+            await self.cache.put(token, content_type, data)
+            return content_type, data
+        finally:
+            del self._inflight[token]
+
+    async def _refresh_playlist(self, token: str, url: str, headers: dict):
+        entry = self._playlists[token]
+        while True:
+            await asyncio.sleep(entry.interval)
+            if time.monotonic() - entry.accessed > self.idle_timeout:
+                del self._playlists[token]
+                return
+            self.stats["refreshes"] += 1
+            try:
+                await self._fetch(token, url, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpstreamError) as exc:
+                # viewers keep getting the last copy until the upstream answers again
+                logging.error("Cannot refresh the playlist %s: %s !!!", url, exc)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        entry = self._playlists.get(token)
+        if entry is not None:
+            entry.accessed = time.monotonic()
+            return web.Response(body=entry.data, content_type=playlist_type, headers={"Cache-Control": "no-cache"})
+        cached = await self.cache.get(token)
+        if cached is None:
+            resource = self._channels.get(token) or self._resources.get(token)
+            if resource is None:
+                raise web.HTTPNotFound()
+            try:
+                cached = await self._fetch(token, *resource)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpstreamError) as exc:
+                raise web.HTTPBadGateway(text="Upstream failed: %s" % (exc or type(exc).__name__))
+        content_type, data = cached
+        cache_control = "no-cache" if content_type == playlist_type else "public, max-age=3600"
+        return web.Response(body=data, headers={"Content-Type": content_type, "Cache-Control": cache_control})
+
+    async def _start(self, app: web.Application):
+        self._session = aiohttp.ClientSession(
+            headers=self._headers, timeout=self._timeout, connector=aiohttp.TCPConnector(limit_per_host=16)
+        )
+
+    async def _stop(self, app: web.Application):
+        tasks = [entry.task for entry in self._playlists.values()] + list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._playlists.clear()
+        await self._session.close()
+
+    def setup(self, app: web.Application):
+        """Adds the /relay/<token> route to an aiohttp application."""
+        app.router.add_get("/relay/{token}", self.handle)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Serves upstream playlists parsed by M3uParser over HTTP, refreshed on a schedule.
+
+Run with ``python -m m3u_parser.server <url> [<url> ...] [--port 1453] [--interval 300]``.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from hashlib import sha256
+from typing import Callable
+from urllib.parse import quote
+
+from aiohttp import web
+
+try:
+    from export import m3u_lines
+    from m3u_parser import M3uParser
+    from relay import HlsRelay
+except ModuleNotFoundError:
+    from .export import m3u_lines
+    from .m3u_parser import M3uParser
+    from .relay import HlsRelay
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Tells if an Accept-Encoding header allows gzip, eg. "gzip, deflate" but not "gzip;q=0"."""
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            quality = parameters.strip().lower()
+            try:
+                return not quality.startswith("q=") or float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+class Body:
+    """An encoded response body with its gzip version, ETag and last modification time."""
+
+    __slots__ = ("data", "gzipped", "etag", "content_type", "modified")
+
+    def __init__(self, data: bytes, content_type: str, previous: "Body" = None):
+        self.data = data
+        self.content_type = content_type
+        self.etag = '"%s"' % sha256(data).hexdigest()[:32]
+        if previous is not None and previous.etag == self.etag:
+            # a body that did not change keeps its modification time, so clients keep getting 304 after a refresh
+            self.modified, self.gzipped = previous.modified, previous.gzipped
+        else:
+            self.modified, self.gzipped = int(time.time()), gzip.compress(data, mtime=0)
+
+    def not_modified(self, request: web.Request) -> bool:
+        """Tells if the client copy is fresh, If-None-Match wins over If-Modified-Since like RFC 9110 says."""
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return self.modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class PlaylistSnapshot:
+    """Playlists rendered from one upstream fetch.
+
+    The full playlist as M3U and JSON, the categories list and one M3U playlist per category are encoded and
+    compressed once when the snapshot is built and then shared by every request.
+    """
+
+    def __init__(self, streams: list, http_options: dict, previous: "PlaylistSnapshot" = None):
+        self.created = time.time()
+        self.count = len(streams)
+        self.bodies = {}
+        old = previous.bodies if previous is not None else {}
+        categories = {}
+        for stream_info in streams:
+            if stream_info.get("category"):
+                categories.setdefault(stream_info["category"], []).append(stream_info)
+
+        def add(path, data, content_type):
+            self.bodies[path] = Body(data, content_type, old.get(path))
+
+        add("playlist.m3u", self.render_m3u(streams, http_options), "audio/x-mpegurl")
+        add("playlist.json", json.dumps(streams, indent=4).encode(), "application/json")
+        for category, category_streams in categories.items():
+            add("category/%s.m3u" % category, self.render_m3u(category_streams, http_options), "audio/x-mpegurl")
+        listing = [
+            {"name": category, "streams": len(category_streams), "url": "/category/%s.m3u" % quote(category)}
+            for category, category_streams in categories.items()
+        ]
+        add("categories.json", json.dumps(listing, indent=4).encode(), "application/json")
+
+    @staticmethod
+    def render_m3u(streams: list, http_options: dict) -> bytes:
+        lines = ["#EXTM3U"]
+        for stream_info in streams:
+            lines.extend(m3u_lines(stream_info, http_options))
+        return "\n".join(lines).encode()
+
+
+class PlaylistServer:
+    """Keeps the parsed, filtered upstream playlists in memory and serves them to any number of clients.
+
+    The upstream playlists are fetched and parsed by one background task every interval seconds, clients never cause
+    an upstream fetch. Every body is served with an ETag, Last-Modified and Cache-Control, answered with 304 to
+    conditional GETs and gzip compressed for clients accepting it. A failed refresh keeps the previous playlists.
+
+    Served paths: /playlist.m3u, /playlist.json, /categories.json and /category/<category>.m3u, with a relay also
+    /relay/<token> (see HlsRelay).
+
+    :Example
+
+    >>> server = PlaylistServer(
+    ...     ["https://example.com/a.m3u", "https://example.com/b.m3u"],
+    ...     interval=300,
+    ...     check_live=True,
+    ...     deduplicate=True,
+    ...     prepare=lambda parser: parser.filter_by("status", "GOOD"),
+    ...     timeout=5,
+    ... )
+    >>> server.run(port=1453)
+    """
+
+    def __init__(
+        self,
+        sources: list,
+        interval: int = 300,
+        check_live: bool = False,
+        deduplicate: bool = False,
+        prepare: Callable = None,
+        retry_interval: int = 60,
+        relay: HlsRelay = None,
+        **parser_options,
+    ):
+        """
+        :param sources: Urls/local filepaths of the upstream playlists
+        :type sources: list
+        :param interval: Seconds between two upstream fetches
+        :type interval: int
+        :param check_live: To check the streams after every fetch, see M3uParser.check_streams
+        :type check_live: bool
+        :param deduplicate: To merge the copies of every channel, see M3uParser.deduplicate
+        :type deduplicate: bool
+        :param prepare: Called with the M3uParser after every fetch to filter/sort the streams to serve
+        :type prepare: Callable
+        :param retry_interval: Seconds to wait after a failed fetch, if shorter than interval
+        :type retry_interval: int
+        :param relay: To serve the HLS streams through an HlsRelay on the same port
+        :type relay: HlsRelay
+        :param parser_options: Keyword arguments of M3uParser, eg. useragent, timeout or health_store
+        """
+        self.sources = sources
+        self.interval = interval
+        self.check_live = check_live
+        self.deduplicate = deduplicate
+        self.prepare = prepare
+        self.retry_interval = min(retry_interval, interval)
+        self.relay = relay
+        self.parser_options = parser_options
+        self.snapshot = None
+        self.next_refresh = time.time()
+        self._task = None
+
+    async def refresh(self) -> bool:
+        """Fetches and parses the upstream playlists once and swaps the served snapshot.
+
+        :return: True if the snapshot was replaced
+        :rtype: bool
+        """
+        started = time.perf_counter()
+        parser = M3uParser(**self.parser_options)
+        try:
+            if len(self.sources) == 1:
+                await parser.aparse_m3u(self.sources[0], check_live=False)
+                if self.deduplicate:
+                    parser.deduplicate()
+            else:
+                await asyncio.to_thread(
+                    parser.parse_m3u_many, self.sources, check_live=False, deduplicate=self.deduplicate
+                )
+            if self.check_live:
+                await parser.acheck_streams()
+            if self.prepare is not None:
+                self.prepare(parser)
+            streams = parser.get_list()
+        except Exception:
+            logging.exception("Refreshing the playlists failed, the previous ones are served!!!")
+            return False
+        if not streams:
+            logging.error("No streams fetched, the previous playlists are served!!!")
+            return False
+        if self.relay is not None:
+            streams = self.relay.relay_streams(streams)
+        self.snapshot = await asyncio.to_thread(PlaylistSnapshot, streams, parser._http_options, self.snapshot)
+        logging.info(
+            "Serving %d streams in %d playlists, refreshed in %.2fs",
+            self.snapshot.count,
+            len(self.snapshot.bodies),
+            time.perf_counter() - started,
+        )
+        return True
+
+    async def _refresh_loop(self):
+        while True:
+            refreshed = await self.refresh()
+            delay = self.interval if refreshed else self.retry_interval
+            self.next_refresh = time.time() + delay
+            await asyncio.sleep(delay)
+
+    async def _start(self, app: web.Application):
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def _stop(self, app: web.Application):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def _respond(self, request: web.Request, path: str) -> web.Response:
+        if self.snapshot is None:
+            return web.Response(status=503, text="Playlists are not fetched yet", headers={"Retry-After": "5"})
+        body = self.snapshot.bodies.get(path)
+        if body is None:
+            raise web.HTTPNotFound()
+        headers = {
+            "ETag": body.etag,
+            "Last-Modified": formatdate(body.modified, usegmt=True),
+            "Cache-Control": "public, max-age=%d" % max(0, self.next_refresh - time.time()),
+            "Vary": "Accept-Encoding",
+        }
+        if body.not_modified(request):
+            return web.Response(status=304, headers=headers)
+        data = body.data
+        if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+            data = body.gzipped
+        return web.Response(body=data, content_type=body.content_type, charset="utf-8", headers=headers)
+
+    async def _serve_file(self, request: web.Request) -> web.Response:
+        return self._respond(request, request.match_info["file"])
+
+    async def _serve_category(self, request: web.Request) -> web.Response:
+        return self._respond(request, "category/%s.m3u" % request.match_info["category"])
+
+    def app(self) -> web.Application:
+        """Returns the aiohttp application, the upstream playlists are refreshed while it runs."""
+        app = web.Application()
+        app.router.add_get("/{file:playlist\\.m3u|playlist\\.json|categories\\.json}", self._serve_file)
+        app.router.add_get("/category/{category:.+}.m3u", self._serve_category)
+        if self.relay is not None:
+            self.relay.setup(app)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    def run(self, host: str = "0.0.0.0", port: int = 1453):
+        web.run_app(self.app(), host=host, port=port, print=None)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("sources", nargs="+", help="Urls/local filepaths of the upstream playlists")
+    arg_parser.add_argument("--host", default="0.0.0.0")
+    arg_parser.add_argument("--port", type=int, default=1453)
+    arg_parser.add_argument("--interval", type=int, default=300, help="Seconds between two upstream fetches")
+    arg_parser.add_argument("--check-live", action="store_true", help="Serve only the working streams")
+    arg_parser.add_argument("--deduplicate", action="store_true", help="Merge the copies of every channel")
+    arg_parser.add_argument("--timeout", type=int, default=5)
+    arg_parser.add_argument("--relay-url", help="Public url of this server, to relay the HLS streams through it")
+    arg_parser.add_argument("--relay-cache-mb", type=int, default=256, help="Memory used for relayed segments")
+    arg_parser.add_argument("--relay-cache-dir", help="Directory to keep more relayed segments on the disk")
+    args = arg_parser.parse_args()
+    PlaylistServer(
+        args.sources,
+        interval=args.interval,
+        check_live=args.check_live,
+        deduplicate=args.deduplicate,
+        prepare=(lambda parser: parser.filter_by("status", "GOOD", exact=True)) if args.check_live else None,
+        relay=HlsRelay(args.relay_url, cache_bytes=args.relay_cache_mb << 20, cache_dir=args.relay_cache_dir)
+        if args.relay_url
+        else None,
+        timeout=args.timeout,
+    ).run(host=args.host, port=args.port)
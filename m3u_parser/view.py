@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+from array import array
+from typing import Union
+
+try:
+    from query import StreamIndex, field_getter, index_fields, matcher
+except ModuleNotFoundError:
+    from .query import StreamIndex, field_getter, index_fields, matcher
+
+
+def _split_key(key: str, key_splitter: str, nested_key: bool) -> Union[tuple, None]:
+    if not nested_key:
+        return key, ""
+    try:
+        key_0, key_1 = key.split(key_splitter)
+    except ValueError:
+        logging.error("Nested key must be in the format <key><key_splitter><nested_key>")
+        return None
+    return key_0, key_1
+
+
+class StreamView:
+    """Immutable, lazily evaluated view over a shared list of parsed stream records.
+
+    A view is the base list plus a chain of filter/sort operations; it stores no records, only the positions of the
+    selected ones in an array once it is evaluated. Creating a view is cheap and does not touch the records, so one
+    parsed playlist can serve many different views (eg. per user channel lists) at the same time.
+    Views over the same base can be combined with & (intersection) and | (union).
+
+    :Example
+
+    >>> sports = parser.view().retrieve_by_category("Spor")
+    >>> turkish_sports = sports.filter_by("country-code", "TR", nested_key=True, exact=True)
+    >>> len(turkish_sports), len(sports)
+    (12, 40)
+    >>> turkish_sports.get_list()
+    """
+
+    __slots__ = ("_base", "_index", "_parent", "_operation", "_positions")
+
+    def __init__(self, base: list, index: StreamIndex = None, parent: "StreamView" = None, operation: tuple = None):
+        self._base = base
+        self._index = index if index is not None else StreamIndex(base)
+        self._parent = parent
+        self._operation = operation
+        self._positions = None
+
+    def _derive(self, *operation) -> "StreamView":
+        return StreamView(self._base, self._index, parent=self, operation=operation)
+
+    @property
+    def positions(self) -> array:
+        """Positions of the selected records in the base list, evaluated on first access."""
+        if self._positions is None:
+            if self._parent is None:
+                self._positions = array("L", range(len(self._base)))
+            else:
+                self._positions = self._evaluate(self._parent.positions)
+        return self._positions
+
+    def _evaluate(self, positions: array) -> array:
+        kind = self._operation[0]
+        base = self._base
+        if kind == "index":
+            _, name, values, retrieve = self._operation
+            if retrieve and self._parent._parent is None:
+                # straight from the index when filtering all the streams
+                return array("L", self._index.lookup(name, values))
+            found = set(self._index.lookup(name, values))
+            return array("L", (position for position in positions if (position in found) == retrieve))
+        if kind == "filter":
+            _, get_value, matches, retrieve = self._operation
+            try:
+                return array(
+                    "L", (position for position in positions if matches(get_value(base[position])) == retrieve)
+                )
+            except AttributeError:
+                logging.error("Key given is not nested !!!")
+                return positions
+        if kind == "sort":
+            _, get_value, asc = self._operation
+            try:
+                return array("L", sorted(positions, key=lambda position: get_value(base[position]), reverse=not asc))
+            except (KeyError, TypeError):
+                logging.error("Key not found!!!")
+                return positions
+        if kind == "combine":
+            _, other, union = self._operation
+            other_positions = set(other.positions)
+            if not union:
+                return array("L", (position for position in positions if position in other_positions))
+            own = set(positions)
+            return array("L", sorted(own | other_positions))
+        raise ValueError("Unknown view operation: %s" % kind)
+
+    def filter_by(
+        self,
+        key: str,
+        filters: Union[str, list],
+        key_splitter: str = "-",
+        retrieve: bool = True,
+        nested_key: bool = False,
+        exact: bool = False,
+    ) -> "StreamView":
+        """Returns a view retrieving/removing the streams matching the filter/s on key, see M3uParser.filter_by.
+
+        :rtype: StreamView
+        """
+        keys = _split_key(key, key_splitter, nested_key)
+        if keys is None:
+            return self
+        if not filters:
+            logging.error("Filter word/s missing!!!")
+            return self
+        if not isinstance(filters, list):
+            filters = [filters]
+        if exact and keys in index_fields:
+            return self._derive("index", index_fields[keys], filters, retrieve)
+        if exact:
+            wanted = {str(fltr).casefold() for fltr in filters}
+            matches = lambda value: str(value).casefold() in wanted
+        else:
+            matches = matcher(filters)
+        return self._derive("filter", field_getter(*keys), matches, retrieve)
+
+    def retrieve_by_category(self, filter_word: Union[str, list]) -> "StreamView":
+        return self.filter_by("category", filter_word, retrieve=True)
+
+    def remove_by_category(self, filter_word: Union[str, list]) -> "StreamView":
+        return self.filter_by("category", filter_word, retrieve=False)
+
+    def retrieve_by_extension(self, extension: Union[str, list]) -> "StreamView":
+        extensions = extension if isinstance(extension, list) else [extension]
+        return self._derive("index", "extension", [ext.lstrip(".") for ext in extensions], True)
+
+    def remove_by_extension(self, extension: Union[str, list]) -> "StreamView":
+        extensions = extension if isinstance(extension, list) else [extension]
+        return self._derive("index", "extension", [ext.lstrip(".") for ext in extensions], False)
+
+    def sort_by(self, key: str, key_splitter: str = "-", asc: bool = True, nested_key: bool = False) -> "StreamView":
+        """Returns a view sorted by key in asc/desc order, see M3uParser.sort_by.
+
+        :rtype: StreamView
+        """
+        keys = _split_key(key, key_splitter, nested_key)
+        if keys is None:
+            return self
+        key_0, key_1 = keys
+        get_value = (lambda record: record[key_0][key_1]) if nested_key else (lambda record: record[key_0])
+        return self._derive("sort", get_value, asc)
+
+    def _check_base(self, other: "StreamView"):
+        if other._base is not self._base:
+            raise ValueError("Only views over the same parsed streams can be combined")
+
+    def __and__(self, other: "StreamView") -> "StreamView":
+        self._check_base(other)
+        return self._derive("combine", other, False)
+
+    def __or__(self, other: "StreamView") -> "StreamView":
+        self._check_base(other)
+        return self._derive("combine", other, True)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self):
+        base = self._base
+        return (base[position] for position in self.positions)
+
+    def get_list(self) -> list:
+        """Get the streams information list of the view.
+
+        :rtype: list
+        """
+        return [record.to_dict() for record in self]
+
+    def get_json(self, indent: int = 4) -> str:
+        """Get the streams information of the view as json.
+
+        :rtype: str
+        """
+        return json.dumps(self.get_list(), indent=indent)
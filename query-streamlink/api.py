@@ -1,10 +1,14 @@
+import os
+
 import streamlink
 from streamlink import NoPluginError, PluginError
 
+from cache import ResolutionCache
+
 
-def get_streams(query):
+def resolve_streams(query):
     """
-    Get data streams
+    Resolve data streams with Streamlink, without caching
     Returns: (links), Error string
     """
     try:
@@ -21,4 +25,27 @@ def get_streams(query):
     except NoPluginError:
         return f"Streamlink was unable to process your query, because no plugin has been implemented for website {query}"
     except PluginError as pex:
-        return f"Streamlink couldn't process {query}, because of a Plugin error. Reason is as follows: {pex}"
\ No newline at end of file
+        return f"Streamlink couldn't process {query}, because of a Plugin error. Reason is as follows: {pex}"
+
+
+def _resolve(query):
+    result = resolve_streams(query)
+    return result, result is not None and result.startswith(("http://", "https://"))
+
+
+resolution_cache = ResolutionCache(
+    _resolve,
+    maxsize=int(os.environ.get("STREAM_CACHE_SIZE", 1024)),
+    ttl=int(os.environ.get("STREAM_CACHE_TTL", 120)),
+    error_ttl=int(os.environ.get("STREAM_CACHE_ERROR_TTL", 10)),
+    refresh_ahead=os.environ.get("STREAM_CACHE_REFRESH", "0") == "1",
+)
+
+
+def get_streams(query, submit=None, timeout=None):
+    """
+    Get data streams, resolved URLs are cached by query
+    Only cache misses are resolved through submit (eg. ResolverPool.submit), see ResolutionCache.get
+    Returns: (links), Error string
+    """
+    return resolution_cache.get(query, submit=submit, timeout=timeout)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "refresh_at", "hits")
+
+    def __init__(self, value, ttl, refresh_after, hits=0):
+        now = time.monotonic()
+        self.value = value
+        self.expires = now + ttl
+        self.refresh_at = now + ttl * refresh_after
+        self.hits = hits
+
+
+class ResolutionCache:
+    """
+    TTL cache with LRU eviction for resolved stream URLs, keyed by query.
+    Concurrent lookups of the same query share one in-flight resolution.
+    With refresh_ahead, queries asked at least popular_hits times are resolved
+    again in the background once refresh_after of their TTL has passed.
+    The resolver returns (value, ok); failed resolutions are kept for error_ttl.
+    """
+
+    def __init__(self, resolver, maxsize=1024, ttl=120, error_ttl=10, refresh_ahead=False, refresh_after=0.75,
+                 popular_hits=5):
+        self.resolver = resolver
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.refresh_ahead = refresh_ahead
+        self.refresh_after = refresh_after
+        self.popular_hits = popular_hits
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "skipped_refreshes": 0}
+
+    def _resolve(self, query, future):
+        try:
+            value, ok = self.resolver(query)
+        except Exception as ex:
+            with self._lock:
+                del self._inflight[query]
+            future.set_exception(ex)
+            return
+        with self._lock:
+            previous = self._entries.get(query)
+            hits = previous.hits if previous else 0
+            self._entries[query] = _Entry(value, self.ttl if ok else self.error_ttl, self.refresh_after, hits)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            del self._inflight[query]
+        future.set_result(value)
+
+    def _refresh(self, query, entry, now, submit):
+        """
+        Starts a background resolution of a popular query about to expire, called with the lock held
+        With submit the refresh takes a pool slot like a miss; when submit raises (eg. PoolFull) it is skipped
+        and the cached value is served until it expires
+        """
+        if not self.refresh_ahead or entry.hits < self.popular_hits or now < entry.refresh_at:
+            return
+        if query in self._inflight:
+            return
+        future = Future()
+        try:
+            if submit is None:
+                threading.Thread(target=self._resolve, args=(query, future), daemon=True).start()
+            else:
+                submit(self._resolve, query, future)
+        except Exception:
+            self._stats["skipped_refreshes"] += 1
+            return
+        self._inflight[query] = future
+        self._stats["refreshes"] += 1
+
+    def get(self, query, submit=None, timeout=None):
+        """
+        Returns the cached value of query, a miss is resolved once and shared with concurrent callers
+        With submit (eg. ResolverPool.submit), the miss is resolved by submit(func, *args) instead of the calling thread,
+        so hits and coalesced callers never take a worker; an error raised by submit fails every caller of the query
+        Refresh-ahead resolutions are started through submit too
+        Raises: concurrent.futures.TimeoutError if the resolution takes longer than timeout seconds
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry.expires > now:
+                self._entries.move_to_end(query)
+                entry.hits += 1
+                self._stats["hits"] += 1
+                self._refresh(query, entry, now, submit)
+                return entry.value
+            future = self._inflight.get(query)
+            owner = future is None
+            if owner:
+                future = self._inflight[query] = Future()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if owner:
+            if submit is None:
+                self._resolve(query, future)
+            else:
+                try:
+                    submit(self._resolve, query, future)
+                except Exception as ex:
+                    with self._lock:
+                        del self._inflight[query]
+                    future.set_exception(ex)
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), inflight=len(self._inflight))
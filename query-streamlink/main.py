@@ -1,9 +1,13 @@
 #!/usr/bin/env python
+import os
+from concurrent.futures import TimeoutError as ResolutionTimeout
+
 from flask import Flask, request, redirect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import validators
 from api import get_streams
+from pool import PoolFull, ResolverPool
 
 app = Flask(__name__)
 
@@ -12,6 +16,13 @@ limiter = Limiter(
     key_func=get_remote_address
 )
 
+# cache misses are resolved on a bounded pool, params are "STREAM_WORKERS", "STREAM_QUEUE_DEPTH", "STREAM_TIMEOUT"
+resolver_pool = ResolverPool(
+    workers=int(os.environ.get("STREAM_WORKERS", 8)),
+    queue_depth=int(os.environ.get("STREAM_QUEUE_DEPTH", 32)),
+    timeout=float(os.environ.get("STREAM_TIMEOUT", 20)),
+)
+
 
 def query_handler(args):
     """Checks and tests arguments before serving request"""
@@ -19,7 +30,10 @@ def query_handler(args):
         return "You didn't give any URL."
 
     valid = validators.url(args.get("streaming-ip"))
-    return get_streams(args.get("streaming-ip")) if valid else "The URL you've entered is not valid."
+    if not valid:
+        return "The URL you've entered is not valid."
+    # cached and already resolving queries are answered without taking a pool slot
+    return get_streams(args.get("streaming-ip"), submit=resolver_pool.submit, timeout=resolver_pool.timeout)
 
 
 @app.route("/", methods=['GET'])
@@ -35,7 +49,12 @@ def index():
 @limiter.limit("20/minute")
 @limiter.limit("1/second")
 def home():
-    response = query_handler(request.args)
+    try:
+        response = query_handler(request.args)
+    except PoolFull:
+        return "The server is busy resolving other streams, please try again in a moment.", 503, {"Retry-After": "1"}
+    except ResolutionTimeout:
+        return f"Streamlink took too long to resolve {request.args.get('streaming-ip')}", 504
     if response is None:
         return f"Streamlink returned nothing from query {request.args.get('streaming-ip')}"
 
@@ -50,5 +69,6 @@ def ratelimit_handler():
 
 
 # change to your likings, params are "ip", "port", "threaded"
+# requests only wait on the resolver pool, so they are served on threads
 if __name__ == '__main__':
-    app.run(threaded=False, port=5000)
\ No newline at end of file
+    app.run(threaded=True, port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class ResolverPool:
+    """
+    Runs resolutions on a bounded thread pool, so one slow resolution never blocks the other clients.
+    At most `workers` resolutions run at once and at most `queue_depth` more wait for a worker,
+    anything beyond is rejected right away instead of piling up.
+    A resolution that times out keeps its worker (and queue slot) until it really finishes.
+    """
+
+    def __init__(self, workers=8, queue_depth=32, timeout=20):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolver")
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PoolFull()
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        """
+        Resolve on the pool and wait at most `timeout` seconds
+        Raises: PoolFull, concurrent.futures.TimeoutError
+        """
+        return self.submit(func, *args).result(timeout=self.timeout)
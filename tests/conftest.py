@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# ? Betikler (TRGoals.py, KONTROL.py) ve m3u_parser paketi depo kökünden içe aktarılır
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
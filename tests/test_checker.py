@@ -0,0 +1,65 @@
+import asyncio
+
+from aiohttp import web
+
+from m3u_parser.checker import LivenessChecker
+from m3u_parser.health import HealthStore
+
+MEDIA_PLAYLIST = "#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXTINF:6,\nsegment1.ts\n#EXTINF:6,\nmissing.ts\n"
+
+
+async def serve(routes: dict) -> tuple:
+    """Serves {path: (status, body)} on a local port, returns the runner and the base url."""
+
+    async def handle(request):
+        status, body = routes.get(request.path, (404, ""))
+        return web.Response(status=status, text=body)
+
+    app = web.Application()
+    app.router.add_route("*", "/{path:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, "http://127.0.0.1:%d" % site._server.sockets[0].getsockname()[1]
+
+
+def test_shallow_and_deep_results_are_kept_apart(tmp_path):
+    async def check_all():
+        runner, base_url = await serve({"/live.m3u8": (200, MEDIA_PLAYLIST), "/segment1.ts": (200, "x" * 100)})
+        store = HealthStore(str(tmp_path / "health.sqlite3"))
+        try:
+            statuses = []
+            for deep in (False, True, False, True):
+                async with LivenessChecker(deep=deep, health=store) as checker:
+                    statuses.append((await checker.check(base_url + "/live.m3u8"), checker.stats.skipped))
+            return statuses
+        finally:
+            store.close()
+            await runner.cleanup()
+
+    # the playlist answers, but its newest segment is missing, which only the deep check sees
+    assert asyncio.run(check_all()) == [("GOOD", 0), ("BAD", 0), ("GOOD", 1), ("BAD", 1)]
+
+
+def test_shallow_keys_are_unchanged():
+    assert HealthStore.key("http://a/b", {"User-Agent": "x"}) == '["http://a/b", [["User-Agent", "x"]]]'
+    assert HealthStore.key("http://a/b", None, "all") == '["http://a/b", [], "all"]'
+
+
+def test_playlist_answering_head_must_be_a_playlist():
+    async def check_all():
+        runner, base_url = await serve(
+            {
+                "/live.m3u8": (200, MEDIA_PLAYLIST),
+                "/error.m3u8": (200, "<html>Channel not found</html>"),
+                "/video.mp4": (200, "not checked"),
+            }
+        )
+        try:
+            async with LivenessChecker() as checker:
+                return [await checker.check(base_url + path) for path in ("/live.m3u8", "/error.m3u8", "/video.mp4")]
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(check_all()) == ["GOOD", "BAD", "GOOD"]
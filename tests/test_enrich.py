@@ -0,0 +1,42 @@
+import pytest
+
+from m3u_parser.enrich import enrich_country, enrich_language, split_codes, split_values
+from m3u_parser.query import StreamIndex
+from m3u_parser.record import StreamRecord
+
+
+@pytest.mark.parametrize(
+    "code, name",
+    [
+        ("TR", "Türkiye"),
+        ("TR;DE", "Türkiye;Germany"),
+        ("USA | DE", "United States;Germany"),
+        ("TR,DE", "Türkiye;Germany"),
+        ("Korea, Republic of", "Korea, Republic of"),
+        ("Iran, Islamic Republic of;TR", "Iran, Islamic Republic of;Türkiye"),
+        ("XX", None),
+    ],
+)
+def test_enrich_country(code, name):
+    assert enrich_country(code) == {"code": code, "name": name}
+
+
+@pytest.mark.parametrize(
+    "name, code",
+    [("Turkish", "tur"), ("Turkish;English", "tur;eng"), ("Turkish, English", "tur;eng"), ("tr", "tur"), ("", None)],
+)
+def test_enrich_language(name, code):
+    assert enrich_language(name) == {"code": code, "name": name}
+
+
+def test_split_values_keeps_commas_in_names():
+    assert split_values(" Korea, Republic of ; TR ") == ["Korea, Republic of", "TR"]
+    assert split_codes("TR, DE|FR") == ["TR", "DE", "FR"]
+
+
+def test_country_index_splits_codes_on_commas():
+    records = [
+        StreamRecord.from_dict({"url": "http://example.com/%d" % position, "country": {"code": code}})
+        for position, code in enumerate(["TR,DE", "DE", "FR;TR"])
+    ]
+    assert StreamIndex(records).lookup("country", ["tr"]) == [0, 2]
@@ -0,0 +1,139 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from m3u_parser import M3uParser
+from m3u_parser.export import write_csv, write_json, write_jsonl, write_m3u
+from m3u_parser.record import StreamRecord
+
+HTTP_OPTIONS = {"http-user-agent": "user_agent", "http-referrer": "referrer"}
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="trt1.tr" tvg-logo="https://example.com/trt1.png" group-title="Ulusal" tvg-chno="1",TRT 1
+#EXTVLCOPT:http-user-agent=Kekik/1.0
+#EXTVLCOPT:http-referrer=https://example.com/
+https://example.com/live/trt1.m3u8
+#EXTINF:-1 group-title="Spor",Spor 1
+https://example.com/live/spor1.m3u8
+"""
+
+
+def records() -> list:
+    return [
+        StreamRecord(
+            url="https://example.com/live/trt1.m3u8",
+            name="TRT 1",
+            category="Ulusal",
+            tvg_id="trt1.tr",
+            country_code="TR",
+            country_name="Türkiye",
+            attributes={"tvg-chno": "1"},
+            user_agent="Kekik/1.0",
+        ),
+        StreamRecord(url="https://example.com/vod/film.mp4", name="Film", attributes={"catchup": "default"}),
+        StreamRecord(url="https://example.com/live/spor1.m3u8", name="Spor 1", status="GOOD"),
+    ]
+
+
+def written(writer, *args) -> str:
+    fp = io.StringIO()
+    writer(fp, *args)
+    return fp.getvalue()
+
+
+def zstd_open():
+    try:
+        from compression import zstd
+    except ImportError:
+        zstd = pytest.importorskip("zstandard")
+    return zstd.open
+
+
+def test_write_json_equals_json_dump():
+    dicts = [record.to_dict() for record in records()]
+    assert written(write_json, records()) == json.dumps(dicts, indent=4)
+    assert written(write_json, iter(records()), 2) == json.dumps(dicts, indent=2)
+    assert written(write_json, []) == "[]"
+
+
+def test_write_jsonl():
+    lines = written(write_jsonl, records()).splitlines()
+    assert [json.loads(line) for line in lines] == [record.to_dict() for record in records()]
+    assert lines[2] == '{"name":"Spor 1","url":"https://example.com/live/spor1.m3u8","status":"GOOD"}'
+
+
+def test_write_csv_header_is_the_union_of_the_columns():
+    rows = list(csv.DictReader(io.StringIO(written(write_csv, records()))))
+    assert list(rows[0]) == [
+        "name",
+        "url",
+        "category",
+        "tvg_id",
+        "country_code",
+        "country_name",
+        "attributes_tvg-chno",
+        "http_user_agent",
+        "attributes_catchup",
+        "status",
+    ]
+    assert rows[0]["country_name"] == "Türkiye" and rows[0]["attributes_catchup"] == ""
+    assert rows[1]["attributes_catchup"] == "default" and rows[1]["attributes_tvg-chno"] == ""
+    assert rows[2]["status"] == "GOOD"
+
+
+def test_write_m3u():
+    assert written(write_m3u, records()[:1], HTTP_OPTIONS) == (
+        "#EXTM3U\n"
+        '#EXTINF:-1 tvg-id="trt1.tr" tvg-country="TR" group-title="Ulusal" tvg-chno="1",TRT 1\n'
+        "#EXTVLCOPT:http-user-agent=Kekik/1.0\n"
+        "https://example.com/live/trt1.m3u8"
+    )
+    assert written(write_m3u, [], HTTP_OPTIONS) == "#EXTM3U"
+
+
+def parse(path) -> M3uParser:
+    parser = M3uParser()
+    parser.parse_m3u(str(path), check_live=False)
+    return parser
+
+
+@pytest.mark.parametrize("filename", ["kopya.m3u", "kopya.m3u.gz"])
+def test_m3u_round_trips_through_to_file(tmp_path, filename):
+    source = tmp_path / "kanallar.m3u"
+    source.write_text(PLAYLIST, encoding="utf-8")
+    parser = parse(source)
+    parser.to_file(str(tmp_path / filename))
+
+    path = tmp_path / filename
+    if filename.endswith(".gz"):
+        path = tmp_path / "acik.m3u"
+        path.write_bytes(gzip.decompress((tmp_path / filename).read_bytes()))
+    assert "#EXTVLCOPT:http-referrer=https://example.com/" in path.read_text(encoding="utf-8")
+    assert parse(path).get_list() == parser.get_list()
+
+
+@pytest.mark.parametrize("format", ["json", "jsonl", "csv", "m3u"])
+def test_gzip_suffix_compresses_every_format(tmp_path, format):
+    source = tmp_path / "kanallar.m3u"
+    source.write_text(PLAYLIST, encoding="utf-8")
+    parser = parse(source)
+    parser.to_file(str(tmp_path / "plain"), format=format)
+    parser.to_file(str(tmp_path / ("packed.%s.gz" % format)))
+    parser.to_file(str(tmp_path / "option"), format=format, compression="gzip")
+
+    plain = (tmp_path / ("plain.%s" % format)).read_bytes()
+    assert gzip.decompress((tmp_path / ("packed.%s.gz" % format)).read_bytes()) == plain
+    assert gzip.decompress((tmp_path / ("option.%s.gz" % format)).read_bytes()) == plain
+
+
+def test_zstd_suffix(tmp_path):
+    open_zstd = zstd_open()
+    source = tmp_path / "kanallar.m3u"
+    source.write_text(PLAYLIST, encoding="utf-8")
+    parser = parse(source)
+    parser.to_file(str(tmp_path / "kanallar.jsonl.zst"))
+
+    with open_zstd(str(tmp_path / "kanallar.jsonl.zst"), mode="rt", encoding="utf-8") as fp:
+        assert [json.loads(line) for line in fp] == parser.get_list()
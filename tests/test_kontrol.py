@@ -0,0 +1,158 @@
+# ! Bu araç @keyiflerolsun tarafından | @KekikAkademi için yazılmıştır.
+
+from asyncio   import run
+from aiohttp   import web
+from json      import loads
+from xml.etree import ElementTree
+import pytest
+
+from KONTROL import IPTVParser, IstekProfili, Rapor, SaglikDeposu
+
+class SahteYayinSunucusu:
+    "Gelen her isteğin başlıklarını ve istemci bağlantısını kaydeder, Range isteğine 206 ile cevap verir"
+    GOVDE = b"\x47" * 4096
+
+    def __init__(self):
+        self.istekler = []
+
+    async def yayin(self, istek: web.Request):
+        self.istekler.append({
+            "yol"        : istek.path,
+            "user_agent" : istek.headers.get("User-Agent"),
+            "referer"    : istek.headers.get("Referer"),
+            "baglanti"   : istek.transport.get_extra_info("peername"),
+        })
+        if istek.path.startswith("/kayip"):
+            return web.Response(status=404)
+
+        if aralik := istek.http_range:
+            return web.Response(status=206, body=self.GOVDE[aralik], headers={"Content-Range": f"bytes {aralik.start}-{aralik.stop - 1}/{len(self.GOVDE)}"})
+
+        return web.Response(body=self.GOVDE)
+
+    async def baslat(self) -> str:
+        uygulama = web.Application()
+        uygulama.router.add_get("/{yol:.*}", self.yayin)
+        self.calistirici = web.AppRunner(uygulama)
+        await self.calistirici.setup()
+        site = web.TCPSite(self.calistirici, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+def m3u_yaz(dosya, kanallar: list[tuple]):
+    satirlar = ["#EXTM3U"]
+    for ad, user_agent, referer, yayin in kanallar:
+        satirlar.append(f'#EXTINF:-1 tvg-name="{ad}" group-title="Test",{ad}')
+        if user_agent:
+            satirlar.append(f"#EXTVLCOPT:http-user-agent={user_agent}")
+        if referer:
+            satirlar.append(f"#EXTVLCOPT:http-referrer={referer}")
+        satirlar.append(yayin)
+
+    dosya.write_text("\n".join(satirlar) + "\n", encoding="utf-8")
+
+@pytest.fixture
+def calisma_dizini(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SAGLIK_DOSYASI", str(tmp_path / "SAGLIK.json"))
+    return tmp_path
+
+def test_profil_basliklari_host_basina_ayri_gider_baglanti_korunur(calisma_dizini):
+    sunucular = [SahteYayinSunucusu(), SahteYayinSunucusu()]
+
+    async def islem():
+        birinci, ikinci = [await sunucu.baslat() for sunucu in sunucular]
+        try:
+            m3u_yaz(calisma_dizini / "liste.m3u", [
+                *[(f"A{sira}", "Tarayici/1.0", "https://site-a.test/", f"{birinci}/a{sira}.ts") for sira in range(3)],
+                *[(f"B{sira}", "Oynatici/2.0", None, f"{birinci}/b{sira}.ts") for sira in range(3)],
+                ("C0", "Tarayici/1.0", "https://site-a.test/", f"{ikinci}/c0.ts"),
+                ("D0", None, "https://site-d.test/", f"{ikinci}/d0.ts"),
+                ("E0", "Tarayici/1.0", "https://site-a.test/", f"{ikinci}/kayip.ts"),
+            ])
+            parser = IPTVParser(str(calisma_dizini / "liste.m3u"), host_basina=1)
+            parser.dosya_parse()
+            await parser.kanallar_kontrol()
+            return parser
+        finally:
+            for sunucu in sunucular:
+                await sunucu.calistirici.cleanup()
+
+    parser = run(islem())
+
+    assert {kanal["ad"]: kanal["profil"] for kanal in parser.kanallar}["B0"] == IstekProfili("Oynatici/2.0", None)
+
+    birinci, ikinci = (sunucu.istekler for sunucu in sunucular)
+    basliklar       = lambda istekler: {istek["yol"]: (istek["user_agent"], istek["referer"]) for istek in istekler}
+    assert basliklar(birinci) == {
+        **{f"/a{sira}.ts": ("Tarayici/1.0", "https://site-a.test/") for sira in range(3)},
+        **{f"/b{sira}.ts": ("Oynatici/2.0", None) for sira in range(3)},
+    }
+    ikinci_basliklar = basliklar(ikinci)
+    assert ikinci_basliklar["/c0.ts"] == ("Tarayici/1.0", "https://site-a.test/")
+    assert ikinci_basliklar["/kayip.ts"] == ("Tarayici/1.0", "https://site-a.test/")
+    assert ikinci_basliklar["/d0.ts"][0].startswith("python-httpx/")
+    assert ikinci_basliklar["/d0.ts"][1] == "https://site-d.test/"
+
+    # ? Aynı (profil, host) çiftinin istekleri tek keep-alive bağlantısından gider
+    baglantilar = lambda onek: {istek["baglanti"] for istek in birinci if istek["yol"].startswith(onek)}
+    assert len(baglantilar("/a")) == 1
+    assert len(baglantilar("/b")) == 1
+    assert baglantilar("/a") != baglantilar("/b")
+
+    assert [sonuc["ad"] for sonuc in parser.rapor.hatalar] == ["E0"]
+    assert parser.rapor.hatalar[0]["hata"] == "404"
+
+def test_saglik_anahtari_kontrol_kipini_ayirir():
+    kanal = {"yayin": "http://ornek.test/a.m3u8", "profil": IstekProfili("Tarayici/1.0", None)}
+    anahtarlar = {SaglikDeposu.anahtar(kanal, derin) for derin in (False, True, "hepsi")}
+    assert len(anahtarlar) == 3
+    assert SaglikDeposu.anahtar(kanal) == '["http://ornek.test/a.m3u8", "Tarayici/1.0", null]'
+
+def rapor_doldur(sonuclar: list[tuple]) -> Rapor:
+    rapor = Rapor()
+    for ad, yayin, hata in sonuclar:
+        rapor.ekle({"ad": ad, "yayin": yayin}, hata)
+
+    return rapor
+
+def test_rapor_fark_junit_ve_ozet(calisma_dizini):
+    ilk = rapor_doldur([
+        ("TRT 1"  , "http://a.test/trt1.m3u8"  , "HTTP 404"),
+        ("Kanal D", "http://a.test/kanald.m3u8", "HTTP 500"),
+        ("ATV"    , "http://a.test/atv.m3u8"   , None),
+    ])
+    assert ilk.yaz() == {"yeni": ilk.hatalar, "duzelen": [], "devam": []}
+
+    # ? Aynı hatalar farklı sırayla gelse de özet değişmez
+    ters = rapor_doldur(reversed([(sonuc["ad"], sonuc["yayin"], sonuc["hata"]) for sonuc in ilk.sonuclar]))
+    assert Rapor.ozet(ters.hatalar) == Rapor.ozet(ilk.hatalar)
+
+    ikinci = rapor_doldur([
+        ("ATV"    , "http://a.test/atv.m3u8"   , "Zaman Aşımı"),
+        ("Kanal D", "http://a.test/kanald.m3u8", "HTTP 500"),
+        ("TRT 1"  , "http://a.test/trt1.m3u8"  , None),
+    ])
+    ikinci.sure = 1.5
+    fark = ikinci.yaz()
+
+    assert [sonuc["ad"] for sonuc in fark["yeni"]]    == ["ATV"]
+    assert [sonuc["ad"] for sonuc in fark["duzelen"]] == ["TRT 1"]
+    assert [sonuc["ad"] for sonuc in fark["devam"]]   == ["Kanal D"]
+
+    kok = ElementTree.parse(calisma_dizini / "RAPOR.xml").getroot()
+    assert (kok.get("tests"), kok.get("failures"), kok.get("time")) == ("3", "2", "1.500")
+    assert [vaka.get("name") for vaka in kok if vaka.find("failure") is not None] == ["ATV", "Kanal D"]
+
+    json_rapor = loads((calisma_dizini / "RAPOR.json").read_text(encoding="utf-8"))
+    assert json_rapor["ozet"] == Rapor.ozet(ikinci.hatalar) != Rapor.ozet(ilk.hatalar)
+    assert json_rapor["fark"] == fark
+    assert f"<!-- rapor: {json_rapor['ozet']} -->" in (calisma_dizini / "HATALAR.md").read_text(encoding="utf-8")
+
+def test_rapor_hatasizsa_markdown_silinir(calisma_dizini):
+    rapor_doldur([("TRT 1", "http://a.test/trt1.m3u8", "HTTP 404")]).yaz()
+    assert (calisma_dizini / "HATALAR.md").is_file()
+
+    fark = rapor_doldur([("TRT 1", "http://a.test/trt1.m3u8", None)]).yaz()
+    assert not (calisma_dizini / "HATALAR.md").exists()
+    assert [sonuc["ad"] for sonuc in fark["duzelen"]] == ["TRT 1"]
@@ -0,0 +1,82 @@
+import re
+
+import pytest
+
+from m3u_parser import M3uParser
+from m3u_parser.query import compile_filters, get_extension, matcher
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 group-title="Spor",Spor 1
+http://example.com/live/spor1.m3u8?token=1
+#EXTINF:-1 group-title="Film",Film 1
+http://example.com/mp4/film1.ts
+#EXTINF:-1 group-title="Film",Film 2
+http://example.com/vod/film2.MP4#start
+#EXTINF:-1 group-title="Haber",Haber 1
+http://example.com/live/haber1
+"""
+
+
+def search_each(filters, value):
+    return any(re.search(fltr, value, flags=re.IGNORECASE) for fltr in filters)
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        ["spor", "film"],
+        ["^tr", "hd$"],
+        ["(a)\\1", "(b)\\1"],
+        ["(x)", "(b)\\1"],
+        ["(?P<c>b)(?P=c)", "z"],
+        ["(?P<c>a)", "(?P<c>b)"],
+        ["(a)?(?(1)a|b)", "q"],
+        ["(?i)bb", "cc"],
+    ],
+)
+@pytest.mark.parametrize("value", ["", "aa", "bb", "ab", "b", "Spor TR HD", "film", "q", "BB"])
+def test_matcher_equals_searching_each_filter(filters, value):
+    assert matcher(filters)(value) == search_each(filters, value)
+
+
+def test_group_references_are_not_combined():
+    assert isinstance(compile_filters(("(a)\\1", "(b)\\1")), list)
+    assert isinstance(compile_filters(("(spor|sport)", "film")), re.Pattern)
+
+
+@pytest.mark.parametrize(
+    "url, extension",
+    [
+        ("http://example.com/live/spor1.m3u8?token=1", "m3u8"),
+        ("http://example.com/vod/film2.MP4#start", "mp4"),
+        ("http://example.com/mp4/film1.ts", "ts"),
+        ("http://example.com/live/haber1", ""),
+        ("http://example.com", ""),
+        ("http://example.com/a.b/stream", ""),
+    ],
+)
+def test_get_extension(url, extension):
+    assert get_extension(url) == extension
+
+
+@pytest.fixture
+def parser(tmp_path):
+    playlist = tmp_path / "playlist.m3u"
+    playlist.write_text(PLAYLIST)
+    parser = M3uParser()
+    parser.parse_m3u(str(playlist), check_live=False)
+    return parser
+
+
+def test_extension_filters_match_the_url_path_suffix(parser):
+    # the mp4 directory of film1 and the query string of spor1 are not extensions
+    parser.remove_by_extension("mp4")
+    assert [stream["name"] for stream in parser.get_list()] == ["Spor 1", "Film 1", "Haber 1"]
+    parser.reset_operations()
+    parser.retrieve_by_extension([".m3u8", "ts"])
+    assert [stream["name"] for stream in parser.get_list()] == ["Spor 1", "Film 1"]
+
+
+def test_filter_by_url_still_searches_the_whole_url(parser):
+    parser.filter_by("url", "mp4", retrieve=False)
+    assert [stream["name"] for stream in parser.get_list()] == ["Spor 1", "Haber 1"]
@@ -0,0 +1,100 @@
+import pickle
+import sys
+
+import pytest
+
+from m3u_parser.record import StreamRecord
+
+FIELDS = [
+    {},
+    {"name": "TRT 1", "category": "Ulusal", "country_code": "TR", "country_name": "Türkiye"},
+    {"logo": "https://example.com/a.png", "tvg_id": "a.tr", "tvg_url": "https://example.com/epg.xml"},
+    {"language_code": "tur", "language_name": "Turkish", "attributes": {"tvg-chno": "7"}},
+    {"user_agent": "Kekik/1.0", "referrer": "https://example.com/", "status": "GOOD", "source": "a.m3u"},
+    {"tvg_name": "TRT1", "referrer": "https://example.com/", "status": "BAD"},
+]
+
+
+def stream_info(url: str, schema: bool, **fields) -> dict:
+    """The dict the parser built for a stream before records, the expected shape of to_dict()."""
+    info = {}
+    for key in ("name", "logo"):
+        if fields.get(key) is not None or schema:
+            info[key] = fields.get(key)
+    info["url"] = url
+    if fields.get("category") is not None or schema:
+        info["category"] = fields.get("category")
+    tvg = {key: fields.get("tvg_" + key) for key in ("id", "name", "url")}
+    if any(value is not None for value in tvg.values()) or schema:
+        info["tvg"] = {key: value for key, value in tvg.items() if value is not None or schema}
+    if fields.get("country_code") is not None or schema:
+        info["country"] = {"code": fields.get("country_code"), "name": fields.get("country_name")}
+    if fields.get("language_name") is not None or schema:
+        info["language"] = {"code": fields.get("language_code"), "name": fields.get("language_name")}
+    if fields.get("attributes"):
+        info["attributes"] = fields["attributes"]
+    http = {key: fields.get(key) for key in ("user_agent", "referrer")}
+    if any(value is not None for value in http.values()) or schema:
+        info["http"] = {key: value for key, value in http.items() if value is not None or schema}
+    for key in ("status", "source"):
+        if fields.get(key) is not None:
+            info[key] = fields[key]
+    return info
+
+
+@pytest.mark.parametrize("schema", [True, False])
+@pytest.mark.parametrize("fields", FIELDS)
+def test_record_reads_like_the_dict(fields, schema):
+    record = StreamRecord(url="https://example.com/live.m3u8", schema=schema, **fields)
+    expected = stream_info("https://example.com/live.m3u8", schema, **fields)
+    assert record.to_dict() == expected
+    for key in ("name", "url", "tvg", "country", "language", "attributes", "http", "status", "source", "unknown"):
+        assert (key in record) == (key in expected)
+        assert record.get(key, "-") == expected.get(key, "-")
+        if key in expected:
+            assert record[key] == expected[key]
+        else:
+            with pytest.raises(KeyError):
+                record[key]
+
+
+@pytest.mark.parametrize("schema", [True, False])
+@pytest.mark.parametrize("fields", FIELDS)
+def test_from_dict_round_trips(fields, schema):
+    record = StreamRecord(url="https://example.com/live.m3u8", schema=schema, **fields)
+    assert StreamRecord.from_dict(record.to_dict(), schema=schema).to_dict() == record.to_dict()
+
+
+def test_fallbacks_round_trip():
+    fallback = StreamRecord(url="https://b.example/live.m3u8", name="TRT 1 HD", user_agent="Kekik/1.0", status="GOOD")
+    record = StreamRecord(url="https://a.example/live.m3u8", name="TRT 1", status="BAD", fallbacks=(fallback,))
+    info = record.to_dict()
+    # fallbacks keep only their playback fields
+    assert info["fallbacks"] == [
+        {"url": "https://b.example/live.m3u8", "http": {"user_agent": "Kekik/1.0"}, "status": "GOOD"}
+    ]
+    assert StreamRecord.from_dict(info).to_dict() == info
+
+
+@pytest.mark.parametrize("fields", FIELDS)
+def test_pickling_keeps_the_record(fields):
+    record = StreamRecord(url="https://example.com/live.m3u8", schema=True, **fields)
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy.to_dict() == record.to_dict()
+    assert [getattr(copy, slot) for slot in StreamRecord.__slots__] == [
+        getattr(record, slot) for slot in StreamRecord.__slots__
+    ]
+
+
+def test_unpickled_strings_are_interned():
+    category = "".join(["Ul", "usal"])
+    copy = pickle.loads(pickle.dumps(StreamRecord(url="https://example.com/live.m3u8", category=category)))
+    assert copy.category is sys.intern("Ulusal")
+
+
+def test_only_scalars_are_assigned():
+    record = StreamRecord(url="https://example.com/live.m3u8")
+    record["status"] = "GOOD"
+    assert record.to_dict() == {"url": "https://example.com/live.m3u8", "status": "GOOD"}
+    with pytest.raises(KeyError):
+        record["tvg"] = {"id": "a"}
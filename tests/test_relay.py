@@ -0,0 +1,157 @@
+import asyncio
+from collections import Counter
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from m3u_parser.relay import HlsRelay, SegmentCache
+
+MASTER = '#EXTM3U\n#EXT-X-SESSION-KEY:METHOD=AES-128,URI="keys/session.bin"\n#EXT-X-STREAM-INF:BANDWIDTH=1\nlow/index.m3u8\n'
+MEDIA = '#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXT-X-KEY:METHOD=AES-128,URI="../keys/k1.bin"\n#EXTINF:6,\nseg1.ts\n'
+
+
+class Origin:
+    """Stub upstream counting its requests, the media playlist gets a new sequence on every request."""
+
+    def __init__(self, segment_delay: float = 0):
+        self.segment_delay = segment_delay
+        self.requests = Counter()
+        self.user_agents = set()
+
+    async def handle(self, request):
+        self.requests[request.path] += 1
+        self.user_agents.add(request.headers.get("User-Agent"))
+        if request.path == "/master.m3u8":
+            return web.Response(text=MASTER)
+        if request.path == "/low/index.m3u8":
+            return web.Response(text=MEDIA + "#EXT-X-MEDIA-SEQUENCE:%d\n" % self.requests[request.path])
+        if request.path == "/low/seg1.ts":
+            await asyncio.sleep(self.segment_delay)
+            return web.Response(body=b"segment", content_type="video/mp2t")
+        return web.Response(status=404)
+
+
+async def start(origin: Origin, **options) -> tuple:
+    upstream = TestServer(web.Application())
+    upstream.app.router.add_get("/{path:.*}", origin.handle)
+    await upstream.start_server()
+    relay = HlsRelay("http://relay.test", **options)
+    app = web.Application()
+    relay.setup(app)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    relayed = relay.relay_streams([{"url": str(upstream.make_url("/master.m3u8")), "http": {"user_agent": "Kekik"}}])
+    return upstream, relay, client, urlsplit(relayed[0]["url"]).path
+
+
+def links(playlist: str) -> list:
+    return [line.split('URI="')[-1].rstrip('"') if line.startswith("#") else line for line in playlist.splitlines()]
+
+
+def test_playlist_links_are_rewritten_to_the_relay():
+    async def fetch_all():
+        origin = Origin()
+        upstream, relay, client, path = await start(origin)
+        try:
+            master = await (await client.get(path)).text()
+            variant = master.splitlines()[-1]
+            media = await (await client.get(variant)).text()
+            segment = await client.get(media.splitlines()[-2])
+            upstream_paths = {urlsplit(url).path for url, _ in relay._resources.values()}
+            return master, media, segment.headers["Content-Type"], await segment.read(), origin, upstream_paths
+        finally:
+            await client.close()
+            await upstream.close()
+
+    master, media, content_type, segment, origin, upstream_paths = asyncio.run(fetch_all())
+    relayed = [link for link in links(master) + links(media) if "/" in link]
+    assert len(relayed) == 4 and all(link.startswith("/relay/") for link in relayed)
+    assert 'URI="/relay/' in master and 'URI="/relay/' in media
+    # relative links are resolved against the playlist they were found in
+    assert upstream_paths == {"/keys/session.bin", "/low/index.m3u8", "/keys/k1.bin", "/low/seg1.ts"}
+    assert (content_type, segment) == ("video/mp2t", b"segment")
+    # every upstream request of the channel carries its #EXTVLCOPT User-Agent
+    assert origin.user_agents == {"Kekik"}
+    assert set(origin.requests) == {"/master.m3u8", "/low/index.m3u8", "/low/seg1.ts"}
+
+
+def test_concurrent_requests_share_one_upstream_fetch():
+    async def fetch_all():
+        origin = Origin(segment_delay=0.2)
+        upstream, relay, client, path = await start(origin)
+        try:
+            master = await (await client.get(path)).text()
+            media = await (await client.get(master.splitlines()[-1])).text()
+            responses = await asyncio.gather(*(client.get(media.splitlines()[-2]) for _ in range(5)))
+            return [await response.read() for response in responses], origin, relay.stats
+        finally:
+            await client.close()
+            await upstream.close()
+
+    bodies, origin, stats = asyncio.run(fetch_all())
+    assert bodies == [b"segment"] * 5
+    assert origin.requests["/low/seg1.ts"] == 1
+    assert stats["coalesced"] == 4
+
+
+def test_cancelled_client_does_not_fail_the_other_waiters():
+    async def fetch_all():
+        origin = Origin(segment_delay=0.2)
+        upstream, relay, client, path = await start(origin)
+        try:
+            url = str(upstream.make_url("/low/seg1.ts"))
+            first = asyncio.create_task(relay._fetch("segment", url, {}))
+            second = asyncio.create_task(relay._fetch("segment", url, {}))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            result = await second
+            return first.cancelled(), result, origin, relay._inflight, await relay.cache.get("segment")
+        finally:
+            await client.close()
+            await upstream.close()
+
+    cancelled, result, origin, inflight, cached = asyncio.run(fetch_all())
+    assert cancelled
+    assert result == cached == ("video/mp2t", b"segment")
+    assert origin.requests["/low/seg1.ts"] == 1
+    assert inflight == {}
+
+
+def test_playlist_is_refreshed_by_one_timer():
+    async def fetch_all():
+        origin = Origin()
+        upstream, relay, client, path = await start(origin, refresh_interval=0.05)
+        try:
+            master = await (await client.get(path)).text()
+            variant = master.splitlines()[-1]
+            first = await (await client.get(variant)).text()
+            await asyncio.sleep(0.3)
+            second = await (await client.get(variant)).text()
+            return first, second, origin, relay.stats
+        finally:
+            await client.close()
+            await upstream.close()
+
+    first, second, origin, stats = asyncio.run(fetch_all())
+    # the viewer asked twice, the newer copy comes from the refresh timer and not from its request
+    assert first.endswith("#EXT-X-MEDIA-SEQUENCE:1\n")
+    assert second != first
+    assert origin.requests["/low/index.m3u8"] > 2
+    assert stats["refreshes"] >= origin.requests["/low/index.m3u8"] - 1
+
+
+def test_memory_lru_spills_to_disk(tmp_path):
+    async def fill():
+        cache = SegmentCache(max_bytes=10, directory=str(tmp_path), max_disk_bytes=100)
+        await cache.put("a" * 24 + ".ts", "video/mp2t", b"first...")
+        await cache.put("b" * 24 + ".ts", "video/mp2t", b"second..")
+        spilled = sorted(path.name for path in tmp_path.iterdir())
+        return cache, spilled, await cache.get("a" * 24 + ".ts")
+
+    cache, spilled, first = asyncio.run(fill())
+    assert spilled == ["a" * 24 + ".ts"]
+    assert first == ("video/mp2t", b"first...")
+    assert cache.stats == {"hits": 0, "disk_hits": 1, "misses": 0}
+    # reading it back moved it to memory and spilled the other one
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b" * 24 + ".ts"]
@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from m3u_parser.server import PlaylistServer, accepts_gzip
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 group-title="Spor",Spor 1
+http://example.com/live/spor1.m3u8
+#EXTINF:-1 group-title="Haber Kanalları",Haber 1
+#EXTVLCOPT:http-user-agent=Kekik
+http://example.com/live/haber1.m3u8
+"""
+
+
+@pytest.mark.parametrize(
+    "header, accepted",
+    [
+        ("gzip, deflate, br", True),
+        ("GZIP", True),
+        ("*", True),
+        ("gzip;q=0.5", True),
+        ("deflate, gzip;q=0", False),
+        ("gzip;q=0.0", False),
+        ("gzip;q=x", False),
+        ("identity", False),
+        ("", False),
+    ],
+)
+def test_accepts_gzip(header, accepted):
+    assert accepts_gzip(header) is accepted
+
+
+async def start(server: PlaylistServer, **client_options) -> TestClient:
+    client = TestClient(TestServer(server.app()), **client_options)
+    await client.start_server()
+    for _ in range(200):
+        if server.snapshot is not None:
+            break
+        await asyncio.sleep(0.01)
+    return client
+
+
+def test_bodies_are_cached_and_compressed(tmp_path):
+    playlist = tmp_path / "kanallar.m3u"
+    playlist.write_text(PLAYLIST, encoding="utf-8")
+
+    async def fetch_all():
+        # responses are read as sent, to see which encoding the server chose
+        client = await start(PlaylistServer([str(playlist)]), auto_decompress=False)
+        try:
+            plain = await client.get("/playlist.m3u", headers={"Accept-Encoding": "identity"})
+            compressed = await client.get("/playlist.m3u", headers={"Accept-Encoding": "gzip"})
+            etag = plain.headers["ETag"]
+            revalidated = await client.get("/playlist.m3u", headers={"If-None-Match": 'W/"x", %s' % etag})
+            changed = await client.get("/playlist.m3u", headers={"If-None-Match": '"x"'})
+            since = await client.get("/playlist.m3u", headers={"If-Modified-Since": plain.headers["Last-Modified"]})
+            return (
+                plain,
+                await plain.read(),
+                compressed,
+                await compressed.read(),
+                [response.status for response in (revalidated, changed, since)],
+            )
+        finally:
+            await client.close()
+
+    plain, plain_body, compressed, compressed_body, statuses = asyncio.run(fetch_all())
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed_body) == plain_body
+    assert plain.headers["ETag"] == compressed.headers["ETag"]
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    assert plain.headers["Cache-Control"].startswith("public, max-age=")
+    assert b"#EXTVLCOPT:http-user-agent=Kekik" in plain_body
+    assert statuses == [304, 200, 304]
+
+
+def test_categories_are_served(tmp_path):
+    playlist = tmp_path / "kanallar.m3u"
+    playlist.write_text(PLAYLIST, encoding="utf-8")
+
+    async def fetch_all():
+        client = await start(PlaylistServer([str(playlist)]))
+        try:
+            listing = json.loads(await (await client.get("/categories.json")).read())
+            category = await client.get(listing[1]["url"])
+            missing = await client.get("/category/Film.m3u")
+            return listing, await category.text(), missing.status
+        finally:
+            await client.close()
+
+    listing, category, missing = asyncio.run(fetch_all())
+    assert listing == [
+        {"name": "Spor", "streams": 1, "url": "/category/Spor.m3u"},
+        {"name": "Haber Kanalları", "streams": 1, "url": "/category/Haber%20Kanallar%C4%B1.m3u"},
+    ]
+    assert category.startswith("#EXTM3U\n") and "haber1.m3u8" in category and "spor1" not in category
+    assert missing == 404
+
+
+def test_snapshot_is_refreshed_in_the_background(tmp_path):
+    playlist = tmp_path / "kanallar.m3u"
+    playlist.write_text(PLAYLIST, encoding="utf-8")
+
+    async def fetch_all():
+        server = PlaylistServer([str(playlist)], interval=0.1)
+        client = await start(server)
+        try:
+            first = await client.get("/playlist.json")
+            snapshot = server.snapshot
+            # an unchanged upstream keeps the ETag and Last-Modified, so clients keep getting 304
+            while server.snapshot is snapshot:
+                await asyncio.sleep(0.01)
+            unchanged = await client.get("/playlist.json", headers={"If-None-Match": first.headers["ETag"]})
+            playlist.write_text(PLAYLIST.rsplit("#EXTINF", 1)[0], encoding="utf-8")
+            for _ in range(200):
+                if server.snapshot.count == 1:
+                    break
+                await asyncio.sleep(0.01)
+            changed = await client.get("/playlist.json", headers={"If-None-Match": first.headers["ETag"]})
+            return unchanged.status, changed.status, json.loads(await changed.read())
+        finally:
+            await client.close()
+
+    unchanged, changed, streams = asyncio.run(fetch_all())
+    assert unchanged == 304
+    assert changed == 200
+    assert [stream_info["name"] for stream_info in streams] == ["Spor 1"]
+
+
+def test_unavailable_until_the_first_snapshot(tmp_path):
+    async def fetch():
+        server = PlaylistServer([str(tmp_path / "missing.m3u")], retry_interval=0.1)
+        client = TestClient(TestServer(server.app()))
+        await client.start_server()
+        try:
+            response = await client.get("/playlist.m3u")
+            return response.status, response.headers.get("Retry-After")
+        finally:
+            await client.close()
+
+    assert asyncio.run(fetch()) == (503, "5")
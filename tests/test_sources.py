@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from m3u_parser import M3uParser
+
+PLAYLIST = b"#EXTM3U\n#EXTINF:-1,Kanal 1\nhttp://example.com/kanal1.m3u8\n#EXTINF:-1,Kanal 2\nhttp://example.com/kanal2.m3u8\n"
+# an error page that would parse as a playlist if its status was ignored
+ERROR_PAGE = b"#EXTM3U\n#EXTINF:-1,Error\nhttp://example.com/error.m3u8\n"
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    routes = {"/ok.m3u": (200, PLAYLIST), "/missing.m3u": (404, ERROR_PAGE), "/broken.m3u": (500, ERROR_PAGE)}
+
+    def do_GET(self):
+        status, body = self.routes.get(self.path, (404, b""))
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PlaylistHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("path, names", [("/ok.m3u", ["Kanal 1", "Kanal 2"]), ("/missing.m3u", []), ("/broken.m3u", [])])
+def test_sync_and_async_url_sources_agree(base_url, path, names):
+    parser = M3uParser()
+    assert [info["name"] for info in parser.iter_m3u(base_url + path)] == names
+
+    async def aparse():
+        return [info["name"] async for info in parser.aiter_m3u(base_url + path)]
+
+    assert asyncio.run(aparse()) == names
+
+
+def test_parse_many_reports_the_error_of_every_source(base_url, tmp_path):
+    empty = tmp_path / "empty.m3u"
+    empty.write_text("#EXTM3U\n")
+    paths = [base_url + "/ok.m3u", base_url + "/missing.m3u", str(tmp_path / "nowhere.m3u"), str(empty)]
+    parser = M3uParser(timeout=2)
+    report = parser.parse_m3u_many(paths, check_live=False, workers=2)
+
+    assert [info["name"] for info in parser.get_list()] == ["Kanal 1", "Kanal 2"]
+    assert {info["source"] for info in parser.get_list()} == {base_url + "/ok.m3u"}
+    errors = [report[path]["error"] for path in paths]
+    assert errors[0] is None
+    assert errors[1].startswith("HTTPError: 404")
+    assert errors[2].startswith("FileNotFoundError: ")
+    assert errors[3] == "No streams found"
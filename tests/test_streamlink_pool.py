@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), "query-streamlink"))
+
+from cache import ResolutionCache  # noqa: E402
+from pool import PoolFull, ResolverPool  # noqa: E402
+
+
+class SlowResolver:
+    """Resolves queries starting with "slow" only once released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        if query.startswith("slow"):
+            self.release.wait(5)
+        return "https://cdn.example.com/%s.m3u8" % query, True
+
+
+@pytest.fixture
+def resolver():
+    resolver = SlowResolver()
+    yield resolver
+    resolver.release.set()
+
+
+def test_only_misses_take_a_pool_slot(resolver):
+    cache = ResolutionCache(resolver)
+    pool = ResolverPool(workers=1, queue_depth=0, timeout=5)
+    assert cache.get("hot", submit=pool.submit, timeout=5) == "https://cdn.example.com/hot.m3u8"
+
+    # the only worker is busy with a slow resolution
+    slow = threading.Thread(target=cache.get, args=("slow",), kwargs={"submit": pool.submit, "timeout": 5})
+    slow.start()
+    while "slow" not in resolver.calls:
+        time.sleep(0.01)
+
+    # cached queries are still answered, new misses are rejected
+    assert cache.get("hot", submit=pool.submit, timeout=5) == "https://cdn.example.com/hot.m3u8"
+    with pytest.raises(PoolFull):
+        cache.get("cold", submit=pool.submit, timeout=5)
+
+    # a caller of the resolving query waits for it without taking a slot
+    waiter = {}
+    coalesced = threading.Thread(target=lambda: waiter.update(value=cache.get("slow", submit=pool.submit, timeout=5)))
+    coalesced.start()
+    resolver.release.set()
+    slow.join()
+    coalesced.join()
+    assert waiter["value"] == "https://cdn.example.com/slow.m3u8"
+    assert resolver.calls == ["hot", "slow"]
+
+    # the rejected miss was not cached, it is resolved once a worker is free
+    assert cache.get("cold", submit=pool.submit, timeout=5) == "https://cdn.example.com/cold.m3u8"
+    assert cache.stats()["inflight"] == 0
+
+
+def test_waiters_time_out(resolver):
+    cache = ResolutionCache(resolver)
+    pool = ResolverPool(workers=1, queue_depth=0, timeout=5)
+    with pytest.raises(TimeoutError):
+        cache.get("slow", submit=pool.submit, timeout=0.1)
+
+
+def test_refreshes_take_a_pool_slot(resolver):
+    threads = []
+    cache = ResolutionCache(lambda query: threads.append(threading.current_thread().name) or resolver(query),
+                            refresh_ahead=True, refresh_after=0, popular_hits=1)
+    pool = ResolverPool(workers=1, queue_depth=0, timeout=5)
+    assert cache.get("hot", submit=pool.submit, timeout=5) == "https://cdn.example.com/hot.m3u8"
+
+    slow = threading.Thread(target=cache.get, args=("slow",), kwargs={"submit": pool.submit, "timeout": 5})
+    slow.start()
+    while "slow" not in resolver.calls:
+        time.sleep(0.01)
+
+    # the pool is full, the popular query is served from the cache without a refresh
+    assert cache.get("hot", submit=pool.submit, timeout=5) == "https://cdn.example.com/hot.m3u8"
+    assert cache.stats()["skipped_refreshes"] == 1
+    assert cache.stats()["inflight"] == 1
+
+    resolver.release.set()
+    slow.join()
+    assert cache.get("hot", submit=pool.submit, timeout=5) == "https://cdn.example.com/hot.m3u8"
+    while cache.stats()["inflight"]:
+        time.sleep(0.01)
+    assert resolver.calls == ["hot", "slow", "hot"]
+    assert cache.stats()["refreshes"] == 1
+    assert all(name.startswith("resolver") for name in threads)
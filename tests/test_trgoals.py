@@ -0,0 +1,161 @@
+# ! Bu araç @keyiflerolsun tarafından | @KekikAkademi için yazılmıştır.
+
+from asyncio import run
+from aiohttp import web
+from httpx   import AsyncClient, AsyncHTTPTransport
+import pytest
+
+from TRGoals import TRGoals
+
+M3U = """#EXTM3U
+#EXTINF:-1 group-title="Spor",beIN Sports 1
+#EXTVLCOPT:http-referrer={referer}
+https://eski.workers.dev/yayin1.m3u8
+"""
+
+class YerelAg(AsyncHTTPTransport):
+    "*.test hostlarını sahte sunucuya yönlendirir, Host başlığı korunur"
+    def __init__(self, port: int):
+        super().__init__()
+        self.port = port
+
+    async def handle_async_request(self, request):
+        if request.url.host.endswith(".test"):
+            request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+
+        return await super().handle_async_request(request)
+
+class SahteCozucu:
+    "10.0.2.0:1221 API'sinin yerine geçen yerel sunucu; domainlerin yayin1 sayfasını da sunar"
+    def __init__(self):
+        self.yonlendirmeler = {}
+        self.istekler       = []
+        self.cerezler       = []
+        self.adres          = None
+        self.port           = None
+
+    async def url(self, istek: web.Request):
+        govde = await istek.json()
+        self.istekler.append(("url", govde["url"]))
+        return web.json_response({"url": self.yonlendirmeler.get(govde["url"], "error")})
+
+    async def cf(self, istek: web.Request):
+        self.istekler.append(("cf", (await istek.json())["url"]))
+        return web.Response(text='<section class="links"><a href="https://bit.ly/sahte">Giriş</a></section>', content_type="text/html")
+
+    async def kimlik(self, istek: web.Request):
+        self.istekler.append(("kimlik", (await istek.json())["url"]))
+        return web.json_response({"cookies": {"oturum": "1"}, "headers": {"X-Kimlik": "1"}})
+
+    async def kanal(self, istek: web.Request):
+        self.istekler.append(("kanal", istek.host.split(":")[0], istek.headers.get("X-Kimlik")))
+        self.cerezler.append(istek.cookies.get("oturum"))
+        return web.Response(text='<script>var baseurl = "https://yeni.workers.dev/";</script>', content_type="text/html")
+
+    async def calistir(self, islem):
+        uygulama = web.Application()
+        uygulama.router.add_post("/api/v1/url", self.url)
+        uygulama.router.add_post("/api/v1/cf", self.cf)
+        uygulama.router.add_post("/api/v1/kimlik", self.kimlik)
+        uygulama.router.add_get("/channel.html", self.kanal)
+
+        calistirici = web.AppRunner(uygulama)
+        await calistirici.setup()
+        site = web.TCPSite(calistirici, "127.0.0.1", 0)
+        await site.start()
+        self.port  = site._server.sockets[0].getsockname()[1]
+        self.adres = f"http://127.0.0.1:{self.port}"
+        try:
+            return await islem()
+        finally:
+            await calistirici.cleanup()
+
+    def guncelleyici(self, tmp_path, tahmin_sayisi: int = 0) -> TRGoals:
+        guncelleyici       = TRGoals(str(tmp_path / "liste.m3u"), cozucu=self.adres, tahmin_sayisi=tahmin_sayisi, onbellek_dosyasi=str(tmp_path / "onbellek.json"))
+        guncelleyici.httpx = AsyncClient(timeout=10, transport=YerelAg(self.port))
+        return guncelleyici
+
+def m3u_yaz(tmp_path, referer: str):
+    (tmp_path / "liste.m3u").write_text(M3U.format(referer=referer), encoding="utf-8")
+
+def m3u_referer(tmp_path) -> str:
+    return (tmp_path / "liste.m3u").read_text(encoding="utf-8").split("http-referrer=")[1].split("\n")[0]
+
+@pytest.mark.parametrize("referer", ["https://trgoals1234.test", "https://trgoals.test", "https://www.trgoals-giris.com.test"])
+def test_yeni_domain_sahte_cozucuden_alinir(tmp_path, referer):
+    sunucu = SahteCozucu()
+    m3u_yaz(tmp_path, referer)
+
+    async def islem():
+        sunucu.yonlendirmeler[referer] = "https://trgoals1235.test/"
+        guncelleyici = sunucu.guncelleyici(tmp_path)
+        return guncelleyici, await guncelleyici.m3u_guncelle()
+
+    guncelleyici, degisenler = run(sunucu.calistir(islem))
+
+    assert m3u_referer(tmp_path) == "https://trgoals1235.test"
+    assert "https://yeni.workers.dev/yayin1.m3u8" in (tmp_path / "liste.m3u").read_text(encoding="utf-8")
+    assert len(degisenler) == 2
+    assert ("url", referer) in sunucu.istekler
+    # ? Bilinen yönlendirme doğrudan kullanılır, diğer kaynaklar sorulmaz
+    assert not any(istek[0] == "cf" for istek in sunucu.istekler)
+    assert ("kimlik", "https://trgoals1235.test") in sunucu.istekler
+    assert ("kanal", "trgoals1235.test", "1") in sunucu.istekler
+    assert sunucu.cerezler == ["1"]
+    # ! Kimlik ortak istemciye yazılmaz
+    assert "X-Kimlik" not in guncelleyici.httpx.headers
+    assert "oturum" not in guncelleyici.httpx.cookies
+    assert guncelleyici.httpx.is_closed
+
+def test_numarasiz_domain_tahminsiz_hata_verir(tmp_path):
+    sunucu = SahteCozucu()
+    m3u_yaz(tmp_path, "https://trgoals.test")
+
+    async def islem():
+        guncelleyici = sunucu.guncelleyici(tmp_path, tahmin_sayisi=3)
+        with pytest.raises(ValueError, match="domain tahmin edilemiyor"):
+            await guncelleyici.m3u_guncelle()
+
+        return guncelleyici
+
+    guncelleyici = run(sunucu.calistir(islem))
+
+    # ? Tüm kaynaklar denendi, numarasız domainden tahmin üretilmedi; alınamayan yönlendirme tekrar sorulmadı
+    assert sunucu.istekler.count(("url", "https://trgoals.test")) == 1
+    assert ("cf", "https://bit.ly/m/taraftarium24w") in sunucu.istekler
+    assert not any(istek[0] == "kanal" for istek in sunucu.istekler)
+    assert guncelleyici.httpx.is_closed
+
+def test_onbellek_yalnizca_ayni_hosta_yonlenirken_kullanilir(tmp_path):
+    sunucu = SahteCozucu()
+    m3u_yaz(tmp_path, "https://trgoals1234.test")
+
+    async def islem():
+        sunucu.yonlendirmeler["https://trgoals1234.test"] = "https://trgoals1235.test"
+        await sunucu.guncelleyici(tmp_path).m3u_guncelle()
+
+        # ? Domain değişmedi: yönlendirme yine sorulur, kimlik ve keşif önbellekten atlanır
+        sunucu.istekler.clear()
+        sunucu.yonlendirmeler["https://trgoals1235.test"] = "https://trgoals1235.test/"
+        await sunucu.guncelleyici(tmp_path).m3u_guncelle()
+        ayni_host = list(sunucu.istekler)
+
+        # ! Eldeki domain başka hosta yönleniyor: önbellekteki domain kullanılmamalı
+        sunucu.istekler.clear()
+        sunucu.yonlendirmeler["https://trgoals1235.test"] = "https://trgoals1236.test"
+        await sunucu.guncelleyici(tmp_path).m3u_guncelle()
+
+        return ayni_host, list(sunucu.istekler)
+
+    ayni_host, tasinan = run(sunucu.calistir(islem))
+
+    assert ayni_host == [("url", "https://trgoals1235.test"), ("kanal", "trgoals1235.test", "1")]
+
+    assert ("url", "https://trgoals1235.test") in tasinan
+    assert ("kimlik", "https://trgoals1236.test") in tasinan
+    assert m3u_referer(tmp_path) == "https://trgoals1236.test"
+
+def test_tahmini_domainler():
+    assert TRGoals.tahmini_domainler("https://trgoals1234.xyz", 2) == ["https://trgoals1235.xyz", "https://trgoals1236.xyz"]
+    assert TRGoals.tahmini_domainler("https://trgoals.xyz", 3) == []
+    assert TRGoals.tahmini_domainler("https://trgoalsgiris.com", 3) == []
@@ -0,0 +1,96 @@
+import pytest
+
+from m3u_parser import M3uParser
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-country="TR" tvg-language="Turkish" group-title="Spor",beIN Sports 1
+http://example.com/live/bein1.m3u8
+#EXTINF:-1 tvg-country="DE" tvg-language="German" group-title="Spor",Sport 1
+http://example.com/live/sport1.ts
+#EXTINF:-1 tvg-country="TR" tvg-language="Turkish" group-title="Film",Film Box
+http://example.com/vod/filmbox.mp4
+#EXTINF:-1 tvg-country="TR" tvg-language="Turkish" group-title="Haber",Haber Türk
+http://example.com/live/haberturk.m3u8
+#EXTINF:-1 tvg-country="DE" tvg-language="German" group-title="Film",Kino
+http://example.com/vod/kino.m3u8
+#EXTINF:-1 group-title="Spor Haber",A Spor
+http://example.com/live/aspor
+"""
+
+CHAINS = [
+    [("retrieve_by_category", ["Spor"], {})],
+    [("remove_by_category", [["Spor", "Film"]], {})],
+    [("retrieve_by_extension", ["m3u8"], {}), ("sort_by", ["name"], {"asc": False})],
+    [("remove_by_extension", [[".mp4", "ts"]], {}), ("retrieve_by_category", ["haber"], {})],
+    [("filter_by", ["country-code", "TR"], {"nested_key": True, "exact": True}), ("sort_by", ["name"], {})],
+    [("filter_by", ["language-name", "german"], {"nested_key": True, "exact": True, "retrieve": False})],
+    [("filter_by", ["category", "spor"], {"exact": True}), ("filter_by", ["name", "^be"], {})],
+    [("sort_by", ["name"], {}), ("filter_by", ["url", "live"], {}), ("remove_by_extension", ["ts"], {})],
+    [("filter_by", ["country_code", "TR"], {"nested_key": True, "key_splitter": "_", "exact": True})],
+]
+
+
+@pytest.fixture
+def parser(tmp_path):
+    playlist = tmp_path / "kanallar.m3u"
+    playlist.write_text(PLAYLIST, encoding="utf-8")
+    parser = M3uParser()
+    parser.parse_m3u(str(playlist), check_live=False)
+    return parser
+
+
+def apply(target, chain):
+    for method, args, kwargs in chain:
+        result = getattr(target, method)(*args, **kwargs)
+        target = target if result is None else result
+    return target
+
+
+def eager(parser, chain) -> list:
+    parser.reset_operations()
+    apply(parser, chain)
+    streams = parser.get_list()
+    parser.reset_operations()
+    return streams
+
+
+@pytest.mark.parametrize("chain", CHAINS)
+def test_view_matches_the_eager_operations(parser, chain):
+    view = apply(parser.view(), chain)
+    assert view.get_list() == eager(parser, chain)
+    assert len(view) == len(view.get_list())
+    # views never change the parser
+    assert len(parser.get_list()) == 6
+
+
+@pytest.mark.parametrize("first", CHAINS[:5])
+@pytest.mark.parametrize("second", CHAINS[4:])
+def test_combined_views_match_set_operations(parser, first, second):
+    urls = [stream_info["url"] for stream_info in parser.get_list()]
+    first_urls = {stream_info["url"] for stream_info in eager(parser, first)}
+    second_urls = {stream_info["url"] for stream_info in eager(parser, second)}
+    first_view, second_view = apply(parser.view(), first), apply(parser.view(), second)
+
+    intersection = [stream_info["url"] for stream_info in (first_view & second_view)]
+    union = [stream_info["url"] for stream_info in (first_view | second_view)]
+
+    # & keeps the order of the left view, | the parsed order
+    assert intersection == [
+        stream_info["url"] for stream_info in eager(parser, first) if stream_info["url"] in second_urls
+    ]
+    assert union == [url for url in urls if url in first_urls | second_urls]
+
+
+def test_views_are_independent(parser):
+    sports = parser.view().retrieve_by_category("Spor")
+    turkish = sports.filter_by("country-code", "TR", nested_key=True, exact=True)
+    assert [stream_info["name"] for stream_info in turkish] == ["beIN Sports 1"]
+    assert [stream_info["name"] for stream_info in sports] == ["beIN Sports 1", "Sport 1", "A Spor"]
+    assert parser.view() is parser.view()
+
+
+def test_views_over_other_streams_are_not_combined(parser, tmp_path):
+    other = M3uParser()
+    other.parse_m3u(str(tmp_path / "kanallar.m3u"), check_live=False)
+    with pytest.raises(ValueError):
+        parser.view() & other.view()